@@ -0,0 +1,95 @@
+from thermostat.accumulators import MomentAccumulator, QuantileSketch
+
+import pandas as pd
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pytest
+
+Q = [0., .1, .25, .5, .9, 1.]
+
+
+@pytest.fixture
+def values():
+    np.random.seed(0)
+    values = np.random.normal(0.1, 0.3, size=3000)
+    values[:100] = 0.
+    values[100:200] = np.random.randint(0, 365, size=100)
+    np.random.shuffle(values)
+    return values
+
+
+def _batches(values):
+    return [values[:1000], values[1000:1100], values[1100:], values[:0]]
+
+
+def test_moment_accumulator(values):
+    accumulators = [MomentAccumulator.from_values(b) for b in _batches(values)]
+    merged = accumulators[0]
+    for accumulator in accumulators[1:]:
+        merged = merged.merge(accumulator)
+
+    assert merged.n == values.shape[0]
+    assert_allclose(merged.mean, values.mean())
+    assert_allclose(merged.std(), np.std(values))
+    assert_allclose(merged.sem(), np.std(values) / values.shape[0] ** .5)
+
+    reversed_merged = accumulators[-1]
+    for accumulator in accumulators[-2::-1]:
+        reversed_merged = reversed_merged.merge(accumulator)
+    assert_allclose(reversed_merged.mean, merged.mean)
+    assert_allclose(reversed_merged.m2, merged.m2)
+
+
+def test_moment_accumulator_empty():
+    accumulator = MomentAccumulator.from_values([])
+    assert accumulator.n == 0
+    assert np.isnan(accumulator.mean)
+    assert np.isnan(accumulator.sem())
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.001])
+def test_quantile_sketch_error_bound(values, relative_accuracy):
+    sketch = QuantileSketch.from_values(values, relative_accuracy)
+    assert sketch.n == values.shape[0]
+
+    quantiles = sketch.quantile(Q)
+    sorted_values = np.sort(values)
+    for q, quantile in zip(Q, quantiles):
+        index = (values.shape[0] - 1) * q
+        below, above = sorted_values[int(np.floor(index))], sorted_values[int(np.ceil(index))]
+        expected = pd.Series(values).quantile(q)
+        assert abs(quantile - expected) <= \
+            relative_accuracy * max(abs(below), abs(above)) + 1e-12
+
+
+def test_quantile_sketch_merge(values):
+    sketches = [QuantileSketch.from_values(b) for b in _batches(values)]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged = merged.merge(sketch)
+    reversed_merged = sketches[-1]
+    for sketch in sketches[-2::-1]:
+        reversed_merged = reversed_merged.merge(sketch)
+
+    sketch = QuantileSketch.from_values(values)
+    assert np.all(merged.codes == sketch.codes)
+    assert np.all(merged.counts == sketch.counts)
+    assert np.all(reversed_merged.quantile(Q) == sketch.quantile(Q))
+
+    restored = QuantileSketch.from_dict(merged.to_dict())
+    assert np.all(restored.quantile(Q) == sketch.quantile(Q))
+
+
+def test_quantile_sketch_empty():
+    sketch = QuantileSketch.from_values([])
+    assert sketch.n == 0
+    assert np.all(np.isnan(sketch.quantile(Q)))
+
+
+def test_quantile_sketch_bad_args(values):
+    with pytest.raises(ValueError):
+        QuantileSketch(0.)
+    with pytest.raises(ValueError):
+        QuantileSketch.from_values(values, 0.01).merge(
+            QuantileSketch.from_values(values, 0.001))
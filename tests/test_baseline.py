@@ -137,3 +137,72 @@ def test_get_core_cooling_day_baseline_setpoint_null_cooling_setpoint(thermostat
     thermostat_template.cooling_setpoint = pd.Series([np.nan, np.nan, np.nan], index=index)
     sp = thermostat_template.get_core_cooling_day_baseline_setpoint(core_day_set, source='cooling_setpoint')
     assert pd.isnull(sp)
+
+def _check_baseline_scenarios(thermostat, core_day_set, heating_or_cooling):
+    if heating_or_cooling == "cooling":
+        get_scenarios = thermostat.get_baseline_cooling_scenarios
+        get_demand = thermostat.get_cooling_demand
+        get_baseline_demand = thermostat.get_baseline_cooling_demand
+        get_baseline_runtime = thermostat.get_baseline_cooling_runtime
+        runtime = thermostat.cool_runtime
+    else:
+        get_scenarios = thermostat.get_baseline_heating_scenarios
+        get_demand = thermostat.get_heating_demand
+        get_baseline_demand = thermostat.get_baseline_heating_demand
+        get_baseline_runtime = thermostat.get_baseline_heating_runtime
+        runtime = thermostat.heat_runtime
+
+    _, tau, alpha = get_demand(core_day_set)[:3]
+    daily_runtime = runtime[core_day_set.daily]
+    n_days = daily_runtime.shape[0]
+
+    temp_baselines = np.arange(60, 81)
+    scenarios = get_scenarios(core_day_set, temp_baselines)
+
+    assert scenarios.demand.shape == (21, n_days)
+    assert scenarios.runtime.shape == (21, n_days)
+    assert scenarios.avoided_runtime.shape == (21, n_days)
+    assert scenarios.percent_savings.shape == (21,)
+
+    for k, temp_baseline in enumerate(temp_baselines):
+        demand = get_baseline_demand(core_day_set, temp_baseline, tau)
+        baseline_runtime = get_baseline_runtime(demand, alpha)
+        avoided_runtime = baseline_runtime - daily_runtime
+        savings = avoided_runtime.mean() / baseline_runtime.mean() * 100.0
+        assert_allclose(scenarios.demand[k], demand.values)
+        assert_allclose(scenarios.runtime[k], baseline_runtime.values)
+        assert_allclose(scenarios.avoided_runtime[k], avoided_runtime.values)
+        assert_allclose(scenarios.percent_savings[k], savings)
+
+def test_get_baseline_cooling_scenarios(thermostat_type_1, core_cooling_day_set_type_1_entire):
+    _check_baseline_scenarios(thermostat_type_1, core_cooling_day_set_type_1_entire, "cooling")
+
+def test_get_baseline_heating_scenarios(thermostat_type_1, core_heating_day_set_type_1_entire):
+    _check_baseline_scenarios(thermostat_type_1, core_heating_day_set_type_1_entire, "heating")
+
+def test_get_baseline_scenarios_fixed_parameters(thermostat_type_1, core_heating_day_set_type_1_entire):
+    scenarios = thermostat_type_1.get_baseline_heating_scenarios(
+        core_heating_day_set_type_1_entire, 70, tau=2., alpha=10.)
+    demand = thermostat_type_1.get_baseline_heating_demand(
+        core_heating_day_set_type_1_entire, 70, 2.)
+
+    assert_allclose(scenarios.temp_baselines, [70])
+    assert_allclose(scenarios.demand[0], demand.values)
+    assert_allclose(scenarios.runtime[0], np.maximum(10. * demand.values, 0))
+
+def test_get_core_day_set_quantiles(thermostat_type_1):
+    core_day_sets = thermostat_type_1.get_core_heating_days(method="year_mid_to_mid")
+    q = [.1, .5, .9]
+    quantiles = thermostat_type_1.get_core_day_set_quantiles(core_day_sets, q)
+
+    assert quantiles.shape == (len(core_day_sets), 3)
+    for core_day_set, set_quantiles in zip(core_day_sets, quantiles):
+        temperature_in = thermostat_type_1.temperature_in[core_day_set.hourly].dropna()
+        for q_, quantile in zip(q, set_quantiles):
+            if temperature_in.shape[0] == 0:
+                assert np.isnan(quantile)
+            else:
+                assert_allclose(quantile, temperature_in.quantile(q_))
+
+    with pytest.raises(NotImplementedError):
+        thermostat_type_1.get_core_day_set_quantiles(core_day_sets, q, source="temperature_out")
@@ -1,3 +1,4 @@
+from thermostat.core import Thermostat, CompactThermostat, IndexedCoreDaySet
 from thermostat.importers import from_csv
 from thermostat.util.testing import get_data_path
 
@@ -5,9 +6,11 @@ import numpy as np
 import pandas as pd
 
 from datetime import datetime
+import pickle
 
 import pytest
 
+from fixtures.thermostats import thermostat_template
 from fixtures.thermostats import thermostat_type_1
 from fixtures.thermostats import thermostat_type_2
 from fixtures.thermostats import thermostat_type_3
@@ -239,6 +242,78 @@ def test_thermostat_types_2_get_resistance_heat_utilization_bins(
             core_heating_day_set_type_1_entire)
 
 
+def _resistance_heat_utilization_bins(temperature, heat_runtime, aux_runtime,
+        emg_runtime, bin_edges):
+    # straightforward reference implementation, one bin at a time.
+    rhus = []
+    for low_temp, high_temp in zip(bin_edges[:-1], bin_edges[1:]):
+        in_bin = (temperature >= low_temp) & (temperature < high_temp)
+        R_heat = np.nansum(heat_runtime[in_bin])
+        R_aux = np.nansum(aux_runtime[in_bin])
+        R_emg = np.nansum(emg_runtime[in_bin])
+        if R_heat + R_emg == 0 or R_aux > R_heat:
+            rhus.append(np.nan)
+        else:
+            rhus.append((R_aux + R_emg) / (R_heat + R_emg))
+    return np.array(rhus)
+
+
+def test_thermostat_type_1_get_resistance_heat_utilization_bins_edges(
+        thermostat_type_1, core_heating_day_set_type_1_entire):
+    core_day_set = core_heating_day_set_type_1_entire
+
+    default = thermostat_type_1.get_resistance_heat_utilization_bins(core_day_set)
+    explicit = thermostat_type_1.get_resistance_heat_utilization_bins(
+        core_day_set, bin_edges=range(0, 65, 5))
+    assert_allclose(explicit, default)
+
+    bin_edges = list(range(-10, 71))
+    rhus = thermostat_type_1.get_resistance_heat_utilization_bins(
+        core_day_set, bin_edges=bin_edges)
+    heat_runtime = thermostat_type_1.heat_runtime
+    in_range = (heat_runtime.index >= core_day_set.start_date) & \
+        (heat_runtime.index < core_day_set.end_date)
+    expected = _resistance_heat_utilization_bins(
+        thermostat_type_1.temperature_out.resample('D').mean().values[in_range],
+        heat_runtime.values[in_range],
+        thermostat_type_1.auxiliary_heat_runtime.resample('D').sum().values[in_range],
+        thermostat_type_1.emergency_heat_runtime.resample('D').sum().values[in_range],
+        bin_edges)
+    assert rhus.shape == (80,)
+    assert_allclose(rhus, expected)
+
+
+def test_thermostat_type_1_get_resistance_heat_utilization_bins_hourly(
+        thermostat_type_1, core_heating_day_set_type_1_entire):
+    core_day_set = core_heating_day_set_type_1_entire
+    bin_edges = [-20, 0, 10, 20, 30, 35, 40, 50, 60]
+    rhus = thermostat_type_1.get_resistance_heat_utilization_bins(
+        core_day_set, bin_edges=bin_edges, resolution="hourly")
+    temperature_out = thermostat_type_1.temperature_out
+    in_range = (temperature_out.index >= core_day_set.start_date) & \
+        (temperature_out.index < core_day_set.end_date)
+    expected = _resistance_heat_utilization_bins(
+        temperature_out.values[in_range],
+        np.repeat(thermostat_type_1.heat_runtime.values / 24., 24)[in_range],
+        thermostat_type_1.auxiliary_heat_runtime.values[in_range],
+        thermostat_type_1.emergency_heat_runtime.values[in_range],
+        bin_edges)
+    assert rhus.shape == (8,)
+    assert_allclose(rhus, expected)
+
+
+def test_thermostat_type_1_get_resistance_heat_utilization_bins_bad_args(
+        thermostat_type_1, core_heating_day_set_type_1_entire):
+    for bin_edges in [[10], [0, 10, 5], [[0, 5], [5, 10]]]:
+        with pytest.raises(ValueError):
+            thermostat_type_1.get_resistance_heat_utilization_bins(
+                core_heating_day_set_type_1_entire, bin_edges=bin_edges)
+
+    with pytest.raises(NotImplementedError):
+        thermostat_type_1.get_resistance_heat_utilization_bins(
+            core_heating_day_set_type_1_entire, resolution="weekly")
+
+
 @pytest.fixture(params=range(2))
 def core_days(request, thermostat_type_1, core_heating_day_set_type_1_entire,
         core_cooling_day_set_type_1_entire):
@@ -260,3 +335,356 @@ def test_day_counts(core_days, metrics_type_1_data):
     assert n_days_insufficient == metrics_type_1_data[i]["n_days_insufficient_data"]
     assert n_core_days == metrics_type_1_data[i]["n_core_{}_days".format(heating_or_cooling)]
     assert n_days_in_inputfile_date_range == metrics_type_1_data[i]["n_days_in_inputfile_date_range"]
+
+
+def test_daily_null_counts(thermostat_type_1):
+    daily_null_counts = thermostat_type_1._get_daily_null_counts()
+    temperature_in = thermostat_type_1.temperature_in
+    expected = temperature_in.groupby(temperature_in.index.date) \
+            .apply(lambda x: x.isnull().sum())
+
+    assert daily_null_counts.index.equals(thermostat_type_1.heat_runtime.index)
+    assert_allclose(daily_null_counts.temperature_in.values, expected.values)
+    assert_allclose(daily_null_counts.heat_runtime.values,
+            pd.isnull(thermostat_type_1.heat_runtime.values))
+
+    # cached
+    assert thermostat_type_1._get_daily_null_counts() is daily_null_counts
+
+
+def test_enough_temperature_days(thermostat_template):
+    hourly_index = pd.date_range(start=datetime(2011, 1, 1), periods=72, freq='H')
+    temperature_in = np.tile(70., 72)
+    temperature_in[0:2] = np.nan
+    temperature_in[24:27] = np.nan
+    thermostat_template.temperature_in = pd.Series(temperature_in, index=hourly_index)
+    thermostat_template.temperature_out = pd.Series(np.tile(50., 72), index=hourly_index)
+
+    enough = thermostat_template._get_enough_temperature_days()
+    assert list(enough.values) == [True, False, True]
+
+    # replacing a series invalidates the cached counts
+    thermostat_template.temperature_out = pd.Series(np.nan, index=hourly_index)
+    enough = thermostat_template._get_enough_temperature_days()
+    assert list(enough.values) == [False, False, False]
+
+
+def _series_args(thermostat):
+    return [
+        thermostat.temperature_in, thermostat.temperature_out,
+        thermostat.cooling_setpoint, thermostat.heating_setpoint,
+        thermostat.cool_runtime, thermostat.heat_runtime,
+        thermostat.auxiliary_heat_runtime, thermostat.emergency_heat_runtime,
+    ]
+
+
+def _check_from_arrays(thermostat, quantized=False):
+    series = _series_args(thermostat)
+    info = [thermostat.thermostat_id, thermostat.equipment_type,
+            thermostat.zipcode, thermostat.station]
+
+    expected = Thermostat(*(info + series))
+    compact = Thermostat.from_arrays(*(info + [thermostat.temperature_in.index[0]] + [
+        None if s is None else s.values for s in series]), quantized=quantized)
+
+    assert isinstance(compact, CompactThermostat)
+    assert compact.quantized == quantized
+    assert not hasattr(compact, "__dict__")
+    for s_compact, s_expected in zip(_series_args(compact), _series_args(expected)):
+        if s_expected is None:
+            assert s_compact is None
+        else:
+            assert s_compact.index.equals(s_expected.index)
+            assert_allclose(s_compact.values, s_expected.values)
+
+    # series share an index
+    assert compact.temperature_in.index is compact.temperature_out.index
+
+    core_days = compact.get_core_cooling_days(method="year_end_to_end")
+    expected_core_days = expected.get_core_cooling_days(method="year_end_to_end")
+    assert [c.name for c in core_days] == [c.name for c in expected_core_days]
+    for c, e in zip(core_days, expected_core_days):
+        assert c.daily.equals(e.daily)
+        assert c.hourly.equals(e.hourly)
+
+    metrics = compact.calculate_epa_field_savings_metrics()
+    expected_metrics = expected.calculate_epa_field_savings_metrics()
+    assert len(metrics) == len(expected_metrics)
+    for m, e in zip(metrics, expected_metrics):
+        assert sorted(m.keys()) == sorted(e.keys())
+        for key in e:
+            if isinstance(e[key], float):
+                assert_allclose(m[key], e[key], equal_nan=True)
+            else:
+                assert m[key] == e[key]
+
+
+def test_from_arrays_type_1(thermostat_type_1):
+    _check_from_arrays(thermostat_type_1)
+
+
+def test_from_arrays_type_5(thermostat_type_5):
+    _check_from_arrays(thermostat_type_5)
+
+
+def test_from_arrays_views(thermostat_type_1):
+    compact = Thermostat.from_arrays(*([
+        thermostat_type_1.thermostat_id, thermostat_type_1.equipment_type,
+        thermostat_type_1.zipcode, thermostat_type_1.station,
+        thermostat_type_1.temperature_in.index[0]] + [
+            s.values for s in _series_args(thermostat_type_1)]))
+    assert np.shares_memory(compact.temperature_in.values, compact.hourly)
+
+
+def test_from_arrays_quantized_type_1(thermostat_type_1):
+    _check_from_arrays(thermostat_type_1, quantized=True)
+
+
+def test_from_arrays_quantized_type_5(thermostat_type_5):
+    _check_from_arrays(thermostat_type_5, quantized=True)
+
+
+def test_from_arrays_quantized_storage(thermostat_type_1):
+    args = [
+        thermostat_type_1.thermostat_id, thermostat_type_1.equipment_type,
+        thermostat_type_1.zipcode, thermostat_type_1.station,
+        thermostat_type_1.temperature_in.index[0]] + [
+            s.values for s in _series_args(thermostat_type_1)]
+    compact = Thermostat.from_arrays(*args)
+    quantized = Thermostat.from_arrays(*args, quantized=True)
+
+    assert quantized.hourly.dtype == np.int16
+    assert quantized.daily.dtype == np.uint16
+    assert quantized.hourly.shape == (5, compact.hourly.shape[1])
+    assert quantized.unquantized_hourly.shape == (1, compact.hourly.shape[1])
+    assert quantized.daily.nbytes * 4 == compact.daily.nbytes
+
+    # all data held, including outdoor temperatures and inexact hours
+    n_inexact_hours = sum(positions.shape[0]
+                          for positions, _ in quantized.inexact_hours.values())
+    assert quantized.nbytes == compact.hourly.shape[1] * 18 + \
+        compact.daily.shape[1] * 4 + n_inexact_hours * 16
+    assert compact.nbytes == compact.hourly.nbytes + compact.daily.nbytes
+    assert compact.nbytes > 2.5 * quantized.nbytes
+
+    # nulls survive, and data at the documented resolution is exact.
+    heat_runtime = quantized.heat_runtime
+    assert_allclose(heat_runtime.values, thermostat_type_1.heat_runtime.values)
+    assert pd.isnull(quantized.temperature_in).sum() == \
+        pd.isnull(compact.temperature_in).sum()
+    # outdoor temperatures and interpolated hours, which aren't multiples of
+    # 0.1F, are kept exactly too.
+    np.testing.assert_array_equal(quantized.temperature_out.values,
+                                  compact.temperature_out.values)
+    np.testing.assert_array_equal(quantized.temperature_in.values,
+                                  compact.temperature_in.values)
+
+    # cheap to pass between processes
+    unpickled = pickle.loads(pickle.dumps(quantized, pickle.HIGHEST_PROTOCOL))
+    assert_allclose(unpickled.temperature_in.values, quantized.temperature_in.values)
+    assert_allclose(unpickled.temperature_out.values, quantized.temperature_out.values)
+
+
+def test_from_arrays_quantized_out_of_range(thermostat_type_5):
+    cool_runtime = thermostat_type_5.cool_runtime.values.copy()
+    cool_runtime[0] = -1
+    temperature_in = thermostat_type_5.temperature_in.values
+    with pytest.raises(ValueError):
+        Thermostat.from_arrays(
+            "id", 5, "01234", "722880", datetime(2011, 1, 1),
+            temperature_in, temperature_in, temperature_in,
+            None, cool_runtime, None, None, None, quantized=True)
+
+
+def test_from_arrays_bad_length(thermostat_type_5):
+    temperature_in = thermostat_type_5.temperature_in.values
+    with pytest.raises(ValueError):
+        Thermostat.from_arrays(
+            "id", 5, "01234", "722880", datetime(2011, 1, 1),
+            temperature_in[:-1], temperature_in[:-1], temperature_in[:-1],
+            None, thermostat_type_5.cool_runtime.values, None, None, None)
+
+
+def test_indexed_core_day_set(thermostat_type_1):
+    core_day_set = thermostat_type_1.get_core_heating_days(method="year_mid_to_mid")[0]
+    assert isinstance(core_day_set, IndexedCoreDaySet)
+    assert core_day_set.daily.index.equals(thermostat_type_1.heat_runtime.index)
+    assert core_day_set.hourly.index.equals(thermostat_type_1.temperature_in.index)
+    assert core_day_set.daily.sum() == core_day_set.days.shape[0]
+    assert_allclose(core_day_set.hourly.values, np.repeat(core_day_set.daily.values, 24))
+
+    temperature_in = thermostat_type_1.temperature_in
+    hours = core_day_set.get_hours(temperature_in)
+    expected = temperature_in[core_day_set.hourly]
+    assert hours.index.equals(expected.index)
+    assert_allclose(hours.values, expected.values)
+
+    # series not aligned with the core day set are selected by label
+    hours = core_day_set.get_hours(temperature_in.iloc[24:])
+    expected = temperature_in.iloc[24:][core_day_set.hourly.iloc[24:]]
+    assert hours.index.equals(expected.index)
+
+
+def test_seasonal_core_day_sets(thermostat_type_1):
+    core_day_sets = thermostat_type_1.get_core_heating_days(method="year_mid_to_mid")
+    entire = thermostat_type_1.get_core_heating_days(method="entire_dataset")[0]
+    daily_index = thermostat_type_1.heat_runtime.index
+
+    # each set holds the core days within its date range (end exclusive)
+    for core_day_set in core_day_sets:
+        in_range = (daily_index >= core_day_set.start_date) & \
+            (daily_index < core_day_set.end_date)
+        assert (core_day_set.daily.values == (entire.daily.values & in_range)).all()
+
+    ignored_days = thermostat_type_1._get_ignored_days_by_set(core_day_sets)
+    for core_day_set, (n_both, n_days_insufficient) in zip(core_day_sets, ignored_days):
+        in_range = (daily_index >= core_day_set.start_date) & \
+            (daily_index < core_day_set.end_date)
+        has_heating = (thermostat_type_1.heat_runtime > 0).values
+        has_cooling = (thermostat_type_1.cool_runtime > 0).values
+        assert n_both == (in_range & has_heating & has_cooling).sum()
+        assert (n_both, n_days_insufficient) == thermostat_type_1.get_ignored_days(core_day_set)
+
+
+def test_derived_cache(thermostat_template):
+    hourly_index = pd.date_range(start=datetime(2011, 1, 1), periods=48, freq='H')
+    thermostat_template.temperature_out = pd.Series(np.arange(48.), index=hourly_index)
+
+    daily = thermostat_template._get_daily_aggregate("temperature_out", "mean")
+    assert_allclose(daily.values, [11.5, 35.5])
+    assert thermostat_template._get_daily_aggregate("temperature_out", "mean") is daily
+
+    # replacing a series invalidates values derived from it
+    thermostat_template.temperature_out = pd.Series(np.zeros(48), index=hourly_index)
+    daily = thermostat_template._get_daily_aggregate("temperature_out", "mean")
+    assert_allclose(daily.values, [0, 0])
+
+    # modifying a series in place requires clearing explicitly
+    thermostat_template.temperature_out.iloc[:] = 1.
+    assert thermostat_template._get_daily_aggregate("temperature_out", "mean") is daily
+    thermostat_template.clear_derived()
+    assert_allclose(thermostat_template._get_daily_aggregate("temperature_out", "mean").values, [1, 1])
+
+
+def test_derived_cache_core_day_sets(thermostat_type_1):
+    core_day_sets = thermostat_type_1.get_core_heating_days(method="year_mid_to_mid")
+    deltaTs = [thermostat_type_1._get_core_day_set_deltaT(c) for c in core_day_sets]
+    for core_day_set, deltaT in zip(core_day_sets, deltaTs):
+        assert thermostat_type_1._get_core_day_set_deltaT(core_day_set) is deltaT
+
+    # bounded
+    for i in range(Thermostat.DERIVED_CACHE_SIZE):
+        thermostat_type_1._get_derived(("test", i), [], lambda: i)
+    assert len(thermostat_type_1._derived) == Thermostat.DERIVED_CACHE_SIZE
+    assert thermostat_type_1._get_core_day_set_deltaT(core_day_sets[0]) is not deltaTs[0]
+
+
+def test_derived_cache_after_metrics(thermostat_type_1):
+    thermostat_type_1.calculate_epa_field_savings_metrics()
+
+    # only small daily values are kept for later use
+    keys = list(thermostat_type_1._derived)
+    assert "daily_null_counts" in keys
+    assert ("daily", "temperature_out", "mean") in keys
+    assert all(key == "daily_null_counts" or key[0] == "daily" for key in keys)
+
+
+def _split_series(series, n_days):
+    head, tail = [], []
+    for s in series:
+        if s is None:
+            head.append(None)
+            tail.append(None)
+        else:
+            n = n_days * 24 if s.shape[0] > 0 and s.index.freq == "H" else n_days
+            head.append(s.iloc[:n])
+            tail.append(s.iloc[n:])
+    return head, tail
+
+
+def _check_extend(thermostat, compact=False, quantized=False):
+    series = _series_args(thermostat)
+    info = [thermostat.thermostat_id, thermostat.equipment_type,
+            thermostat.zipcode, thermostat.station]
+
+    # hours are missing around the split, so that hours at the end of the
+    # existing data are filled differently once the new data arrives.
+    n_days = thermostat.temperature_in.shape[0] // 24 - 45
+    split = n_days * 24
+    series[:2] = [s.copy() for s in series[:2]]
+    series[0].iloc[split - 1:split + 1] = np.nan
+    series[1].iloc[split - 3:split + 1] = np.nan
+    expected = Thermostat(*(info + series))
+
+    head, tail = _split_series(series, n_days)
+    if compact:
+        extended = Thermostat.from_arrays(*(info + [thermostat.temperature_in.index[0]] + [
+            None if s is None else s.values for s in head]), quantized=quantized)
+        tail = [None if s is None else s.values for s in tail]
+    else:
+        extended = Thermostat(*(info + head))
+
+    # cached daily values are carried over, and extended with the new days.
+    extended.calculate_epa_field_savings_metrics()
+    extended.extend(*tail)
+    assert "daily_null_counts" in extended._derived
+
+    for s_extended, s_expected in zip(_series_args(extended), _series_args(expected)):
+        if s_expected is None:
+            assert s_extended is None
+        else:
+            assert s_extended.index.equals(s_expected.index)
+            assert_allclose(s_extended.values, s_expected.values)
+
+    null_counts = extended._get_daily_null_counts()
+    expected_null_counts = expected._get_daily_null_counts()
+    assert null_counts.index.equals(expected_null_counts.index)
+    assert (null_counts.values == expected_null_counts[null_counts.columns].values).all()
+
+    metrics = extended.calculate_epa_field_savings_metrics(
+        core_cooling_day_set_method="year_end_to_end",
+        core_heating_day_set_method="year_mid_to_mid")
+    expected_metrics = expected.calculate_epa_field_savings_metrics(
+        core_cooling_day_set_method="year_end_to_end",
+        core_heating_day_set_method="year_mid_to_mid")
+    assert len(metrics) == len(expected_metrics)
+    for m, e in zip(metrics, expected_metrics):
+        for key in e:
+            if isinstance(e[key], float):
+                assert_allclose(m[key], e[key], equal_nan=True)
+            else:
+                assert m[key] == e[key]
+
+
+def test_extend_type_1(thermostat_type_1):
+    _check_extend(thermostat_type_1)
+
+
+def test_extend_type_5(thermostat_type_5):
+    _check_extend(thermostat_type_5)
+
+
+def test_extend_compact_type_1(thermostat_type_1):
+    _check_extend(thermostat_type_1, compact=True)
+
+
+def test_extend_quantized_type_5(thermostat_type_5):
+    _check_extend(thermostat_type_5, compact=True, quantized=True)
+
+
+def test_extend_bad_data(thermostat_type_5):
+    series = _series_args(thermostat_type_5)
+    info = [thermostat_type_5.thermostat_id, thermostat_type_5.equipment_type,
+            thermostat_type_5.zipcode, thermostat_type_5.station]
+    head, tail = _split_series(series, 100)
+    thermostat = Thermostat(*(info + head))
+
+    # gap between existing and new data
+    _, late_tail = _split_series(series, 101)
+    with pytest.raises(ValueError):
+        thermostat.extend(*late_tail)
+
+    # series the thermostat doesn't have
+    tail[5] = tail[4]
+    with pytest.raises(ValueError):
+        thermostat.extend(*tail)
@@ -5,11 +5,17 @@ from numpy.testing import assert_allclose
 import pytest
 
 from fixtures.thermostats import thermostat_type_1
+from fixtures.thermostats import thermostat_type_4
+from fixtures.thermostats import thermostat_type_5
 from fixtures.thermostats import core_heating_day_set_type_1_entire as core_heating_day_set_type_1
 from fixtures.thermostats import core_cooling_day_set_type_1_entire as core_cooling_day_set_type_1
 from fixtures.thermostats import core_heating_day_set_type_1_empty
 from fixtures.thermostats import core_cooling_day_set_type_1_empty
 from fixtures.thermostats import metrics_type_1_data
+from fixtures.thermostats import thermostat_template
+
+from thermostat.core import CoreDaySet, fit_demand_batch
+from datetime import datetime
 
 RTOL = 1e-3
 ATOL = 1e-3
@@ -33,3 +39,67 @@ def test_get_heating_demand(thermostat_type_1, core_heating_day_set_type_1, metr
     demand, tau_estimate, alpha_estimate, mse, rmse, cvrmse, mape, mae = \
             thermostat_type_1.get_heating_demand(core_heating_day_set_type_1)
     assert_allclose(demand.mean(), metrics_type_1_data[1]["mean_demand"], rtol=RTOL, atol=ATOL)
+
+
+def test_get_demand_leastsq(thermostat_type_1, core_cooling_day_set_type_1, core_heating_day_set_type_1):
+    _, tau, _, mse, _, _, _, _ = thermostat_type_1.get_cooling_demand(core_cooling_day_set_type_1)
+    _, tau_leastsq, _, mse_leastsq, _, _, _, _ = \
+            thermostat_type_1.get_cooling_demand(core_cooling_day_set_type_1, method="leastsq")
+    assert_allclose(tau, tau_leastsq, rtol=RTOL, atol=ATOL)
+    assert mse <= mse_leastsq + ATOL
+
+    _, tau, _, mse, _, _, _, _ = thermostat_type_1.get_heating_demand(core_heating_day_set_type_1)
+    _, tau_leastsq, _, mse_leastsq, _, _, _, _ = \
+            thermostat_type_1.get_heating_demand(core_heating_day_set_type_1, method="leastsq")
+    assert_allclose(tau, tau_leastsq, rtol=RTOL, atol=ATOL)
+    assert mse <= mse_leastsq + ATOL
+
+    with pytest.raises(NotImplementedError):
+        thermostat_type_1.get_cooling_demand(core_cooling_day_set_type_1, method="other")
+
+
+def test_get_core_day_set_deltaT(thermostat_template):
+    daily_index = pd.date_range(start=datetime(2011, 1, 1), periods=3, freq='D')
+    hourly_index = pd.date_range(start=datetime(2011, 1, 1), periods=72, freq='H')
+    thermostat_template.temperature_in = pd.Series(np.arange(72.), index=hourly_index)
+    thermostat_template.temperature_out = pd.Series(np.tile(10., 72), index=hourly_index)
+
+    daily = pd.Series([True, False, True], index=daily_index)
+    hourly = pd.Series(np.repeat(daily.values, 24), index=hourly_index)
+    core_day_set = CoreDaySet("FAKE", daily, hourly, None, None)
+
+    deltaT = thermostat_template._get_core_day_set_deltaT(core_day_set)
+    assert deltaT.shape == (2, 24)
+    assert_allclose(deltaT[0], np.arange(24.) - 10)
+    assert_allclose(deltaT[1], np.arange(48., 72.) - 10)
+
+
+def test_fit_demand_batch(thermostat_type_1, thermostat_type_4, thermostat_type_5):
+    thermostats = [thermostat_type_1, thermostat_type_4, thermostat_type_5]
+
+    for season in ["cooling", "heating"]:
+        fits = fit_demand_batch(thermostats, season=season)
+        assert len(fits) == 3
+
+        for thermostat, thermostat_fits in zip(thermostats, fits):
+            if season == "cooling":
+                if thermostat.equipment_type not in thermostat.COOLING_EQUIPMENT_TYPES:
+                    assert thermostat_fits == []
+                    continue
+                core_day_sets = thermostat.get_core_cooling_days()
+                expected = [thermostat.get_cooling_demand(cds) for cds in core_day_sets]
+            else:
+                if thermostat.equipment_type not in thermostat.HEATING_EQUIPMENT_TYPES:
+                    assert thermostat_fits == []
+                    continue
+                core_day_sets = thermostat.get_core_heating_days()
+                expected = [thermostat.get_heating_demand(cds) for cds in core_day_sets]
+
+            assert len(thermostat_fits) == len(expected)
+            for fit, expected_fit in zip(thermostat_fits, expected):
+                assert_allclose(fit[0].values, expected_fit[0].values)
+                assert (fit[0].index == expected_fit[0].index).all()
+                assert_allclose(fit[1:], expected_fit[1:])
+
+    with pytest.raises(NotImplementedError):
+        fit_demand_batch(thermostats, season="other")
@@ -1,7 +1,11 @@
 from thermostat.importers import from_csv
+from thermostat.importers import get_single_thermostat
+from thermostat.importers import _get_utc_hour_range
 from thermostat.util.testing import get_data_path
 
 import pandas as pd
+import numpy as np
+import pytz
 
 import pytest
 
@@ -24,3 +28,27 @@ def test_import_csv(thermostat_type_1):
 
     assert_is_series_with_shape(thermostat_type_1.temperature_in, (35064,))
     assert_is_series_with_shape(thermostat_type_1.temperature_out, (35064,))
+
+
+def test_get_single_thermostat_station_temperatures(thermostat_type_1):
+    interval_data_filename = get_data_path(
+        "data/thermostat_8465829e-df0d-449e-97bf-96317c24dec3.csv")
+
+    start, end = _get_utc_hour_range(interval_data_filename, "-7")
+    assert start == pd.Timestamp("2011-01-01 07:00", tz=pytz.UTC)
+    assert end == pd.Timestamp("2015-01-01 06:00", tz=pytz.UTC)
+
+    # temperatures covering more than the needed range are sliced.
+    index = pd.date_range(start="2010-12-31", end="2015-01-02", freq="H", tz=pytz.UTC)
+    station_temperatures = {
+        thermostat_type_1.station: pd.Series(np.arange(index.shape[0], dtype=float), index)
+    }
+
+    thermostat = get_single_thermostat(
+        thermostat_type_1.thermostat_id, "62223", 1, "-7",
+        interval_data_filename, station_temperatures=station_temperatures)
+
+    assert thermostat.temperature_out.shape == (35064,)
+    assert thermostat.temperature_out.index.equals(thermostat_type_1.temperature_out.index)
+    assert thermostat.temperature_out.iloc[0] == 31
+    assert thermostat.temperature_out.iloc[-1] == 31 + 35063
@@ -64,6 +64,61 @@ def test_calculate_epa_field_savings_metrics_type_5(thermostat_type_5):
     metrics_type_5 = thermostat_type_5.calculate_epa_field_savings_metrics()
     assert len(metrics_type_5) == 1
 
+def test_calculate_epa_field_savings_metrics_thresholds(thermostat_type_1):
+    metrics = thermostat_type_1.calculate_epa_field_savings_metrics(
+            min_minutes_heating=60, min_minutes_cooling=60)
+    assert metrics[0]["n_core_cooling_days"] <= \
+        thermostat_type_1.get_core_day_set_n_days(thermostat_type_1.get_core_cooling_days()[0])
+    assert metrics[1]["n_core_heating_days"] <= \
+        thermostat_type_1.get_core_day_set_n_days(thermostat_type_1.get_core_heating_days()[0])
+
+def test_calculate_epa_field_savings_metrics_sweep(thermostat_type_1):
+    thresholds = {
+        "min_minutes_heating": [30, 60],
+        "min_minutes_cooling": [15, 30, 45],
+    }
+    df = thermostat_type_1.calculate_epa_field_savings_metrics_sweep(thresholds)
+
+    # one cooling and one heating row per grid point
+    assert df.shape[0] == 12
+    assert list(df.columns[:4]) == [
+        "min_minutes_heating", "max_minutes_cooling",
+        "min_minutes_cooling", "max_minutes_heating"]
+
+    for min_minutes_heating in [30, 60]:
+        for min_minutes_cooling in [15, 30, 45]:
+            rows = df[(df.min_minutes_heating == min_minutes_heating) &
+                      (df.min_minutes_cooling == min_minutes_cooling)]
+            assert (rows.max_minutes_cooling == 0).all()
+            assert (rows.max_minutes_heating == 0).all()
+            expected = thermostat_type_1.calculate_epa_field_savings_metrics(
+                min_minutes_heating=min_minutes_heating,
+                min_minutes_cooling=min_minutes_cooling)
+            assert len(expected) == rows.shape[0]
+            for (_, row), outputs in zip(rows.iterrows(), expected):
+                for key, value in outputs.items():
+                    if value is None:
+                        assert pd.isnull(row[key])
+                    elif isinstance(value, six.string_types):
+                        assert row[key] == value
+                    else:
+                        assert_allclose(row[key], value)
+
+    # grid points given explicitly
+    df_points = thermostat_type_1.calculate_epa_field_savings_metrics_sweep([
+        {"min_minutes_heating": 60, "min_minutes_cooling": 45},
+        {},
+    ])
+    assert df_points.shape[0] == 4
+    assert list(df_points.min_minutes_heating) == [60, 60, 30, 30]
+    assert_allclose(df_points.tau.values[2:],
+        df[(df.min_minutes_heating == 30) & (df.min_minutes_cooling == 30)].tau.values)
+
+def test_calculate_epa_field_savings_metrics_sweep_bad_threshold(thermostat_type_1):
+    with pytest.raises(ValueError):
+        thermostat_type_1.calculate_epa_field_savings_metrics_sweep(
+            {"min_minutes_heat": [30, 60]})
+
 def test_metrics_to_csv(metrics_type_1):
 
     fd, fname = tempfile.mkstemp()
@@ -0,0 +1,78 @@
+from thermostat.panel import ThermostatPanel, calculate_epa_field_savings_metrics
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pytest
+
+from fixtures.thermostats import thermostat_type_1
+from fixtures.thermostats import thermostat_type_2
+from fixtures.thermostats import thermostat_type_3
+from fixtures.thermostats import thermostat_type_4
+from fixtures.thermostats import thermostat_type_5
+import six
+
+RTOL = 1e-6
+ATOL = 1e-6
+
+
+@pytest.fixture
+def thermostats(thermostat_type_1, thermostat_type_2, thermostat_type_3,
+        thermostat_type_4, thermostat_type_5):
+    return [thermostat_type_1, thermostat_type_2, thermostat_type_3,
+            thermostat_type_4, thermostat_type_5]
+
+
+@pytest.fixture(params=[
+    ("entire_dataset", "entire_dataset"),
+    ("year_end_to_end", "year_mid_to_mid"),
+])
+def core_day_set_methods(request):
+    return request.param
+
+
+def test_calculate_epa_field_savings_metrics(thermostats, core_day_set_methods):
+    cooling_method, heating_method = core_day_set_methods
+
+    expected = []
+    for thermostat in thermostats:
+        expected.extend(thermostat.calculate_epa_field_savings_metrics(
+            core_cooling_day_set_method=cooling_method,
+            core_heating_day_set_method=heating_method))
+
+    metrics = calculate_epa_field_savings_metrics(thermostats,
+            core_cooling_day_set_method=cooling_method,
+            core_heating_day_set_method=heating_method,
+            chunksize=2)
+
+    assert len(metrics) == len(expected)
+    for outputs, expected_outputs in zip(metrics, expected):
+        assert set(outputs.keys()) == set(expected_outputs.keys())
+        for key, expected_value in expected_outputs.items():
+            value = outputs[key]
+            if expected_value is None or isinstance(expected_value, six.string_types):
+                assert value == expected_value
+            else:
+                assert_allclose(value, expected_value, rtol=RTOL, atol=ATOL)
+
+
+def test_get_core_day_sets(thermostat_type_1):
+    panel = ThermostatPanel([thermostat_type_1])
+
+    thermostat_index, names, start, end, in_range, core_days = \
+        panel.get_core_day_sets("heating", method="year_mid_to_mid")
+    core_day_sets = thermostat_type_1.get_core_heating_days(method="year_mid_to_mid")
+
+    assert list(thermostat_index) == [0] * len(core_day_sets)
+    assert names == [cds.name for cds in core_day_sets]
+    for i, cds in enumerate(core_day_sets):
+        assert (core_days[i] == cds.daily.values).all()
+
+    with pytest.raises(NotImplementedError):
+        panel.get_core_day_sets("heating", method="year_end_to_end")
+    with pytest.raises(NotImplementedError):
+        panel.get_core_day_sets("other")
+
+
+def test_empty_panel():
+    assert calculate_epa_field_savings_metrics([]) == []
@@ -0,0 +1,96 @@
+from thermostat.quantiles import group_quantiles
+
+import pandas as pd
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pytest
+
+Q = [0., .1, .25, .5, .9, 1.]
+
+
+@pytest.fixture
+def quantized():
+    np.random.seed(0)
+    values = np.round(np.random.normal(68, 4, size=5000) * 2) / 2
+    values[np.random.rand(5000) < 0.05] = np.nan
+    groups = np.random.randint(0, 6, size=5000)
+    groups[groups == 4] = 3  # group 4 is empty
+    return values, groups
+
+
+def _pandas_quantiles(values, groups, n_groups, q):
+    quantiles = np.tile(np.nan, (n_groups, len(q)))
+    for g in range(n_groups):
+        group_values = pd.Series(values[groups == g]).dropna()
+        if group_values.shape[0] > 0:
+            quantiles[g] = [group_values.quantile(q_) for q_ in q]
+    return quantiles
+
+
+def test_group_quantiles_histogram(quantized):
+    values, groups = quantized
+    quantiles = group_quantiles(values, Q, groups, 6, resolution=0.5)
+    expected = _pandas_quantiles(values, groups, 6, Q)
+
+    assert quantiles.shape == (6, 6)
+    assert np.all(np.isnan(quantiles[4]))
+    # identical, not just close
+    assert np.array_equal(quantiles[~np.isnan(expected)], expected[~np.isnan(expected)])
+
+
+def test_group_quantiles_sorted(quantized):
+    values, groups = quantized
+    values = values + np.random.rand(values.shape[0]) * 0.1
+    expected = _pandas_quantiles(values, groups, 6, Q)
+
+    # values which aren't multiples of the resolution are sorted instead.
+    for resolution in [None, 0.5]:
+        quantiles = group_quantiles(values, Q, groups, 6, resolution=resolution)
+        assert_allclose(quantiles, expected)
+
+
+def test_group_quantiles_order(quantized):
+    values, groups = quantized
+    values = values + np.random.rand(values.shape[0]) * 0.1
+    expected = _pandas_quantiles(values, groups, 6, Q)
+
+    non_null = np.flatnonzero(~np.isnan(values))
+    order = non_null[np.argsort(values[non_null])]
+    quantiles = group_quantiles(values, Q, groups, 6, order=order)
+    assert_allclose(quantiles, expected)
+
+
+def test_group_quantiles_single_group():
+    values = np.array([70., 68.5, np.nan, 72., 71.5])
+    quantiles = group_quantiles(values, .1, resolution=0.5)
+    assert quantiles.shape == (1, 1)
+    assert quantiles[0, 0] == pd.Series(values).dropna().quantile(.1)
+
+    # widely spread values are sorted rather than counted
+    values = np.array([-1e6, 0., 1e6])
+    assert_allclose(group_quantiles(values, [.5, 1.], resolution=0.5), [[0., 1e6]])
+
+
+@pytest.mark.parametrize("values, q, expected", [
+    ([60., 60.5, 61.], .9, 60.9),
+    ([68., 68.5], .2, 68.1),
+    ([68., 68.5], .3, 68.15),
+    ([65., 66., 66.5, 67.], .1, 65.3),
+    ([65., 66., 66.5, 67.], .3, 65.9),
+])
+def test_group_quantiles_exact(values, q, expected):
+    # interpolated exactly as numpy's linear method, not just up to rounding
+    values = np.array(values)
+    order = np.argsort(values)
+    for quantiles in [group_quantiles(values, q, resolution=0.5),
+                      group_quantiles(values, q),
+                      group_quantiles(values, q, order=order)]:
+        assert quantiles[0, 0] == expected
+
+
+def test_group_quantiles_empty():
+    quantiles = group_quantiles(np.empty((0,)), [.1, .9], np.empty((0,), dtype=int),
+                                2, resolution=0.5)
+    assert quantiles.shape == (2, 2)
+    assert np.all(np.isnan(quantiles))
@@ -0,0 +1,49 @@
+from thermostat import resources
+
+import numpy as np
+
+
+def test_climate_zone_mapping():
+    mapping = resources.get_climate_zone_mapping()
+    assert mapping["00601"] == "Hot-Humid"
+    assert mapping["62223"] == "Mixed-Humid"
+
+    # loaded once
+    assert resources.get_climate_zone_mapping() is mapping
+
+
+def test_climate_zone_codes():
+    climate_zones, codes = resources.get_climate_zone_codes()
+    assert climate_zones == [
+        'Hot-Humid', 'Marine', 'Mixed-Dry/Hot-Dry', 'Mixed-Humid', 'Very-Cold/Cold']
+    assert codes.shape == (100000,)
+    assert codes.dtype == np.uint8
+    assert climate_zones[codes[601] - 1] == "Hot-Humid"
+    assert codes[0] == 0
+
+
+def test_get_climate_zones():
+    mapping = resources.get_climate_zone_mapping()
+    zipcodes = ["00601", "62223", "00000", "123", "abcde", "94709"]
+    assert resources.get_climate_zones(zipcodes) == [mapping.get(z) for z in zipcodes]
+
+
+def test_regional_baseline_temps():
+    cooling, heating = resources.get_regional_baseline_temps()
+    assert cooling["Mixed-Humid"] == 73
+    assert cooling["Marine"] is None
+    assert heating["Marine"] == 67
+
+
+def test_climate_zone_weights():
+    heating_weights, cooling_weights = resources.get_climate_zone_weights()
+    assert set(heating_weights.keys()) == set(cooling_weights.keys()) == set(
+        resources.get_climate_zone_codes()[0])
+    np.testing.assert_allclose(sum(heating_weights.values()), 1.0)
+
+
+def test_load_all():
+    resources.load_all()
+    assert resources.climate_zone_codes is not None
+    assert resources.regional_baseline_temps is not None
+    assert resources.climate_zone_weights is not None
@@ -0,0 +1,112 @@
+from thermostat.solvers import fit_tau, fit_tau_batch, fit_tau_stacked, daily_demand
+
+import numpy as np
+from numpy.testing import assert_allclose
+from scipy.optimize import leastsq
+
+import pytest
+
+RTOL = 1e-3
+ATOL = 1e-3
+
+
+@pytest.fixture(params=["heating", "cooling"])
+def heating_or_cooling(request):
+    return request.param
+
+
+@pytest.fixture
+def deltaT():
+    np.random.seed(0)
+    deltaT = np.random.normal(0, 10, size=(60, 24)).round(1)
+    deltaT[np.random.rand(60, 24) < 0.02] = np.nan
+    return deltaT
+
+
+def test_fit_tau_exact(deltaT, heating_or_cooling):
+    daily_runtime = 30 * daily_demand(deltaT, 2.5, heating_or_cooling)
+    tau = fit_tau(deltaT, daily_runtime, heating_or_cooling)
+    assert_allclose(tau, 2.5, rtol=RTOL, atol=ATOL)
+
+
+def test_fit_tau_matches_leastsq(deltaT, heating_or_cooling):
+    np.random.seed(1)
+    daily_runtime = 30 * daily_demand(deltaT, -1.5, heating_or_cooling) + \
+        np.random.normal(0, 5, size=60)
+
+    def errors(tau):
+        demand = daily_demand(deltaT, tau, heating_or_cooling)
+        alpha = daily_runtime.sum() / demand.sum()
+        return daily_runtime - alpha * demand
+
+    tau_leastsq = leastsq(errors, 0)[0][0]
+    tau = fit_tau(deltaT, daily_runtime, heating_or_cooling)
+
+    assert_allclose(tau, tau_leastsq, rtol=RTOL, atol=ATOL)
+    assert np.sum(errors(tau) ** 2) <= np.sum(errors(tau_leastsq) ** 2) + 1e-6
+
+
+def test_fit_tau_single_day(heating_or_cooling):
+    # any tau fits the runtime of a single day exactly, so 0 is taken if
+    # demand isn't zero there, as least squares from 0 did.
+    deltaT = np.linspace(-5.5, 6., 24).reshape((1, 24))
+    tau = fit_tau(deltaT, np.array([120.]), heating_or_cooling)
+    assert tau == 0
+    assert daily_demand(deltaT, tau, heating_or_cooling)[0] > 0
+
+    # otherwise, the nearest breakpoint at which demand isn't zero
+    sign = 1 if heating_or_cooling == "cooling" else -1
+    deltaT = deltaT + sign * 10
+    tau = fit_tau(deltaT, np.array([120.]), heating_or_cooling)
+    assert tau == (deltaT[0, 1] if sign == 1 else deltaT[0, -2])
+    assert daily_demand(deltaT, tau, heating_or_cooling)[0] > 0
+
+
+def test_fit_tau_empty(heating_or_cooling):
+    tau = fit_tau(np.empty((0, 24)), np.empty((0,)), heating_or_cooling)
+    assert np.isnan(tau)
+
+
+def test_fit_tau_bad_method(deltaT):
+    with pytest.raises(NotImplementedError):
+        fit_tau(deltaT, np.ones(60), "other")
+
+
+def test_fit_tau_batch(deltaT, heating_or_cooling):
+    np.random.seed(2)
+    deltaTs, daily_runtimes = [], []
+    for i in range(1, 20):
+        fit_deltaT = deltaT[:i * 3] + np.random.normal(0, 5)
+        daily_runtime = 30 * daily_demand(fit_deltaT, 1.0, heating_or_cooling) + \
+            np.random.normal(0, 5, size=fit_deltaT.shape[0])
+        deltaTs.append(fit_deltaT)
+        daily_runtimes.append(daily_runtime)
+    deltaTs.append(np.empty((0, 24)))
+    daily_runtimes.append(np.empty((0,)))
+
+    taus = fit_tau_batch(deltaTs, daily_runtimes, heating_or_cooling)
+
+    assert taus.shape == (20,)
+    for tau, fit_deltaT, daily_runtime in zip(taus[:-1], deltaTs, daily_runtimes):
+        assert_allclose(tau, fit_tau(fit_deltaT, daily_runtime, heating_or_cooling))
+    assert np.isnan(taus[-1])
+
+
+def test_fit_tau_batch_empty(heating_or_cooling):
+    taus = fit_tau_batch([], [], heating_or_cooling)
+    assert taus.shape == (0,)
+
+
+def test_fit_tau_stacked(deltaT, heating_or_cooling):
+    np.random.seed(3)
+    day_fit = np.random.randint(0, 3, size=60)
+    daily_runtime = 30 * daily_demand(deltaT, 1.0, heating_or_cooling) + \
+        np.random.normal(0, 5, size=60)
+
+    taus = fit_tau_stacked(deltaT, daily_runtime, day_fit, 4, heating_or_cooling)
+
+    assert taus.shape == (4,)
+    for i in range(3):
+        days = day_fit == i
+        assert_allclose(taus[i], fit_tau(deltaT[days], daily_runtime[days], heating_or_cooling))
+    assert np.isnan(taus[3])
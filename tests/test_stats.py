@@ -1,10 +1,17 @@
 from thermostat.stats import combine_output_dataframes
 from thermostat.stats import compute_summary_statistics
+from thermostat.stats import get_filtered_stats
+from thermostat.stats import accumulate_summary_statistics
+from thermostat.stats import merge_summary_statistics_accumulators
+from thermostat.stats import SummaryStatisticsAccumulator
+from thermostat.stats import SummaryStatisticsCube
+from thermostat.stats import REAL_OR_INTEGER_VALUED_COLUMNS_HEATING
 from thermostat.stats import summary_statistics_to_csv
 
 from scipy.stats import norm, randint
 import pandas as pd
 import numpy as np
+from numpy.testing import assert_allclose
 import json
 from datetime import datetime
 
@@ -191,6 +198,178 @@ def test_compute_summary_statistics_advanced(combined_dataframe):
         593, 397, 593, 397, 593, 397, 593, 397,
     ]
 
+def test_compute_summary_statistics_bootstrap(tmpdir):
+    # seeded, so that the test doesn't depend on which tests ran before
+    np.random.seed(0)
+    combined_dataframe = get_fake_output_df(300)
+    climate_zones = ["Very-Cold/Cold", "Marine", "Hot-Humid"]
+    combined_dataframe["climate_zone"] = [
+        climate_zones[i % 3] for i in range(combined_dataframe.shape[0])]
+    expected = compute_summary_statistics(combined_dataframe)
+    summary_statistics = compute_summary_statistics(
+        combined_dataframe, bootstrap_samples=500, bootstrap_processes=1)
+    np.testing.assert_equal(summary_statistics[4:], expected[4:])
+
+    key = "percent_savings_baseline_percentile"
+    for stats, expected_stats in zip(summary_statistics[:4], expected[:4]):
+        assert stats["label"] == expected_stats["label"]
+        mean = stats["{}_mean_national_weighted_mean".format(key)]
+        assert mean == expected_stats["{}_mean_national_weighted_mean".format(key)]
+        if mean is None:
+            # no core day sets kept in any climate zone, so no bounds
+            assert "{}_q50_lower_bound_95_perc_conf_national_weighted_mean".format(key) not in stats
+            continue
+        lower_bound = stats["{}_lower_bound_95_perc_conf_national_weighted_mean".format(key)]
+        upper_bound = stats["{}_upper_bound_95_perc_conf_national_weighted_mean".format(key)]
+        assert lower_bound < mean < upper_bound
+        q50 = stats["{}_q50_national_weighted_mean".format(key)]
+        assert stats["{}_q50_lower_bound_95_perc_conf_national_weighted_mean".format(key)] <= q50
+        assert stats["{}_q50_upper_bound_95_perc_conf_national_weighted_mean".format(key)] >= q50
+
+    # the same resamples are drawn by any number of processes
+    in_parallel = compute_summary_statistics(
+        combined_dataframe, bootstrap_samples=500, bootstrap_processes=2)
+    np.testing.assert_equal(in_parallel, summary_statistics)
+
+    stats_df = summary_statistics_to_csv(summary_statistics, str(tmpdir.join("stats.csv")), "FAKE")
+    assert "{}_q50_lower_bound_95_perc_conf_national_weighted_mean".format(key) in stats_df.index
+
+def test_get_filtered_stats(combined_dataframe):
+    tau = combined_dataframe["tau"]
+    stats = get_filtered_stats(
+        combined_dataframe, lambda df: (df["tau"] > 0).values, "all",
+        "heating", ["tau"], "baseline_percentile")
+    assert len(stats) == 1
+    assert stats[0]["label"] == "all_heating"
+    assert stats[0]["n_thermostat_core_day_sets_total"] == 100
+    assert stats[0]["n_thermostat_core_day_sets_kept"] == (tau > 0).sum()
+    expected = tau[(tau > 0) & np.isfinite(tau)]
+    assert stats[0]["tau_n"] == expected.shape[0]
+    np.testing.assert_allclose(stats[0]["tau_mean"], expected.mean())
+    np.testing.assert_allclose(stats[0]["tau_q50"], expected.median())
+
+def test_compute_summary_statistics_climate_zones(combined_dataframe):
+    climate_zones = ["Very-Cold/Cold", "Mixed-Humid", "Marine", None]
+    combined_dataframe["climate_zone"] = [
+        climate_zones[i % 4] for i in range(combined_dataframe.shape[0])]
+    summary_statistics = compute_summary_statistics(combined_dataframe)
+    stats_by_label = {s["label"]: s for s in summary_statistics}
+    assert "hot-humid_no_filter_heating" not in stats_by_label
+
+    heating_df = combined_dataframe[
+        combined_dataframe.heating_or_cooling.str.contains("heating")]
+    marine_df = heating_df[heating_df.climate_zone == "Marine"]
+    expected, = get_filtered_stats(
+        marine_df, lambda df: np.ones(df.shape[0], dtype=bool), "marine_no_filter",
+        "heating", REAL_OR_INTEGER_VALUED_COLUMNS_HEATING, "baseline_percentile")
+    stats = stats_by_label["marine_no_filter_heating"]
+    assert list(stats.keys()) == list(expected.keys())
+    for key, value in expected.items():
+        if key not in ["label", "sw_version"]:
+            np.testing.assert_allclose(stats[key], value)
+
+def _exact_savings_bounds(df):
+    savings_bounds = {}
+    zones = [("all", ""), ("very-cold_cold", "Very-Cold/Cold"), ("marine", "Marine")]
+    for zone_label, climate_zone in zones:
+        for season in ["heating", "cooling"]:
+            savings = df[df.climate_zone.fillna("").str.contains(climate_zone) &
+                         df.heating_or_cooling.str.contains(season)]
+            savings = savings["percent_savings_baseline_percentile"].dropna()
+            savings_bounds[(zone_label, season)] = \
+                (savings.quantile(0.01), savings.quantile(0.99))
+    return savings_bounds
+
+def test_accumulate_summary_statistics(combined_dataframe, tmpdir):
+    climate_zones = ["Very-Cold/Cold", "Marine", None]
+    combined_dataframe["climate_zone"] = [
+        climate_zones[i % 3] for i in range(combined_dataframe.shape[0])]
+    savings_bounds = _exact_savings_bounds(combined_dataframe)
+
+    filenames = []
+    for i, batch in enumerate([combined_dataframe.iloc[:30], combined_dataframe.iloc[30:]]):
+        accumulator = accumulate_summary_statistics(
+            batch, advanced_filtering=True, savings_bounds=savings_bounds)
+        filenames.append(str(tmpdir.join("accumulator_{}.json".format(i))))
+        accumulator.to_json(filenames[-1])
+    accumulator = merge_summary_statistics_accumulators(
+        [SummaryStatisticsAccumulator.from_json(f) for f in filenames[::-1]])
+
+    expected = compute_summary_statistics(combined_dataframe, advanced_filtering=True)
+    summary_statistics = accumulator.compute_summary_statistics()
+    assert [s["label"] for s in summary_statistics] == [s["label"] for s in expected]
+
+    for stats, expected_stats in zip(summary_statistics, expected):
+        assert list(stats.keys()) == list(expected_stats.keys())
+        for key, value in expected_stats.items():
+            if key in ["label", "sw_version"] or value is None:
+                assert stats[key] == value
+            elif "_q" in key:
+                # deciles are estimated
+                assert_allclose(stats[key], value, rtol=0.05, atol=0.05)
+            else:
+                assert_allclose(stats[key], value, rtol=1e-9)
+
+def test_accumulate_summary_statistics_savings_bounds(combined_dataframe):
+    accumulator = accumulate_summary_statistics(combined_dataframe)
+    labels = [s["label"] for s in accumulator.compute_summary_statistics()]
+    assert "all_tau_cvrmse_savings_p01_filter_heating" not in labels
+
+    savings_bounds = accumulator.get_savings_bounds()
+    heating = combined_dataframe[combined_dataframe.heating_or_cooling.str.contains("heating")]
+    savings = heating["percent_savings_baseline_percentile"]
+    savings = savings[np.isfinite(savings)]
+    assert_allclose(savings_bounds[("all", "heating")],
+                    [savings.quantile(0.01), savings.quantile(0.99)], rtol=0.01)
+
+    with pytest.raises(ValueError):
+        accumulator.merge(accumulate_summary_statistics(
+            combined_dataframe, savings_bounds=savings_bounds))
+
+def test_summary_statistics_cube(combined_dataframe):
+    combined_dataframe["equipment_type"] = [i % 3 for i in range(100)]
+    combined_dataframe.loc[:9, "equipment_type"] = None
+    zipcode_prefix = combined_dataframe.zipcode.str[:2].rename("zipcode_prefix")
+    cube = SummaryStatisticsCube(combined_dataframe, ["tau", "alpha"])
+
+    stats = cube.rollup(["equipment_type", zipcode_prefix])
+    assert list(stats.columns[:3]) == [
+        "equipment_type", "zipcode_prefix", "n_thermostat_core_day_sets"]
+    assert list(stats.columns[3:8]) == [
+        "tau_n", "tau_upper_bound_95_perc_conf", "tau_mean",
+        "tau_lower_bound_95_perc_conf", "tau_sem"]
+    # total, then 3 equipment types, then 3 x 8 combinations
+    assert stats.shape == (1 + 3 + 24, 3 + 2 * 14)
+    assert stats.iloc[0].equipment_type is None
+    assert stats.n_thermostat_core_day_sets.iloc[0] == 90
+    assert list(stats.equipment_type.iloc[1:4]) == [0, 1, 2]
+
+    def _expected(df):
+        expected, = get_filtered_stats(
+            df, lambda df: np.ones(df.shape[0], dtype=bool), "label", "heating",
+            ["tau", "alpha"], "baseline_percentile")
+        return expected
+
+    groups = [
+        (stats.iloc[0], combined_dataframe.iloc[10:]),
+        (stats.iloc[2], combined_dataframe[combined_dataframe.equipment_type == 1]),
+        (stats[(stats.equipment_type == 2) & (stats.zipcode_prefix == "12")].iloc[0],
+         combined_dataframe[(combined_dataframe.equipment_type == 2) & (zipcode_prefix == "12")]),
+    ]
+    for row, df in groups:
+        expected = _expected(df)
+        assert row.n_thermostat_core_day_sets == df.shape[0]
+        for column in stats.columns[3:]:
+            assert_allclose(row[column], expected[column])
+
+    # cached sorted values are reused by further rollups
+    stats = cube.rollup(["zipcode"])
+    assert stats.shape == (1 + 8, 2 + 2 * 14)
+    assert stats.n_thermostat_core_day_sets.iloc[0] == 100
+
+    with pytest.raises(ValueError):
+        cube.rollup([pd.Series(combined_dataframe.zipcode.values)])
+
 def test_summary_statistics_to_csv(combined_dataframe):
     summary_statistics = compute_summary_statistics(combined_dataframe)
 
@@ -0,0 +1,339 @@
+from thermostat.weather import (
+    WeatherSource,
+    LocalDirectoryWeatherSource,
+    HTTPWeatherSource,
+    MemmapWeatherStore,
+)
+from thermostat.importers import from_csv, prefetch_weather
+from thermostat.util.testing import get_data_path
+
+from eemeter.weather.location import zipcode_to_usaf_station
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+except ImportError:  # python 2
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+
+import pandas as pd
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pytest
+
+
+class SyntheticWeatherSource(WeatherSource):
+
+    def indexed_temperatures(self, station, index):
+        hours = index.asi8 // (3600 * 10 ** 9)
+        temperatures = 50. + (hours % 100) / 10.
+        temperatures[hours % 37 == 0] = np.nan
+        return pd.Series(temperatures, index=index)
+
+
+@pytest.fixture
+def local_weather_source(tmpdir):
+    weather_source = LocalDirectoryWeatherSource(str(tmpdir), cache_size=2)
+    for year in range(2011, 2016):
+        weather_source.stage(SyntheticWeatherSource(), "722880", year)
+    return weather_source
+
+
+def test_local_directory_weather_source(local_weather_source):
+    index = pd.date_range("2011-12-31 20:00", "2013-01-01 03:00", freq="H", tz="UTC")
+    temperatures = local_weather_source.indexed_temperatures("722880", index)
+    expected = SyntheticWeatherSource().indexed_temperatures("722880", index)
+
+    assert temperatures.index.equals(index)
+    assert_allclose(temperatures.values, expected.values)
+
+    # timezone-aware indexes in other timezones are converted to UTC.
+    index_local = index.tz_convert("US/Pacific")
+    temperatures = local_weather_source.indexed_temperatures("722880", index_local)
+    assert_allclose(temperatures.values, expected.values)
+
+
+def test_local_directory_weather_source_lru(local_weather_source):
+    index = pd.date_range("2011-01-01", "2014-01-01", freq="H", tz="UTC")
+    local_weather_source.indexed_temperatures("722880", index)
+    assert list(local_weather_source._cache.keys()) == [("722880", 2013), ("722880", 2014)]
+
+    index = pd.date_range("2013-06-01", periods=24, freq="H", tz="UTC")
+    local_weather_source.indexed_temperatures("722880", index)
+    assert list(local_weather_source._cache.keys()) == [("722880", 2014), ("722880", 2013)]
+
+
+def test_local_directory_weather_source_missing(local_weather_source):
+    index = pd.date_range("2016-01-01", periods=24, freq="H", tz="UTC")
+    with pytest.raises(ValueError):
+        local_weather_source.indexed_temperatures("722880", index)
+
+    index = pd.date_range("2016-01-01", periods=0, freq="H", tz="UTC")
+    temperatures = local_weather_source.indexed_temperatures("722880", index)
+    assert temperatures.shape == (0,)
+
+
+def test_from_csv_local_directory_weather_source(tmpdir):
+    station = zipcode_to_usaf_station("62223")
+    weather_source = LocalDirectoryWeatherSource(str(tmpdir))
+    for year in range(2011, 2016):
+        weather_source.stage(SyntheticWeatherSource(), station, year)
+
+    thermostats = list(from_csv(get_data_path("data/metadata_type_1_single.csv"),
+                                weather_source=weather_source))
+    assert len(thermostats) == 1
+
+    temp_out = thermostats[0].temperature_out
+    index_utc = temp_out.index.tz_localize("UTC") + pd.Timedelta(hours=7)
+    expected = SyntheticWeatherSource().indexed_temperatures(station, index_utc)
+    # nulls are interpolated by the thermostat
+    has_data = pd.notnull(expected.values)
+    assert_allclose(temp_out.values[has_data], expected.values[has_data])
+
+
+def test_memmap_weather_store(tmpdir):
+    store = MemmapWeatherStore(str(tmpdir), SyntheticWeatherSource())
+    index = pd.date_range("2011-12-31 20:00", "2013-01-01 03:00", freq="H", tz="UTC")
+    temperatures = store.indexed_temperatures("722880", index)
+    expected = SyntheticWeatherSource().indexed_temperatures("722880", index)
+
+    assert temperatures.index.equals(index)
+    assert_allclose(temperatures.values, expected.values, rtol=1e-6)
+
+    # a new store over the same directory reads from disk without a source.
+    store = MemmapWeatherStore(str(tmpdir))
+    temperatures = store.indexed_temperatures("722880", index)
+    assert_allclose(temperatures.values, expected.values, rtol=1e-6)
+
+    with open(str(tmpdir.join("index.json"))) as f:
+        store_index = json.load(f)
+    assert sorted(store_index.keys()) == ["722880-2011", "722880-2012", "722880-2013"]
+    assert store_index["722880-2012"]["bytes"] == 366 * 24 * 4
+
+
+def test_memmap_weather_store_eviction(tmpdir):
+    year_bytes = 366 * 24 * 4
+    store = MemmapWeatherStore(str(tmpdir), SyntheticWeatherSource(),
+                               max_bytes=2 * year_bytes)
+    for year in [2011, 2012, 2013]:
+        index = pd.date_range("{}-06-01".format(year), periods=24, freq="H", tz="UTC")
+        store.indexed_temperatures("722880", index)
+
+    assert sorted(f for f in os.listdir(str(tmpdir)) if f.endswith(".f32")) == \
+        ["722880-2012.f32", "722880-2013.f32"]
+    with open(str(tmpdir.join("index.json"))) as f:
+        assert sorted(json.load(f).keys()) == ["722880-2012", "722880-2013"]
+
+
+def _read_memmap_weather_store(directory, year):
+    store = MemmapWeatherStore(directory, SyntheticWeatherSource())
+    index = pd.date_range("{}-06-01".format(year), periods=24, freq="H", tz="UTC")
+    store.indexed_temperatures("722880", index)
+
+
+def test_memmap_weather_store_processes(tmpdir):
+    # station-years added by processes at the same time are all indexed.
+    years = list(range(2001, 2017))
+    processes = [
+        multiprocessing.Process(target=_read_memmap_weather_store,
+                                args=(str(tmpdir), year))
+        for year in years
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    with open(str(tmpdir.join("index.json"))) as f:
+        assert sorted(json.load(f).keys()) == \
+            ["722880-{}".format(year) for year in years]
+
+
+def test_memmap_weather_store_last_used(tmpdir):
+    store = MemmapWeatherStore(str(tmpdir), SyntheticWeatherSource())
+    index = pd.date_range("2011-06-01", periods=24, freq="H", tz="UTC")
+
+    def get_last_used():
+        store.indexed_temperatures("722880", index)
+        with open(str(tmpdir.join("index.json"))) as f:
+            return json.load(f)["722880-2011"]["last_used"]
+
+    last_used = get_last_used()
+    time.sleep(.01)
+    # station-years held open are not recorded again until due.
+    assert get_last_used() == last_used
+
+    store.USE_REFRESH_SECONDS = 0
+    assert get_last_used() > last_used
+
+
+def test_memmap_weather_store_max_open(tmpdir):
+    store = MemmapWeatherStore(str(tmpdir), SyntheticWeatherSource())
+    store.MAX_OPEN_STATION_YEARS = 2
+    for year in [2011, 2012, 2013, 2012]:
+        index = pd.date_range("{}-06-01".format(year), periods=24, freq="H", tz="UTC")
+        store.indexed_temperatures("722880", index)
+    assert list(store._memmaps.keys()) == ["722880-2013", "722880-2012"]
+    assert sorted(store._last_recorded.keys()) == ["722880-2012", "722880-2013"]
+
+
+def test_memmap_weather_store_removed(tmpdir):
+    # station-years removed by another process are fetched again.
+    store = MemmapWeatherStore(str(tmpdir), SyntheticWeatherSource())
+    store.USE_REFRESH_SECONDS = 0
+    index = pd.date_range("2011-06-01", periods=24, freq="H", tz="UTC")
+    expected = store.indexed_temperatures("722880", index)
+    os.remove(str(tmpdir.join("722880-2011.f32")))
+    assert_allclose(store.indexed_temperatures("722880", index).values,
+                    expected.values)
+
+    # ... including when removed between fetching and opening.
+    fetch = store._fetch
+
+    def fetch_and_remove(station, year, key):
+        fetch(station, year, key)
+        if fetch_and_remove.calls == 0:
+            os.remove(store._get_filename(key))
+        fetch_and_remove.calls += 1
+    fetch_and_remove.calls = 0
+    store._fetch = fetch_and_remove
+    os.remove(str(tmpdir.join("722880-2011.f32")))
+    assert_allclose(store.indexed_temperatures("722880", index).values,
+                    expected.values)
+    assert fetch_and_remove.calls == 2
+
+
+def test_memmap_weather_store_missing(tmpdir):
+    store = MemmapWeatherStore(str(tmpdir))
+    index = pd.date_range("2016-01-01", periods=24, freq="H", tz="UTC")
+    with pytest.raises(ValueError):
+        store.indexed_temperatures("722880", index)
+
+
+@pytest.fixture
+def prefetch_metadata_filename(tmpdir):
+    # a few thermostats at different stations
+    metadata = pd.read_csv(get_data_path("data/metadata.csv"), dtype={"zipcode": str}).iloc[:3]
+    metadata["interval_data_filename"] = [
+        get_data_path(os.path.join("data", f)) for f in metadata.interval_data_filename]
+    metadata_filename = str(tmpdir.join("metadata.csv"))
+    metadata.to_csv(metadata_filename, index=False)
+    return metadata_filename
+
+
+def test_from_csv_unavailable_station(tmpdir, prefetch_metadata_filename):
+    # two thermostats on a station without data, among others with data.
+    metadata = pd.read_csv(prefetch_metadata_filename, dtype={"zipcode": str})
+    metadata = pd.concat([metadata.iloc[:1], metadata], ignore_index=True)
+    metadata.loc[0, "thermostat_id"] = "{}_copy".format(metadata.thermostat_id[0])
+    metadata_filename = str(tmpdir.join("metadata_unavailable.csv"))
+    metadata.to_csv(metadata_filename, index=False)
+
+    stations = [zipcode_to_usaf_station(z) for z in metadata.zipcode]
+    weather_source = LocalDirectoryWeatherSource(str(tmpdir.mkdir("weather")))
+    for station in stations[2:]:
+        for year in range(2011, 2016):
+            weather_source.stage(SyntheticWeatherSource(), station, year)
+
+    with pytest.warns(UserWarning) as record:
+        thermostats = list(from_csv(metadata_filename, weather_source=weather_source))
+
+    assert [t.thermostat_id for t in thermostats] == list(metadata.thermostat_id[2:])
+    messages = [str(w.message) for w in record]
+    for thermostat_id in metadata.thermostat_id[:2]:
+        assert any("(id={})".format(thermostat_id) in m and stations[0] in m
+                   for m in messages)
+
+
+def test_from_csv_malformed_interval_data(tmpdir, prefetch_metadata_filename):
+    # a thermostat with a malformed interval data file, sharing its station
+    # with another, fails on its own.
+    metadata = pd.read_csv(prefetch_metadata_filename, dtype={"zipcode": str})
+    metadata = pd.concat([metadata.iloc[:2], metadata.iloc[:1], metadata.iloc[2:]],
+                         ignore_index=True)
+    metadata.loc[2, "thermostat_id"] = "malformed"
+    metadata.loc[2, "interval_data_filename"] = str(tmpdir.join("malformed.csv"))
+    with open(metadata.interval_data_filename[2], "w") as f:
+        f.write("date,cool_runtime\nnot a date,0\n")
+    metadata_filename = str(tmpdir.join("metadata_malformed.csv"))
+    metadata.to_csv(metadata_filename, index=False)
+
+    weather_source = LocalDirectoryWeatherSource(str(tmpdir.mkdir("weather")))
+    for zipcode in metadata.zipcode:
+        for year in range(2011, 2016):
+            weather_source.stage(SyntheticWeatherSource(),
+                                 zipcode_to_usaf_station(zipcode), year)
+
+    with pytest.warns(UserWarning) as record:
+        thermostats = list(from_csv(metadata_filename, weather_source=weather_source))
+
+    assert [t.thermostat_id for t in thermostats] == \
+        [i for i in metadata.thermostat_id if i != "malformed"]
+    assert any("(id=malformed)" in str(w.message) for w in record)
+
+
+@pytest.fixture
+def weather_server(tmpdir, prefetch_metadata_filename):
+    # serves staged station-year files, failing the first request for each
+    # station.
+    directory = str(tmpdir.mkdir("served"))
+    local_weather_source = LocalDirectoryWeatherSource(directory)
+    metadata = pd.read_csv(prefetch_metadata_filename, dtype={"zipcode": str})
+    stations = [zipcode_to_usaf_station(z) for z in metadata.zipcode]
+    for station in stations[1:]:
+        for year in range(2011, 2016):
+            local_weather_source.stage(SyntheticWeatherSource(), station, year)
+
+    requested = set()
+
+    class FlakyHandler(SimpleHTTPRequestHandler):
+
+        def translate_path(self, path):
+            return os.path.join(directory, path.lstrip("/"))
+
+        def do_GET(self):
+            station = self.path.lstrip("/").split("-")[0]
+            if station not in requested:
+                requested.add(station)
+                self.send_error(503)
+            else:
+                SimpleHTTPRequestHandler.do_GET(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1]), stations
+    server.shutdown()
+    server.server_close()
+
+
+def test_prefetch_weather(tmpdir, prefetch_metadata_filename, weather_server):
+    url, stations = weather_server
+    store_directory = str(tmpdir.join("store"))
+    weather_store = MemmapWeatherStore(store_directory, HTTPWeatherSource(url))
+
+    failures = prefetch_weather(prefetch_metadata_filename, weather_source=weather_store,
+                                max_concurrency=2, n_tries=2, backoff=0.)
+
+    # the first station isn't served; the rest succeed on retry.
+    assert list(failures.keys()) == [stations[0]]
+    assert isinstance(failures[stations[0]], ValueError)
+
+    # prefetched data is read from the store without the upstream source.
+    weather_store = MemmapWeatherStore(store_directory)
+    index = pd.date_range("2012-03-01", periods=48, freq="H", tz="UTC")
+    for station in stations[1:]:
+        temperatures = weather_store.indexed_temperatures(station, index)
+        expected = SyntheticWeatherSource().indexed_temperatures(station, index)
+        assert_allclose(temperatures.values, expected.values, rtol=1e-6)
@@ -0,0 +1,259 @@
+""" Summaries of sets of values which can be computed separately (e.g., in
+batches) and merged in any order, so that statistics of all values can be
+found without holding them in memory together.
+"""
+import numpy as np
+
+from thermostat.quantiles import lerp
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+MIN_VALUE = 1e-12
+
+# offset of bucket indexes in sketch codes, large enough that the codes of
+# negative values, zero and positive values sort in order of value.
+_CODE_OFFSET = 2 ** 40
+
+
+class MomentAccumulator(object):
+    """ Count, mean and sum of squared deviations from the mean of a set of
+    values. Accumulators of two sets are merged with the pairwise update of
+    Chan, Golub and LeVeque, so the result is the same, up to rounding, in
+    whatever order sets are merged.
+
+    Parameters
+    ----------
+    n : int, default: 0
+        Number of values.
+    mean : float, default: np.nan
+        Mean of the values.
+    m2 : float, default: 0
+        Sum of squared deviations of the values from their mean.
+    """
+
+    def __init__(self, n=0, mean=np.nan, m2=0.):
+        self.n = int(n)
+        self.mean = float(mean)
+        self.m2 = float(m2)
+
+    def __repr__(self):
+        return "MomentAccumulator(n={}, mean={}, m2={})".format(
+            self.n, self.mean, self.m2)
+
+    @classmethod
+    def from_values(cls, values):
+        """ Accumulate a set of values.
+
+        Parameters
+        ----------
+        values : numpy.array
+            Values to accumulate. All must be finite.
+
+        Returns
+        -------
+        accumulator : thermostat.accumulators.MomentAccumulator
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if values.shape[0] == 0:
+            return cls()
+        mean = values.mean()
+        return cls(values.shape[0], mean, np.sum((values - mean) ** 2))
+
+    def merge(self, other):
+        """ Accumulator of the values of this and another accumulator.
+
+        Parameters
+        ----------
+        other : thermostat.accumulators.MomentAccumulator
+
+        Returns
+        -------
+        accumulator : thermostat.accumulators.MomentAccumulator
+        """
+        if other.n == 0:
+            return MomentAccumulator(self.n, self.mean, self.m2)
+        if self.n == 0:
+            return MomentAccumulator(other.n, other.mean, other.m2)
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.n / n
+        m2 = self.m2 + other.m2 + delta ** 2 * self.n * other.n / n
+        return MomentAccumulator(n, mean, m2)
+
+    def std(self):
+        """ Standard deviation (with `n` degrees of freedom) of the values, or
+        np.nan if there are none.
+        """
+        if self.n == 0:
+            return np.nan
+        return (self.m2 / self.n) ** .5
+
+    def sem(self):
+        """ Standard error of the mean of the values, as the standard
+        deviation over the square root of the number of values, or np.nan if
+        there are none.
+        """
+        if self.n == 0:
+            return np.nan
+        return self.std() / (self.n ** .5)
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["n"], data["mean"], data["m2"])
+
+
+class QuantileSketch(object):
+    """ Counts of a set of values in buckets of geometrically increasing
+    width, from which quantiles of the values can be estimated to within a
+    known relative error. Sketches of two sets are merged by adding counts,
+    so the result is exactly the same in whatever order sets are merged.
+
+    With relative accuracy `a`, each bucket holds the values from
+    `gamma ** (k - 1)` to `gamma ** k` (or their negatives), where
+    `gamma = (1 + a) / (1 - a)`, and is represented by the value within
+    relative error `a` of every value in it. Values smaller in magnitude
+    than :code:`MIN_VALUE` are counted as zero.
+
+    Quantiles are estimated by linear interpolation between estimated order
+    statistics, as in :code:`pandas.Series.quantile`. Each estimated order
+    statistic is within relative error `a` of the true order statistic (or
+    within :code:`MIN_VALUE` of it, if it is near zero), so each estimated
+    quantile differs from the true quantile by at most `a` times the larger
+    magnitude of the two order statistics between which it falls.
+
+    Parameters
+    ----------
+    relative_accuracy : float, default: 0.005
+        Relative accuracy `a` of estimated order statistics, between 0 and 1.
+    codes : numpy.array, default: None
+        Sorted codes of buckets holding any values.
+    counts : numpy.array, default: None
+        Number of values in each bucket.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 codes=None, counts=None):
+        if not 0 < relative_accuracy < 1:
+            message = "relative_accuracy must be between 0 and 1, got {}." \
+                .format(relative_accuracy)
+            raise ValueError(message)
+        self.relative_accuracy = float(relative_accuracy)
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        if codes is None:
+            codes, counts = [], []
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    def __repr__(self):
+        return "QuantileSketch(relative_accuracy={}, n={})".format(
+            self.relative_accuracy, self.n)
+
+    @property
+    def n(self):
+        """ Number of values. """
+        return int(self.counts.sum())
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """ Sketch a set of values.
+
+        Parameters
+        ----------
+        values : numpy.array
+            Values to sketch. All must be finite.
+        relative_accuracy : float, default: 0.005
+            Relative accuracy of estimated order statistics.
+
+        Returns
+        -------
+        sketch : thermostat.accumulators.QuantileSketch
+        """
+        sketch = cls(relative_accuracy)
+        values = np.asarray(values, dtype=float).ravel()
+        codes, counts = np.unique(sketch._get_codes(values), return_counts=True)
+        sketch.codes, sketch.counts = codes.astype(np.int64), counts.astype(np.int64)
+        return sketch
+
+    def _get_codes(self, values):
+        magnitudes = np.abs(values)
+        nonzero = magnitudes >= MIN_VALUE
+        codes = np.zeros(values.shape, dtype=np.int64)
+        buckets = np.ceil(np.log(magnitudes[nonzero]) / np.log(self.gamma))
+        codes[nonzero] = np.sign(values[nonzero]).astype(np.int64) * \
+            (_CODE_OFFSET + buckets.astype(np.int64))
+        return codes
+
+    def _get_values(self, codes):
+        buckets = np.abs(codes) - _CODE_OFFSET
+        values = 2 * self.gamma ** buckets.astype(float) / (self.gamma + 1)
+        return np.where(codes == 0, 0., np.sign(codes) * values)
+
+    def merge(self, other):
+        """ Sketch of the values of this and another sketch.
+
+        Parameters
+        ----------
+        other : thermostat.accumulators.QuantileSketch
+            Sketch with the same relative accuracy.
+
+        Returns
+        -------
+        sketch : thermostat.accumulators.QuantileSketch
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            message = "Cannot merge sketches with different relative" \
+                " accuracies ({} and {}).".format(
+                    self.relative_accuracy, other.relative_accuracy)
+            raise ValueError(message)
+        codes, inverse = np.unique(
+            np.concatenate([self.codes, other.codes]), return_inverse=True)
+        counts = np.bincount(
+            inverse, weights=np.concatenate([self.counts, other.counts]),
+            minlength=codes.shape[0])
+        return QuantileSketch(self.relative_accuracy, codes, np.round(counts))
+
+    def quantile(self, q):
+        """ Estimated quantiles of the values.
+
+        Parameters
+        ----------
+        q : float or list of float
+            Quantiles to estimate, each between 0 and 1.
+
+        Returns
+        -------
+        quantiles : numpy.array
+            Estimated quantiles, one for each of `q`, or np.nan if there are
+            no values.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        n = self.n
+        if n == 0:
+            return np.tile(np.nan, q.shape)
+
+        index = (n - 1) * q
+        below = np.floor(index).astype(int)
+        above = np.minimum(below + 1, n - 1)
+        weight_above = index - below
+
+        # the order statistic at each position falls in the first bucket
+        # whose cumulative count exceeds the position.
+        cumulative_counts = np.cumsum(self.counts)
+        x_below = self._get_values(self.codes[
+            np.searchsorted(cumulative_counts, below, side="right")])
+        x_above = self._get_values(self.codes[
+            np.searchsorted(cumulative_counts, above, side="right")])
+        return lerp(x_below, x_above, weight_above)
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "codes": self.codes.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["relative_accuracy"], data["codes"], data["counts"])
@@ -1,94 +1,105 @@
 from datetime import datetime, timedelta
-from collections import namedtuple
-from itertools import repeat
+from collections import namedtuple, OrderedDict
+from itertools import repeat, chain, product
 import inspect
 from warnings import warn
 
 import pandas as pd
 import numpy as np
 from scipy.optimize import leastsq
-from pkg_resources import resource_stream
 
 from thermostat.regression import runtime_regression
+from thermostat.solvers import fit_tau, fit_tau_batch, daily_demand
+from thermostat.quantiles import group_quantiles
+from thermostat import resources
+from thermostat.exporters import METRICS_COLUMNS
 from thermostat import get_version
 
 CoreDaySet = namedtuple("CoreDaySet",
     ["name", "daily", "hourly", "start_date", "end_date"]
 )
 
-class Thermostat(object):
-    """ Main thermostat data container. Each parameter which contains
-    timeseries data should be a pandas.Series with a datetimeIndex, and that
-    each index should be equivalent.
+# series from which daily null counts are derived.
+DAILY_NULL_COUNT_SERIES = [
+    "temperature_in", "temperature_out", "heat_runtime", "cool_runtime"]
+
+BaselineScenarios = namedtuple("BaselineScenarios",
+    ["temp_baselines", "demand", "runtime", "avoided_runtime", "percent_savings"]
+)
+
+
+class IndexedCoreDaySet(object):
+    """ Core day set stored as the positions of its days in the daily index
+    of the thermostat data, rather than as daily and hourly boolean series.
+    Has the same attributes as :code:`CoreDaySet`; the :code:`daily` and
+    :code:`hourly` boolean series are created on access.
 
     Parameters
     ----------
-    thermostat_id : object
-        An identifier for the thermostat. Can be anything, but should be
-        identifying (e.g., an ID provided by the manufacturer).
-    equipment_type : { 0, 1, 2, 3, 4, 5 }
-        - :code:`0`: Other - e.g. multi-zone multi-stage, modulating. Note: module will
-          not output savings data for this type.
-        - :code:`1`: Single stage heat pump with aux and/or emergency heat
-        - :code:`2`: Single stage heat pump without aux or emergency heat
-        - :code:`3`: Single stage non heat pump with single-stage central air conditioning
-        - :code:`4`: Single stage non heat pump without central air conditioning
-        - :code:`5`: Single stage central air conditioning without central heating
-    zipcode : str
-        Installation ZIP code for the thermostat.
-    station : str
-        USAF identifier for weather station used to pull outdoor temperature data.
-    temperature_in : pandas.Series
-        Contains internal temperature data in degrees Fahrenheit (F),
-        with resolution of at least 0.5F.
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
-    temperature_out : pandas.Series
-        Contains outdoor temperature data as observed by a relevant
-        weather station in degrees Fahrenheit (F), with resolution of at least
-        0.5F.
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
-    cooling_setpoint : pandas.Series
-        Contains target temperature (setpoint) data in degrees Fahrenheit (F),
-        with resolution of at least 0.5F used to control cooling equipment.
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
-    heating_setpoint : pandas.Series
-        Contains target temperature (setpoint) data in degrees Fahrenheit (F),
-        with resolution of at least 0.5F used to control heating equipment.
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
-    cool_runtime : pandas.Series,
-        Daily runtimes for cooling equipment controlled by the thermostat, measured
-        in minutes. No datapoint should exceed 1440 mins, which would indicate
-        over a day of runtime (impossible).
-        Should be indexed by a pandas.DatetimeIndex with daily frequency (i.e.
-        :code:`freq='D'`).
-    heat_runtime : pandas.Series,
-        Daily runtimes for heating equipment controlled by the thermostat, measured
-        in minutes. No datapoint should exceed 1440 mins, which would indicate
-        over a day of runtime (impossible).
-        Should be indexed by a pandas.DatetimeIndex with daily frequency (i.e.
-        :code:`freq='D'`).
-    auxiliary_heat_runtime : pandas.Series,
-        Hourly runtimes for auxiliary heating equipment controlled by the
-        thermostat, measured in minutes. Auxiliary heat runtime is counted when
-        both resistance heating and the compressor are running (for heat pump
-        systems). No datapoint should exceed 60 mins, which would indicate
-        over a hour of runtime (impossible).
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
-    emergency_heat_runtime : pandas.Series,
-        Hourly runtimes for emergency heating equipment controlled by the
-        thermostat, measured in minutes. Emergency heat runtime is counted when
-        resistance heating is running when the compressor is not (for heat pump
-        systems). No datapoint should exceed 60 mins, which would indicate
-        over a hour of runtime (impossible).
-        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
-        :code:`freq='H'`).
+    name : str
+        Name of the core day set.
+    days : numpy.array
+        Sorted integer positions of the core days in `daily_index`.
+    daily_index : pandas.DatetimeIndex
+        Daily index of the thermostat data.
+    start_date, end_date : datetime.datetime or numpy.datetime64
+        Dates bounding the core day set.
+    """
+
+    __slots__ = ("name", "days", "daily_index", "start_date", "end_date")
+
+    def __init__(self, name, days, daily_index, start_date, end_date):
+        self.name = name
+        self.days = days
+        self.daily_index = daily_index
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __repr__(self):
+        return 'IndexedCoreDaySet("{}", n_days={})'.format(self.name, self.days.shape[0])
+
+    @property
+    def daily(self):
+        values = np.zeros(self.daily_index.shape, dtype=bool)
+        values[self.days] = True
+        return pd.Series(values, index=self.daily_index)
+
+    @property
+    def hourly(self):
+        values = np.zeros((self.daily_index.shape[0], 24), dtype=bool)
+        values[self.days] = True
+        index = _get_index(self.daily_index[0], self.daily_index.shape[0] * 24, "H")
+        return pd.Series(values.ravel(), index=index)
+
+    def get_hours(self, hourly):
+        """ Select the hours of an hourly series which fall on core days.
+
+        Parameters
+        ----------
+        hourly : pandas.Series
+            Hourly series covering the same days as the daily index of the
+            core day set, starting at midnight on the first day.
+
+        Returns
+        -------
+        hours : pandas.Series
+            Hourly values on core days.
+        """
+        if hourly.shape[0] != self.daily_index.shape[0] * 24 or \
+                hourly.index[0] != self.daily_index[0]:
+            return hourly[self.hourly]
+        hours = (self.days[:, np.newaxis] * 24 + np.arange(24)).ravel()
+        return hourly.iloc[hours]
+
+class BaseThermostat(object):
+    """ Methods shared by :code:`Thermostat` and :code:`CompactThermostat`,
+    which differ only in how they hold timeseries data. It has no instance
+    attributes of its own (its :code:`__slots__` are empty), so that compact
+    thermostats don't each carry a :code:`__dict__`.
     """
 
+    __slots__ = ()
+
     HEATING_EQUIPMENT_TYPES = set([1, 2, 3, 4])
     COOLING_EQUIPMENT_TYPES = set([1, 2, 3, 5])
     AUX_EMERG_EQUIPMENT_TYPES = set([1])
@@ -97,29 +108,61 @@ class Thermostat(object):
     RESISTANCE_HEAT_USE_BINS_MAX_TEMP = 60  # Unit is 1 degree F.
     RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH = 5  # Unit is 1 degree F.
 
+    # Step in which thermostats report temperatures and setpoints.
+    TEMPERATURE_RESOLUTION = 0.5  # Unit is 1 degree F.
 
-    def __init__(
-            self, thermostat_id, equipment_type, zipcode, station,
-            temperature_in, temperature_out, cooling_setpoint,
-            heating_setpoint, cool_runtime, heat_runtime,
-            auxiliary_heat_runtime, emergency_heat_runtime):
+    # Default runtime thresholds (in minutes) for core heating and cooling days.
+    CORE_DAY_THRESHOLDS = OrderedDict([
+        ("min_minutes_heating", 30),
+        ("max_minutes_cooling", 0),
+        ("min_minutes_cooling", 30),
+        ("max_minutes_heating", 0),
+    ])
 
-        self.thermostat_id = thermostat_id
-        self.equipment_type = equipment_type
-        self.zipcode = zipcode
-        self.station = station
+    DERIVED_CACHE_SIZE = 128  # Number of cached intermediate values.
 
-        self.temperature_in = self._interpolate(temperature_in, method="linear")
-        self.temperature_out = self._interpolate(temperature_out, method="linear")
-        self.cooling_setpoint = cooling_setpoint
-        self.heating_setpoint = heating_setpoint
+    @classmethod
+    def from_arrays(cls, thermostat_id, equipment_type, zipcode, station,
+            start, temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime, quantized=False):
+        """ Create a compact thermostat directly from arrays of data, without
+        building a pandas index for each series. Timeseries data is held in a
+        single hourly array and a single daily array, and series are created
+        (as views on those arrays) only when accessed. Methods of
+        :code:`Thermostat` work as usual.
 
-        self.cool_runtime = cool_runtime
-        self.heat_runtime = heat_runtime
-        self.auxiliary_heat_runtime = auxiliary_heat_runtime
-        self.emergency_heat_runtime = emergency_heat_runtime
+        Parameters are the same as for :code:`Thermostat`, except that
+        timeseries data are given as arrays (or None) rather than series, and
+        `start` gives the date of the first day of data.
 
-        self.validate()
+        Parameters
+        ----------
+        start : datetime.datetime
+            Midnight at the start of the first day of data.
+        temperature_in, temperature_out, cooling_setpoint, heating_setpoint, auxiliary_heat_runtime, emergency_heat_runtime : array_like
+            Hourly data, starting at `start`, spanning a whole number of days.
+        cool_runtime, heat_runtime : array_like
+            Daily data, starting at `start`, one value per day of hourly data.
+        quantized : boolean, default: False
+            If True, store indoor temperatures and setpoints as int16 tenths
+            of a degree F and runtimes as whole minutes (uint16 for daily
+            runtimes). Outdoor temperatures and any other values which aren't
+            multiples of these steps are kept as floats, so data is stored
+            exactly, in about 2.5 times less memory (not 4 times, as if
+            everything were quantized). See :code:`CompactThermostat`.
+
+        Returns
+        -------
+        thermostat : thermostat.core.CompactThermostat
+            Compact thermostat.
+        """
+        return CompactThermostat(
+            thermostat_id, equipment_type, zipcode, station, start,
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime,
+            quantized=quantized)
 
     def validate(self):
         self._validate_heating()
@@ -248,55 +291,28 @@ class Thermostat(object):
 
         meets_thresholds = meets_heating_thresholds & meets_cooling_thresholds
 
-        # enough temperature_in
-        enough_temp_in = \
-                self.temperature_in.groupby(self.temperature_in.index.date) \
-                .apply(lambda x: x.isnull().sum() <= 2)
-
-        enough_temp_out = \
-                self.temperature_out.groupby(self.temperature_out.index.date) \
-                .apply(lambda x: x.isnull().sum() <= 2)
-
-        meets_thresholds &= enough_temp_in & enough_temp_out
+        # enough temperature_in and temperature_out
+        meets_thresholds &= self._get_enough_temperature_days()
 
         data_start_date = np.datetime64(self.heat_runtime.index[0])
         data_end_date = np.datetime64(self.heat_runtime.index[-1])
 
         if method == "year_mid_to_mid":
-            # find all potential core heating day ranges
+            # potential core heating day sets run from July 1 to July 1.
             start_year = data_start_date.item().year - 1
             end_year = data_end_date.item().year + 1
-            potential_core_day_sets = zip(range(start_year, end_year),
-                                    range(start_year + 1, end_year + 1))
-
-            # for each potential core day set, look for core heating days.
-            core_heating_day_sets = []
-            for start_year_, end_year_ in potential_core_day_sets:
-                core_day_set_start_date = np.datetime64(datetime(start_year_, 7, 1))
-                core_day_set_end_date = np.datetime64(datetime(end_year_, 7, 1))
-                start_date = max(core_day_set_start_date, data_start_date).item()
-                end_date = min(core_day_set_end_date, data_end_date).item()
-                in_range = self._get_range_boolean(self.heat_runtime.index,
-                        start_date, end_date)
-                inclusion_daily = pd.Series(in_range & meets_thresholds,
-                        index=self.heat_runtime.index)
-
-                if any(inclusion_daily):
-                    name = "heating_{}-{}".format(start_year_, end_year_)
-                    inclusion_hourly = self._get_hourly_boolean(inclusion_daily)
-                    core_day_set = CoreDaySet(name, inclusion_daily, inclusion_hourly,
-                            start_date, end_date)
-                    core_heating_day_sets.append(core_day_set)
-
-            return core_heating_day_sets
+            season_boundaries = [datetime(year, 7, 1)
+                    for year in range(start_year, end_year + 1)]
+            names = ["heating_{}-{}".format(year, year + 1)
+                    for year in range(start_year, end_year)]
+            return self._get_seasonal_core_day_sets(self.heat_runtime.index,
+                    meets_thresholds, season_boundaries, names)
 
         elif method == "entire_dataset":
             inclusion_daily = pd.Series(meets_thresholds, index=self.heat_runtime.index)
-            inclusion_hourly = self._get_hourly_boolean(inclusion_daily)
-            core_heating_day_set = CoreDaySet(
+            core_heating_day_set = self._get_core_day_set(
                 "heating_ALL",
                 inclusion_daily,
-                inclusion_hourly,
                 data_start_date,
                 data_end_date)
             # returned as list for consistency
@@ -357,66 +373,322 @@ class Thermostat(object):
         meets_cooling_thresholds = self.cool_runtime >= min_minutes_cooling
         meets_thresholds = meets_heating_thresholds & meets_cooling_thresholds
 
-        # enough temperature_in
-        enough_temp_in = \
-                self.temperature_in.groupby(self.temperature_in.index.date) \
-                .apply(lambda x: x.isnull().sum() <= 2)
-
-        enough_temp_out = \
-                self.temperature_out.groupby(self.temperature_out.index.date) \
-                .apply(lambda x: x.isnull().sum() <= 2)
-
-        meets_thresholds &= enough_temp_in & enough_temp_out
+        # enough temperature_in and temperature_out
+        meets_thresholds &= self._get_enough_temperature_days()
 
         if method == "year_end_to_end":
+            # potential core cooling day sets run from January 1 to January 1.
             start_year = data_start_date.item().year
             end_year = data_end_date.item().year
-            potential_core_day_sets = range(start_year, end_year + 1)
-
-
-            # for each potential core day set, look for cooling days.
-            core_cooling_day_sets = []
-            for year in potential_core_day_sets:
-                core_day_set_start_date = np.datetime64(datetime(year, 1, 1))
-                core_day_set_end_date = np.datetime64(datetime(year + 1, 1, 1))
-                start_date = max(core_day_set_start_date, data_start_date).item()
-                end_date = min(core_day_set_end_date, data_end_date).item()
-                in_range = self._get_range_boolean(self.cool_runtime.index,
-                        start_date, end_date)
-                inclusion_daily = pd.Series(in_range & meets_thresholds,
-                        index=self.cool_runtime.index)
-
-                if any(inclusion_daily):
-                    name = "cooling_{}".format(year)
-                    inclusion_hourly = self._get_hourly_boolean(inclusion_daily)
-                    core_day_set = CoreDaySet(name, inclusion_daily, inclusion_hourly,
-                            start_date, end_date)
-                    core_cooling_day_sets.append(core_day_set)
+            season_boundaries = [datetime(year, 1, 1)
+                    for year in range(start_year, end_year + 2)]
+            names = ["cooling_{}".format(year)
+                    for year in range(start_year, end_year + 1)]
+            return self._get_seasonal_core_day_sets(self.cool_runtime.index,
+                    meets_thresholds, season_boundaries, names)
 
-            return core_cooling_day_sets
         elif method == "entire_dataset":
             inclusion_daily = pd.Series(meets_thresholds, index=self.cool_runtime.index)
-            inclusion_hourly = self._get_hourly_boolean(inclusion_daily)
-            core_day_set = CoreDaySet(
+            core_day_set = self._get_core_day_set(
                 "cooling_ALL",
                 inclusion_daily,
-                inclusion_hourly,
                 data_start_date,
                 data_end_date)
             core_cooling_day_sets = [core_day_set]
             return core_cooling_day_sets
 
+    def _get_derived(self, key, series_names, compute, core_day_set=None):
+        """ Returns an intermediate value derived from thermostat data,
+        computing it only if it isn't already cached.
+
+        Cached values are recomputed if any of the series they were derived
+        from has been replaced (e.g., :code:`thermostat.temperature_in =
+        new_series`) since. Series modified in place are not detected; call
+        :code:`clear_derived` after doing so. Up to
+        :code:`DERIVED_CACHE_SIZE` values are kept, evicting the least
+        recently used, and values derived for core day sets are discarded
+        once metrics have been calculated.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies the value.
+        series_names : list of str
+            Names of the series from which the value is derived.
+        compute : callable
+            Called with no arguments to compute the value.
+        core_day_set : thermostat.core.CoreDaySet, default: None
+            Core day set from which the value is derived, if any; values
+            derived from different core day set objects are cached
+            separately.
+        """
+        dependencies = self._get_series_dependencies(series_names)
+        if core_day_set is not None:
+            key = (key, id(core_day_set))
+            dependencies += (core_day_set,)
+
+        cached = self._derived.pop(key, None)
+        if cached is not None:
+            cached_dependencies, value = cached
+            if all(a is b for a, b in zip(dependencies, cached_dependencies)):
+                self._derived[key] = cached
+                return value
+
+        value = compute()
+        self._derived[key] = (dependencies, value)
+        while len(self._derived) > self.DERIVED_CACHE_SIZE:
+            self._derived.popitem(last=False)
+        return value
+
+    def _get_series_dependencies(self, series_names):
+        return tuple(getattr(self, name) for name in series_names)
+
+    def clear_derived(self):
+        """ Discard cached intermediate values derived from thermostat data,
+        e.g., to free memory, or after modifying a series in place.
+        """
+        self._derived = OrderedDict()
+
+    def _clear_core_day_set_derived(self):
+        # Discards cached values derived for core day sets (hourly slices and
+        # deltaT), which are only reused while metrics are calculated, so
+        # that thermostats kept in memory afterwards hold only the small
+        # daily values, which are also reused by `extend`.
+        for key in list(self._derived):
+            if not (key == "daily_null_counts" or key[0] == "daily"):
+                del self._derived[key]
+
+    def extend(self, temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime):
+        """ Append new days of data (e.g., as it arrives each day) to the
+        thermostat.
+
+        Cached intermediate values which are computed day by day (daily
+        aggregates and data coverage, from which core days are found) are
+        updated by computing them for the new days only, so that the cost
+        of updating them is proportional to the new data rather than to the
+        whole history. Other cached values are discarded. Metrics calculated
+        afterwards (e.g., with :code:`calculate_epa_field_savings_metrics`)
+        cover all data.
+
+        Parameters are the same as for :code:`Thermostat` (or, for a
+        :code:`CompactThermostat`, as for :code:`Thermostat.from_arrays`),
+        and must start at midnight on the day after the last day of data and
+        span whole days. Series which the thermostat doesn't have must be
+        None. Temperatures are interpolated as they would be if the
+        thermostat were created with all data, so hours at the end of the
+        existing data which were filled in (or left missing) for lack of
+        later data may change.
+        """
+        n_days = self.temperature_in.shape[0] // 24
+        # first day with hours which may be interpolated again
+        first_day = min([n_days] + [
+            (n_days * 24 - raw_tail.shape[0]) // 24
+            for raw_tail in self._raw_tails.values() if raw_tail is not None])
+
+        extendable = []
+        for key, (dependencies, value) in self._derived.items():
+            if key == "daily_null_counts":
+                series_names = DAILY_NULL_COUNT_SERIES
+            elif isinstance(key, tuple) and key[0] == "daily":
+                series_names = [key[1]]
+            else:
+                continue
+            current = self._get_series_dependencies(series_names)
+            if all(a is b for a, b in zip(current, dependencies)):
+                extendable.append((key, series_names, value))
+
+        self._append_data(
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime)
+
+        self._derived = OrderedDict()
+        for key, series_names, value in extendable:
+            if key == "daily_null_counts":
+                new_value = self._compute_daily_null_counts(start_day=first_day)
+            else:
+                _, series_name, how = key
+                new_value = _resample_daily(
+                    getattr(self, series_name).iloc[first_day * 24:], how)
+            self._derived[key] = (
+                self._get_series_dependencies(series_names),
+                pd.concat([value.iloc[:first_day], new_value]),
+            )
+
+        self.validate()
+
+    def _append_data(self, temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime):
+        hourly = [
+            ("temperature_in", temperature_in),
+            ("temperature_out", temperature_out),
+            ("cooling_setpoint", cooling_setpoint),
+            ("heating_setpoint", heating_setpoint),
+            ("auxiliary_heat_runtime", auxiliary_heat_runtime),
+            ("emergency_heat_runtime", emergency_heat_runtime),
+        ]
+        daily = [
+            ("cool_runtime", cool_runtime),
+            ("heat_runtime", heat_runtime),
+        ]
+
+        extended = {}
+        raw_tails = {}
+        for (series_name, new), step in chain(
+                zip(hourly, repeat(pd.Timedelta(hours=1))),
+                zip(daily, repeat(pd.Timedelta(days=1)))):
+            old = getattr(self, series_name)
+            if (old is None) != (new is None):
+                message = "For thermostat {}, {} must be given if and only if" \
+                          " the thermostat has it.".format(self.thermostat_id, series_name)
+                raise ValueError(message)
+            if old is None or new.shape[0] == 0:
+                continue
+            if old.shape[0] > 0 and new.index[0] != old.index[-1] + step:
+                message = "For thermostat {}, new {} must start right after" \
+                          " the existing data.".format(self.thermostat_id, series_name)
+                raise ValueError(message)
+            if series_name in self._raw_tails:
+                old_values, new_values, raw_tails[series_name] = \
+                    self._interpolate_appended(series_name, new)
+                n_kept = old.shape[0] - old_values.shape[0]
+                old = pd.concat([old.iloc[:n_kept], pd.Series(
+                    old_values, index=old.index[n_kept:], name=old.name)])
+                new = pd.Series(new_values, index=new.index, name=new.name)
+            extended[series_name] = pd.concat([old, new])
+
+        for series_name, series in extended.items():
+            setattr(self, series_name, series)
+        self._raw_tails.update(raw_tails)
+
+    def _interpolate_appended(self, series_name, new):
+        # interpolates temperatures as they would be in the whole series.
+        # Hours from the last non-null value of the existing data on are
+        # interpolated again along with the new hours, since they may be
+        # filled differently given later data. Returns interpolated values of
+        # those existing hours and of the new hours, and the new raw tail.
+        raw_tail = self._raw_tails[series_name]
+        raw = np.concatenate([raw_tail, np.asarray(new, dtype=float)])
+        interpolated = self._interpolate(pd.Series(raw), method="linear").values
+        n_old = raw_tail.shape[0]
+        return interpolated[:n_old], interpolated[n_old:], _get_raw_tail(raw)
+
+    def _get_core_day_set_hours(self, series_name, core_day_set):
+        """ Returns the hours of an hourly series on the days of a core day
+        set (cached).
+        """
+        def compute():
+            hourly = getattr(self, series_name)
+            if isinstance(core_day_set, IndexedCoreDaySet):
+                return core_day_set.get_hours(hourly)
+            return hourly[core_day_set.hourly]
+        return self._get_derived(("hours", series_name), [series_name],
+                compute, core_day_set)
+
+    def _get_daily_aggregate(self, series_name, how):
+        """ Returns an hourly series resampled to daily, by "mean" or "sum"
+        (cached).
+        """
+        def compute():
+            return _resample_daily(getattr(self, series_name), how)
+        return self._get_derived(("daily", series_name, how), [series_name], compute)
+
+    def _get_daily_null_counts(self):
+        """ Returns the number of null values on each day of hourly
+        temperature_in and temperature_out, and whether daily heat_runtime and
+        cool_runtime are null, as a pandas DataFrame with a daily index.
+
+        Hourly data is assumed to start at midnight on the first day and to
+        span whole days, so that it can be reshaped to (n_days, 24). Counts
+        are cached (see :code:`_get_derived`).
+        """
+        return self._get_derived("daily_null_counts", DAILY_NULL_COUNT_SERIES,
+                self._compute_daily_null_counts)
+
+    def _compute_daily_null_counts(self, start_day=0):
+        # counts for the days from `start_day` on.
+        daily_index = self.temperature_in.index[start_day * 24::24]
+
+        def hourly_null_counts(hourly):
+            return pd.isnull(hourly.values[start_day * 24:]).reshape((-1, 24)).sum(axis=1)
+
+        def daily_nulls(daily):
+            if daily is None:
+                # shouldn't be counted, so zero.
+                return np.zeros(daily_index.shape, dtype=int)
+            return pd.isnull(daily.reindex(daily_index).values).astype(int)
+
+        return pd.DataFrame({
+            "temperature_in": hourly_null_counts(self.temperature_in),
+            "temperature_out": hourly_null_counts(self.temperature_out),
+            "heat_runtime": daily_nulls(self.heat_runtime),
+            "cool_runtime": daily_nulls(self.cool_runtime),
+        }, index=daily_index)
+
+    def _get_enough_temperature_days(self, max_null_hours=2):
+        """ Returns a daily boolean pandas Series which is True on days with
+        at most `max_null_hours` null hourly values of each of temperature_in
+        and temperature_out.
+        """
+        daily_null_counts = self._get_daily_null_counts()
+        return (daily_null_counts.temperature_in <= max_null_hours) & \
+                (daily_null_counts.temperature_out <= max_null_hours)
+
     def _get_range_boolean(self, dt_index, start_date, end_date):
         after_start = dt_index >= start_date
         before_end = dt_index < end_date
         return after_start & before_end
 
-    def _get_hourly_boolean(self, daily_boolean):
-        values = np.repeat(daily_boolean.values, 24)
-        index = pd.DatetimeIndex(start=daily_boolean.index[0],
-                periods=daily_boolean.index.shape[0] * 24, freq="H")
-        hourly_boolean = pd.Series(values, index)
-        return hourly_boolean
+    def _get_seasonal_core_day_sets(self, daily_index, meets_thresholds,
+            season_boundaries, names):
+        """ Splits core days into consecutive seasons in a single pass, by
+        labeling each day with the season in which it falls.
+
+        Parameters
+        ----------
+        daily_index : pandas.DatetimeIndex
+            Daily index of the thermostat data.
+        meets_thresholds : pandas.Series
+            Daily booleans, True on days meeting core day thresholds.
+        season_boundaries : list of datetime.datetime
+            Start dates of each season, followed by the end date of the last.
+        names : list of str
+            Name of each season.
+
+        Returns
+        -------
+        core_day_sets : list of thermostat.core.IndexedCoreDaySet
+            Core day sets for seasons containing any core days. Each season
+            is bounded by the dates of data available, with the end date
+            (as always) excluded.
+        """
+        data_start_date = np.datetime64(daily_index[0])
+        data_end_date = np.datetime64(daily_index[-1])
+
+        days = np.flatnonzero(np.asarray(meets_thresholds, dtype=bool) &
+                (daily_index < data_end_date))
+        seasons = np.searchsorted(
+                pd.DatetimeIndex(season_boundaries).asi8,
+                daily_index.asi8[days], side="right") - 1
+        in_season = (seasons >= 0) & (seasons < len(names))
+        days, seasons = days[in_season], seasons[in_season]
+
+        unique_seasons, first_days = np.unique(seasons, return_index=True)
+
+        core_day_sets = []
+        for season, season_days in zip(unique_seasons, np.split(days, first_days[1:])):
+            start_date = max(np.datetime64(season_boundaries[season]), data_start_date).item()
+            end_date = min(np.datetime64(season_boundaries[season + 1]), data_end_date).item()
+            core_day_sets.append(IndexedCoreDaySet(names[season], season_days,
+                    daily_index, start_date, end_date))
+        return core_day_sets
+
+    def _get_core_day_set(self, name, inclusion_daily, start_date, end_date):
+        return IndexedCoreDaySet(name, np.flatnonzero(inclusion_daily.values),
+                inclusion_daily.index, start_date, end_date)
 
     def total_heating_runtime(self, core_day_set):
         """ Calculates total heating runtime.
@@ -448,7 +720,7 @@ class Thermostat(object):
             Total auxiliary heating runtime.
         """
         self._protect_aux_emerg()
-        return self.auxiliary_heat_runtime[core_day_set.hourly].sum()
+        return self._get_core_day_set_hours("auxiliary_heat_runtime", core_day_set).sum()
 
     def total_emergency_heating_runtime(self, core_day_set):
         """ Calculates total emergency heating runtime.
@@ -464,7 +736,7 @@ class Thermostat(object):
             Total heating runtime.
         """
         self._protect_aux_emerg()
-        return self.emergency_heat_runtime[core_day_set.hourly].sum()
+        return self._get_core_day_set_hours("emergency_heat_runtime", core_day_set).sum()
 
     def total_cooling_runtime(self, core_day_set):
         """ Calculates total cooling runtime.
@@ -482,16 +754,29 @@ class Thermostat(object):
         self._protect_cooling()
         return self.cool_runtime[core_day_set.daily].sum()
 
-    def get_resistance_heat_utilization_bins(self, core_heating_day_set):
+    def get_resistance_heat_utilization_bins(self, core_heating_day_set,
+            bin_edges=None, resolution="daily"):
         """ Calculates resistance heat utilization metrics in temperature
         bins of RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH
         between RESISTANCE_HEAT_USE_BINS_MIN_TEMP and
-        RESISTANCE_HEAT_USE_BINS_MAX_TEMP Fahrenheit.
+        RESISTANCE_HEAT_USE_BINS_MAX_TEMP Fahrenheit, or in the bins given by
+        `bin_edges`.
 
         Parameters
         ----------
         core_heating_day_set : thermostat.core.CoreDaySet
             Core heating day set for which to calculate total runtime.
+        bin_edges : list of float, default: None
+            Increasing edges of the temperature bins, e.g. `range(0, 61)` for
+            1F bins between 0F and 60F. Each bin includes its lower edge but
+            not its upper edge. If None, the default bins are used (see
+            :code:`get_resistance_heat_utilization_bin_edges`).
+        resolution : {"daily", "hourly"}, default: "daily"
+            If "daily", daily runtimes are binned by daily mean outdoor
+            temperature. If "hourly", auxiliary and emergency heat runtimes
+            are binned by hourly outdoor temperature. Heat pump runtime is
+            only available daily, so it is spread evenly over the hours of
+            each day.
 
         Returns
         -------
@@ -503,56 +788,75 @@ class Thermostat(object):
 
         self._protect_aux_emerg()
 
-        if self.equipment_type == 1:
-            RHUs = []
-
-            in_core_day_set_daily = self._get_range_boolean(
-                core_heating_day_set.daily.index,
-                core_heating_day_set.start_date,
-                core_heating_day_set.end_date)
-
-
-            # convert hourly to daily
-            temp_out_daily = self.temperature_out.resample('D').mean()
-            aux_daily = self.auxiliary_heat_runtime.resample('D').sum()
-            emg_daily = self.emergency_heat_runtime.resample('D').sum()
-
-            start = self.RESISTANCE_HEAT_USE_BINS_MIN_TEMP
-            stop = self.RESISTANCE_HEAT_USE_BINS_MAX_TEMP
-            step = self.RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH
-            temperature_bins = ((t, t+step) for t in range(start, stop, step))
-            for low_temp, high_temp in temperature_bins:
-                temp_low_enough_daily = temp_out_daily < high_temp
-                temp_high_enough_daily = temp_out_daily >= low_temp
-
-                temp_bin_daily = temp_low_enough_daily & temp_high_enough_daily & in_core_day_set_daily
-                R_heat = self.heat_runtime[temp_bin_daily].sum()
-                R_aux = aux_daily[temp_bin_daily].sum()
-                R_emg = emg_daily[temp_bin_daily].sum()
-                try:
-                    rhu = float(R_aux + R_emg) / float(R_heat + R_emg)
-                except ZeroDivisionError:
-                    rhu = np.nan
-                data_is_nonsense = R_aux > R_heat
-                if data_is_nonsense:
-                    rhu = np.nan
-                    warn(
-                        'WARNING: '
-                        'aux heat runtime %s > compressor runtime %s '
-                        'for %sF <= temperature < %sF '
-                        'for thermostat_id %s '
-                        'from %s to %s inclusive' % (
-                            R_aux, R_heat,
-                            low_temp, high_temp,
-                            self.thermostat_id,
-                            core_heating_day_set.start_date,
-                            core_heating_day_set.end_date)
-                    )
-                RHUs.append(rhu)
-            return np.array(RHUs)
-        else:
+        if self.equipment_type != 1:
             return None
 
+        if bin_edges is None:
+            bin_edges = self.get_resistance_heat_utilization_bin_edges()
+            if len(bin_edges) == 0:
+                return np.array([])
+        bin_labels = list(bin_edges)
+        bin_edges = _validate_bin_edges(bin_edges)
+
+        in_core_day_set_daily = self._get_range_boolean(
+            core_heating_day_set.daily.index,
+            core_heating_day_set.start_date,
+            core_heating_day_set.end_date)
+
+        if resolution == "daily":
+            temperature = self._get_daily_aggregate("temperature_out", "mean").values
+            heat_runtime = self.heat_runtime.values
+            aux_runtime = self._get_daily_aggregate("auxiliary_heat_runtime", "sum").values
+            emg_runtime = self._get_daily_aggregate("emergency_heat_runtime", "sum").values
+            in_range = in_core_day_set_daily
+        elif resolution == "hourly":
+            temperature = self.temperature_out.values
+            heat_runtime = np.repeat(self.heat_runtime.values / 24., 24)
+            aux_runtime = self.auxiliary_heat_runtime.values
+            emg_runtime = self.emergency_heat_runtime.values
+            in_range = np.repeat(in_core_day_set_daily, 24)
+        else:
+            raise NotImplementedError
+
+        RHUs, R_heat, R_aux = _bin_resistance_heat_utilization(
+            temperature[in_range], heat_runtime[in_range],
+            aux_runtime[in_range], emg_runtime[in_range], bin_edges)
+
+        for b in np.flatnonzero(R_aux[0] > R_heat[0]):
+            warn(
+                'WARNING: '
+                'aux heat runtime %s > compressor runtime %s '
+                'for %sF <= temperature < %sF '
+                'for thermostat_id %s '
+                'from %s to %s inclusive' % (
+                    R_aux[0, b], R_heat[0, b],
+                    bin_labels[b], bin_labels[b + 1],
+                    self.thermostat_id,
+                    core_heating_day_set.start_date,
+                    core_heating_day_set.end_date)
+            )
+        return RHUs[0]
+
+    @classmethod
+    def get_resistance_heat_utilization_bin_edges(cls):
+        """ Edges of the default resistance heat utilization temperature
+        bins, of RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH between
+        RESISTANCE_HEAT_USE_BINS_MIN_TEMP and RESISTANCE_HEAT_USE_BINS_MAX_TEMP
+        Fahrenheit.
+
+        Returns
+        -------
+        bin_edges : list of int
+            Increasing bin edges, or an empty list if there are no bins.
+        """
+        start = cls.RESISTANCE_HEAT_USE_BINS_MIN_TEMP
+        stop = cls.RESISTANCE_HEAT_USE_BINS_MAX_TEMP
+        step = cls.RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH
+        lows = list(range(start, stop, step))
+        if len(lows) == 0:
+            return []
+        return lows + [lows[-1] + step]
+
     def get_ignored_days(self, core_day_set):
         """ Determine how many days are ignored for a particular core day set
 
@@ -567,29 +871,45 @@ class Thermostat(object):
             data.
         """
 
-        in_range = self._get_range_boolean(
-            core_day_set.daily.index,
-            core_day_set.start_date,
-            core_day_set.end_date)
+        return self._get_ignored_days_by_set([core_day_set])[0]
+
+    def _get_ignored_days_by_set(self, core_day_sets):
+        """ Determine how many days are ignored for each of several core day
+        sets at once, as returned by :code:`get_ignored_days`. Days are
+        flagged once, and counts over the date range of each core day set
+        are taken from cumulative sums.
+        """
+        daily_null_counts = self._get_daily_null_counts()
+        daily_index = daily_null_counts.index
 
         if self.equipment_type in self.HEATING_EQUIPMENT_TYPES:
-            has_heating = self.heat_runtime > 0
-            null_heating = pd.isnull(self.heat_runtime)
+            has_heating = (self.heat_runtime > 0).values
+            null_heating = daily_null_counts.heat_runtime.values > 0
         else:
             has_heating = False
             null_heating = False # shouldn't be counted, so False, not True
 
         if self.equipment_type in self.COOLING_EQUIPMENT_TYPES:
-            has_cooling = self.cool_runtime > 0
-            null_cooling = pd.isnull(self.cool_runtime)
+            has_cooling = (self.cool_runtime > 0).values
+            null_cooling = daily_null_counts.cool_runtime.values > 0
         else:
             has_cooling = False
             null_cooling = False # shouldn't be counted, so False, not True
 
-
-        n_both = (in_range & has_heating & has_cooling).sum()
-        n_days_insufficient = (in_range & (null_heating | null_cooling)).sum()
-        return n_both, n_days_insufficient
+        both = np.zeros(daily_index.shape, dtype=bool) | (has_heating & has_cooling)
+        insufficient = np.zeros(daily_index.shape, dtype=bool) | (null_heating | null_cooling)
+        cumulative_both = np.append(0, np.cumsum(both))
+        cumulative_insufficient = np.append(0, np.cumsum(insufficient))
+
+        ignored_days = []
+        for core_day_set in core_day_sets:
+            # days in [start_date, end_date)
+            start = daily_index.searchsorted(pd.Timestamp(core_day_set.start_date))
+            end = max(start, daily_index.searchsorted(pd.Timestamp(core_day_set.end_date)))
+            n_both = cumulative_both[end] - cumulative_both[start]
+            n_days_insufficient = cumulative_insufficient[end] - cumulative_insufficient[start]
+            ignored_days.append((n_both, n_days_insufficient))
+        return ignored_days
 
     def get_core_day_set_n_days(self, core_day_set):
         """ Returns number of days in the core day set.
@@ -605,7 +925,19 @@ class Thermostat(object):
         else:
             return int(delta.astype('timedelta64[D]') / np.timedelta64(1, 'D'))
 
-    def get_cooling_demand(self, core_cooling_day_set):
+    def _get_core_day_set_deltaT(self, core_day_set):
+        """ Returns hourly deltaT (temperature_in - temperature_out) over the
+        core day set as a numpy array of shape (n_days, 24), one row per core
+        day, so that daily demand can be computed with array operations.
+        """
+        def compute():
+            temp_in = self._get_core_day_set_hours("temperature_in", core_day_set).values
+            temp_out = self._get_core_day_set_hours("temperature_out", core_day_set).values
+            return (temp_in - temp_out).reshape((-1, 24))
+        return self._get_derived("deltaT", ["temperature_in", "temperature_out"],
+                compute, core_day_set)
+
+    def get_cooling_demand(self, core_cooling_day_set, method="piecewise_linear"):
         """
         Calculates a measure of cooling demand using the hourlyavgCTD method.
 
@@ -644,6 +976,14 @@ class Thermostat(object):
         ----------
         core_cooling_day_set : thermostat.core.CoreDaySet
             Core day set over which to calculate cooling demand.
+        method : {"piecewise_linear", "leastsq"}, default: "piecewise_linear"
+            Method by which to optimize :math:`\\tau_c`.
+
+            - "piecewise_linear": exact least squares solution, found using
+              the breakpoints of the piecewise linear daily CTD (see
+              :code:`thermostat.solvers.fit_tau`). (default)
+            - "leastsq": iterative solution using scipy.optimize.leastsq with
+              a starting guess of zero. Kept as a reference method.
 
         Returns
         -------
@@ -666,18 +1006,17 @@ class Thermostat(object):
             Mean absolute error
         """
 
+        if method not in ["piecewise_linear", "leastsq"]:
+            raise NotImplementedError
+
         self._protect_cooling()
 
-        core_day_set_temp_in = self.temperature_in[core_cooling_day_set.hourly]
-        core_day_set_temp_out = self.temperature_out[core_cooling_day_set.hourly]
-        core_day_set_deltaT = core_day_set_temp_in - core_day_set_temp_out
+        core_day_set_deltaT = self._get_core_day_set_deltaT(core_cooling_day_set)
 
         daily_index = core_cooling_day_set.daily[core_cooling_day_set.daily].index
 
         def calc_cdd(tau):
-            hourly_cdd = (tau - core_day_set_deltaT).apply(lambda x: np.maximum(x, 0))
-            # Note - `x / 24` this should be thought of as a unit conversion, not an average.
-            return np.array([cdd.sum() / 24 for day, cdd in hourly_cdd.groupby(core_day_set_deltaT.index.date)])
+            return daily_demand(core_day_set_deltaT, tau, "cooling")
 
         daily_runtime = self.cool_runtime[core_cooling_day_set.daily]
         total_runtime = daily_runtime.sum()
@@ -687,33 +1026,32 @@ class Thermostat(object):
             total_cdd = np.sum(cdd)
             alpha_estimate = total_runtime / total_cdd
             runtime_estimate = cdd * alpha_estimate
-            errors = daily_runtime - runtime_estimate
+            errors = daily_runtime.values - runtime_estimate
             return cdd, alpha_estimate, errors
 
         def estimate_errors(tau_estimate):
             _, _, errors = calc_estimates(tau_estimate)
             return errors
 
-        tau_starting_guess = 0
-        try:
-            y, _ = leastsq(estimate_errors, tau_starting_guess)
-        except TypeError: # len 0
-            assert daily_runtime.shape[0] == 0 # make sure no other type errors are sneaking in
-            return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+        if method == "piecewise_linear":
+            if daily_runtime.shape[0] == 0:
+                return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+
+            tau_estimate = fit_tau(core_day_set_deltaT, daily_runtime.values, "cooling")
 
-        tau_estimate = y[0]
+        elif method == "leastsq":
+            tau_starting_guess = 0
+            try:
+                y, _ = leastsq(estimate_errors, tau_starting_guess)
+            except TypeError: # len 0
+                assert daily_runtime.shape[0] == 0 # make sure no other type errors are sneaking in
+                return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
 
-        cdd, alpha_estimate, errors = calc_estimates(tau_estimate)
-        mse = np.nanmean((errors)**2)
-        rmse = mse ** 0.5
-        mean_daily_runtime = np.nanmean(daily_runtime)
-        cvrmse = rmse / mean_daily_runtime
-        mape = np.nanmean(np.absolute(errors / mean_daily_runtime))
-        mae = np.nanmean(np.absolute(errors))
+            tau_estimate = y[0]
 
-        return pd.Series(cdd, index=daily_index), tau_estimate, alpha_estimate, mse, rmse, cvrmse, mape, mae
+        return _get_demand_fit(calc_cdd(tau_estimate), tau_estimate, daily_runtime, daily_index)
 
-    def get_heating_demand(self, core_heating_day_set):
+    def get_heating_demand(self, core_heating_day_set, method="piecewise_linear"):
         """
         Calculates a measure of heating demand using the hourlyavgCTD method.
 
@@ -749,6 +1087,14 @@ class Thermostat(object):
         ----------
         core_heating_day_set : array_like
             Core day set over which to calculate heating demand.
+        method : {"piecewise_linear", "leastsq"}, default: "piecewise_linear"
+            Method by which to optimize :math:`\\tau_h`.
+
+            - "piecewise_linear": exact least squares solution, found using
+              the breakpoints of the piecewise linear daily HTD (see
+              :code:`thermostat.solvers.fit_tau`). (default)
+            - "leastsq": iterative solution using scipy.optimize.leastsq with
+              a starting guess of zero. Kept as a reference method.
 
         Returns
         -------
@@ -771,18 +1117,17 @@ class Thermostat(object):
             Mean absolute error
         """
 
+        if method not in ["piecewise_linear", "leastsq"]:
+            raise NotImplementedError
+
         self._protect_heating()
 
-        core_day_set_temp_in = self.temperature_in[core_heating_day_set.hourly]
-        core_day_set_temp_out = self.temperature_out[core_heating_day_set.hourly]
-        core_day_set_deltaT = core_day_set_temp_in - core_day_set_temp_out
+        core_day_set_deltaT = self._get_core_day_set_deltaT(core_heating_day_set)
 
         daily_index = core_heating_day_set.daily[core_heating_day_set.daily].index
 
         def calc_hdd(tau):
-            hourly_hdd = (core_day_set_deltaT - tau).apply(lambda x: np.maximum(x, 0))
-            # Note - this `x / 24` should be thought of as a unit conversion, not an average.
-            return np.array([hdd.sum() / 24 for day, hdd in hourly_hdd.groupby(core_day_set_deltaT.index.date)])
+            return daily_demand(core_day_set_deltaT, tau, "heating")
 
         daily_runtime = self.heat_runtime[core_heating_day_set.daily]
         total_runtime = daily_runtime.sum()
@@ -792,41 +1137,30 @@ class Thermostat(object):
             total_hdd = np.sum(hdd)
             alpha_estimate = total_runtime / total_hdd
             runtime_estimate = hdd * alpha_estimate
-            errors = daily_runtime - runtime_estimate
+            errors = daily_runtime.values - runtime_estimate
             return hdd, alpha_estimate, errors
 
         def estimate_errors(tau_estimate):
             _, _, errors = calc_estimates(tau_estimate)
             return errors
 
-        tau_starting_guess = 0
+        if method == "piecewise_linear":
+            if daily_runtime.shape[0] == 0:
+                return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
 
-        try:
-            y, _ = leastsq(estimate_errors, tau_starting_guess)
-        except TypeError: # len 0
-            assert daily_runtime.shape[0] == 0 # make sure no other type errors are sneaking in
-            return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
-
-        tau_estimate = y[0]
-
-        hdd, alpha_estimate, errors = calc_estimates(tau_estimate)
-        mse = np.nanmean((errors)**2)
-        rmse = mse ** 0.5
-        mean_daily_runtime = np.nanmean(daily_runtime)
-        cvrmse = rmse / mean_daily_runtime
-        mape = np.nanmean(np.absolute(errors / mean_daily_runtime))
-        mae = np.nanmean(np.absolute(errors))
-
-        return (
-            pd.Series(hdd, index=daily_index),
-            tau_estimate,
-            alpha_estimate,
-            mse,
-            rmse,
-            cvrmse,
-            mape,
-            mae
-        )
+            tau_estimate = fit_tau(core_day_set_deltaT, daily_runtime.values, "heating")
+
+        elif method == "leastsq":
+            tau_starting_guess = 0
+            try:
+                y, _ = leastsq(estimate_errors, tau_starting_guess)
+            except TypeError: # len 0
+                assert daily_runtime.shape[0] == 0 # make sure no other type errors are sneaking in
+                return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+
+            tau_estimate = y[0]
+
+        return _get_demand_fit(calc_hdd(tau_estimate), tau_estimate, daily_runtime, daily_index)
 
     def get_core_cooling_day_baseline_setpoint(self, core_cooling_day_set,
             method='tenth_percentile', source='temperature_in'):
@@ -856,12 +1190,10 @@ class Thermostat(object):
 
         if method == 'tenth_percentile':
 
-            if source == 'cooling_setpoint':
-                return self.cooling_setpoint[core_cooling_day_set.hourly].dropna().quantile(.1)
-            elif source == 'temperature_in':
-                return self.temperature_in[core_cooling_day_set.hourly].dropna().quantile(.1)
-            else:
+            if source not in ['cooling_setpoint', 'temperature_in']:
                 raise NotImplementedError
+            return self.get_core_day_set_quantiles(
+                [core_cooling_day_set], .1, source=source)[0, 0]
 
         else:
             raise NotImplementedError
@@ -893,16 +1225,52 @@ class Thermostat(object):
 
         if method == 'ninetieth_percentile':
 
-            if source == 'heating_setpoint':
-                return self.heating_setpoint[core_heating_day_set.hourly].dropna().quantile(.9)
-            elif source == 'temperature_in':
-                return self.temperature_in[core_heating_day_set.hourly].dropna().quantile(.9)
-            else:
+            if source not in ['heating_setpoint', 'temperature_in']:
                 raise NotImplementedError
+            return self.get_core_day_set_quantiles(
+                [core_heating_day_set], .9, source=source)[0, 0]
 
         else:
             raise NotImplementedError
 
+    def get_core_day_set_quantiles(self, core_day_sets, q,
+            source='temperature_in'):
+        """ Calculate quantiles of hourly temperatures over the core days of
+        each of several core day sets (e.g., all yearly core heating day
+        sets), in a single pass.
+
+        Quantiles are interpolated linearly, as in
+        :code:`pandas.Series.quantile`. Temperatures which are multiples of
+        TEMPERATURE_RESOLUTION are counted in a histogram rather than sorted
+        (see :code:`thermostat.quantiles.group_quantiles`).
+
+        Parameters
+        ----------
+        core_day_sets : list of thermostat.core.CoreDaySet
+            Core day sets over which to calculate quantiles.
+        q : float or list of float
+            Quantiles to calculate, each between 0 and 1, e.g.
+            `[.1, .5, .9]`.
+        source : {"temperature_in", "cooling_setpoint", "heating_setpoint"}, default "temperature_in"
+            The source of temperatures.
+
+        Returns
+        -------
+        quantiles : numpy.array
+            Quantiles with shape (n_core_day_sets, n_quantiles). Quantiles
+            of core day sets without any temperatures are np.nan.
+        """
+        if source not in ['temperature_in', 'cooling_setpoint', 'heating_setpoint']:
+            raise NotImplementedError
+
+        hours = [self._get_core_day_set_hours(source, core_day_set).values
+                 for core_day_set in core_day_sets]
+        n_hours = [h.shape[0] for h in hours]
+        values = np.concatenate(hours) if hours else np.empty((0,))
+        groups = np.repeat(np.arange(len(hours)), n_hours)
+        return group_quantiles(values, q, groups, len(hours),
+                resolution=self.TEMPERATURE_RESOLUTION)
+
     def get_baseline_cooling_demand(self, core_cooling_day_set, temp_baseline, tau):
         """ Calculate baseline cooling demand for a particular core cooling
         day set and fitted physical parameters.
@@ -936,10 +1304,8 @@ class Thermostat(object):
         """
         self._protect_cooling()
 
-        hourly_temp_out = self.temperature_out[core_cooling_day_set.hourly]
-
-        hourly_cdd = (tau - (temp_baseline - hourly_temp_out)).apply(lambda x: np.maximum(x, 0))
-        demand = np.array([cdd.sum() / 24 for day, cdd in hourly_cdd.groupby(hourly_temp_out.index.date)])
+        demand = self._get_baseline_demand(
+            core_cooling_day_set, [temp_baseline], tau, "cooling")[0]
 
         index = core_cooling_day_set.daily[core_cooling_day_set.daily].index
         return pd.Series(demand, index=index)
@@ -976,14 +1342,112 @@ class Thermostat(object):
         """
         self._protect_heating()
 
-        hourly_temp_out = self.temperature_out[core_heating_day_set.hourly]
-
-        hourly_hdd = (temp_baseline - hourly_temp_out - tau).apply(lambda x: np.maximum(x, 0))
-        demand = np.array([hdd.sum() / 24 for day, hdd in hourly_hdd.groupby(hourly_temp_out.index.date)])
+        demand = self._get_baseline_demand(
+            core_heating_day_set, [temp_baseline], tau, "heating")[0]
 
         index = core_heating_day_set.daily[core_heating_day_set.daily].index
         return pd.Series(demand, index=index)
 
+    def _get_baseline_demand(self, core_day_set, temp_baselines, tau,
+            heating_or_cooling):
+        """ Baseline daily demand over a core day set for each of several
+        baseline comfort temperatures, in a single broadcasted calculation.
+
+        Returns
+        -------
+        demand : numpy.array
+            Baseline daily demand with shape (n_temp_baselines, n_core_days).
+            Days without any outdoor temperatures are null.
+        """
+        temp_baselines = np.asarray(temp_baselines, dtype=float)
+        hourly_temp_out = self._get_core_day_set_hours(
+            "temperature_out", core_day_set).values.reshape((-1, 24))
+
+        deltaT = temp_baselines[:, np.newaxis, np.newaxis] - hourly_temp_out
+        demand = daily_demand(deltaT, tau, heating_or_cooling)
+        demand[:, np.all(np.isnan(hourly_temp_out), axis=1)] = np.nan
+        return demand
+
+    def get_baseline_cooling_scenarios(self, core_cooling_day_set,
+            temp_baselines, tau=None, alpha=None):
+        """ Calculate baseline cooling demand, runtime and savings over a core
+        cooling day set for many baseline comfort temperatures at once (e.g.,
+        to plot savings against baseline comfort temperature).
+
+        Parameters
+        ----------
+        core_cooling_day_set : thermostat.core.CoreDaySet
+            Core cooling days over which to calculate baselines.
+        temp_baselines : array_like
+            Baseline comfort temperatures, one per scenario.
+        tau, alpha : float, default: None
+            From fitted demand model. If None, fitted with
+            :code:`get_cooling_demand`.
+
+        Returns
+        -------
+        scenarios : thermostat.core.BaselineScenarios
+            Baseline daily demand, runtime and avoided runtime with shape
+            (n_scenarios, n_core_days), and percent savings with shape
+            (n_scenarios,).
+        """
+        self._protect_cooling()
+        return self._get_baseline_scenarios(core_cooling_day_set,
+                temp_baselines, tau, alpha, "cooling")
+
+    def get_baseline_heating_scenarios(self, core_heating_day_set,
+            temp_baselines, tau=None, alpha=None):
+        """ Calculate baseline heating demand, runtime and savings over a core
+        heating day set for many baseline comfort temperatures at once (e.g.,
+        to plot savings against baseline comfort temperature).
+
+        Parameters
+        ----------
+        core_heating_day_set : thermostat.core.CoreDaySet
+            Core heating days over which to calculate baselines.
+        temp_baselines : array_like
+            Baseline comfort temperatures, one per scenario.
+        tau, alpha : float, default: None
+            From fitted demand model. If None, fitted with
+            :code:`get_heating_demand`.
+
+        Returns
+        -------
+        scenarios : thermostat.core.BaselineScenarios
+            Baseline daily demand, runtime and avoided runtime with shape
+            (n_scenarios, n_core_days), and percent savings with shape
+            (n_scenarios,).
+        """
+        self._protect_heating()
+        return self._get_baseline_scenarios(core_heating_day_set,
+                temp_baselines, tau, alpha, "heating")
+
+    def _get_baseline_scenarios(self, core_day_set, temp_baselines, tau,
+            alpha, heating_or_cooling):
+        if heating_or_cooling == "cooling":
+            runtime = self.cool_runtime
+            get_demand = self.get_cooling_demand
+        else:
+            runtime = self.heat_runtime
+            get_demand = self.get_heating_demand
+
+        if tau is None or alpha is None:
+            _, fitted_tau, fitted_alpha = get_demand(core_day_set)[:3]
+            tau = fitted_tau if tau is None else tau
+            alpha = fitted_alpha if alpha is None else alpha
+
+        temp_baselines = np.atleast_1d(np.asarray(temp_baselines, dtype=float))
+        demand = self._get_baseline_demand(core_day_set, temp_baselines, tau,
+                heating_or_cooling)
+        baseline_runtime = np.maximum(alpha * demand, 0)
+        avoided_runtime = baseline_runtime - runtime[core_day_set.daily].values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent_savings = _nanmean_rows(avoided_runtime) / \
+                _nanmean_rows(baseline_runtime) * 100.0
+
+        return BaselineScenarios(temp_baselines, demand, baseline_runtime,
+                avoided_runtime, percent_savings)
+
     def get_baseline_cooling_runtime(self, baseline_cooling_demand, alpha):
         """ Calculate baseline cooling runtime given baseline cooling demand
         and fitted physical parameters.
@@ -1035,7 +1499,9 @@ class Thermostat(object):
     def calculate_epa_field_savings_metrics(self,
             core_cooling_day_set_method="entire_dataset",
             core_heating_day_set_method="entire_dataset",
-            climate_zone_mapping=None):
+            climate_zone_mapping=None,
+            min_minutes_heating=30, max_minutes_cooling=0,
+            min_minutes_cooling=30, max_minutes_heating=0):
         """ Calculates metrics for connected thermostat savings as defined by
         the specification defined by the EPA Energy Star program and stakeholders.
 
@@ -1065,6 +1531,13 @@ class Thermostat(object):
 
             :download:`default mapping <./resources/Building America Climate Zone to Zipcode Database_Rev2_2016.09.08.csv>`
 
+        min_minutes_heating, max_minutes_cooling : int, default 30, 0
+            Runtime thresholds for core heating days; see
+            :code:`get_core_heating_days`.
+        min_minutes_cooling, max_minutes_heating : int, default 30, 0
+            Runtime thresholds for core cooling days; see
+            :code:`get_core_cooling_days`.
+
         Returns
         -------
         metrics : list
@@ -1072,37 +1545,9 @@ class Thermostat(object):
             or cooling days.
         """
 
-        def _load_mapping(filename_or_buffer):
-            df = pd.read_csv(
-                filename_or_buffer,
-                usecols=["zipcode", "group"],
-                dtype={"zipcode": str, "group": str},
-            ).set_index('zipcode').drop('zipcode')
-            df = df.where((pd.notnull(df)), None)
-
-            return dict(df.to_records('index'))
-
-        if climate_zone_mapping is None:
-            with resource_stream('thermostat.resources',
-                                 'Building America Climate Zone to Zipcode Database_Rev2_2016.09.08.csv') as f:
-                mapping = _load_mapping(f)
-        else:
-            try:
-                mapping = _load_mapping(climate_zone_mapping)
-            except: #!!! danger: wildcard except. Should specify exception.
-                raise ValueError("Could not load climate zone mapping")
-
-        with resource_stream('thermostat.resources', 'regional_baselines.csv') as f:
-            df = pd.read_csv(
-                f, usecols=[
-                    'EIA Climate Zone',
-                    'Baseline heating temp (F)',
-                    'Baseline cooling temp (F)'
-                ])
-            df = df.where((pd.notnull(df)), None)
-            df = df.set_index('EIA Climate Zone')
-            cooling_regional_baseline_temps = { k: v for k, v in df['Baseline cooling temp (F)'].iteritems()}
-            heating_regional_baseline_temps = { k: v for k, v in df['Baseline heating temp (F)'].iteritems()}
+        mapping = _load_climate_zone_mapping(climate_zone_mapping)
+        cooling_regional_baseline_temps, heating_regional_baseline_temps = \
+            resources.get_regional_baseline_temps()
 
         climate_zone = mapping.get(self.zipcode)
         baseline_regional_cooling_comfort_temperature = cooling_regional_baseline_temps.get(climate_zone, None)
@@ -1110,305 +1555,980 @@ class Thermostat(object):
 
         metrics = []
 
-        def avoided(baseline, observed):
-            return baseline - observed
+        if self.equipment_type in self.COOLING_EQUIPMENT_TYPES:
+            core_cooling_day_sets = self.get_core_cooling_days(
+                    method=core_cooling_day_set_method,
+                    min_minutes_cooling=min_minutes_cooling,
+                    max_minutes_heating=max_minutes_heating)
+            metrics.extend(self._calculate_cooling_metrics(
+                core_cooling_day_sets, climate_zone,
+                baseline_regional_cooling_comfort_temperature))
 
-        def percent_savings(avoided, baseline):
-            return (avoided.mean() / baseline.mean()) * 100.0
+        if self.equipment_type in self.HEATING_EQUIPMENT_TYPES:
+            core_heating_day_sets = self.get_core_heating_days(
+                    method=core_heating_day_set_method,
+                    min_minutes_heating=min_minutes_heating,
+                    max_minutes_cooling=max_minutes_cooling)
+            metrics.extend(self._calculate_heating_metrics(
+                core_heating_day_sets, climate_zone,
+                baseline_regional_heating_comfort_temperature))
+
+        self._clear_core_day_set_derived()
+        return metrics
 
-        if self.equipment_type in self.COOLING_EQUIPMENT_TYPES:
-            for core_cooling_day_set in self.get_core_cooling_days(
-                    method=core_cooling_day_set_method):
+    def calculate_epa_field_savings_metrics_sweep(self, thresholds,
+            core_cooling_day_set_method="entire_dataset",
+            core_heating_day_set_method="entire_dataset",
+            climate_zone_mapping=None):
+        """ Calculates savings metrics (see
+        :code:`calculate_epa_field_savings_metrics`) for each point of a
+        grid of core day runtime thresholds, to show how sensitive the
+        metrics are to the thresholds.
+
+        Intermediate values which don't depend on the thresholds (e.g., daily
+        aggregates and data coverage) are computed once for the whole sweep.
+        Core cooling days only depend on `min_minutes_cooling` and
+        `max_minutes_heating`, and core heating days only on
+        `min_minutes_heating` and `max_minutes_cooling`, so metrics are only
+        calculated once for each distinct pair.
 
-                baseline10_comfort_temperature = \
-                    self.get_core_cooling_day_baseline_setpoint(core_cooling_day_set)
+        Parameters
+        ----------
+        thresholds : dict or list of dict
+            Either a dict mapping threshold names to lists of values, in which
+            case every combination of values is a grid point, or a list of
+            grid points, each a dict mapping threshold names to values.
+            Threshold names are "min_minutes_heating", "max_minutes_cooling",
+            "min_minutes_cooling" and "max_minutes_heating"; thresholds not
+            given take their default values (see
+            :code:`Thermostat.CORE_DAY_THRESHOLDS`).
+        core_cooling_day_set_method : {"entire_dataset", "year_end_to_end"}, default: "entire_dataset"
+            Method by which to find core cooling day sets.
+        core_heating_day_set_method : {"entire_dataset", "year_mid_to_mid"}, default: "entire_dataset"
+            Method by which to find core heating day sets.
+        climate_zone_mapping : filename, default: None
+            A mapping from climate zone to zipcode. If None is provided, uses
+            default zipcode to climate zone mapping.
 
-                daily_runtime = self.cool_runtime[core_cooling_day_set.daily]
+        Returns
+        -------
+        metrics : pandas.DataFrame
+            One row per grid point and core day set, with a column for each
+            threshold followed by the output metrics.
+        """
+        grid = _get_threshold_grid(thresholds)
 
-                (
-                    demand,
-                    tau,
-                    alpha,
-                    mse,
-                    rmse,
-                    cvrmse,
-                    mape,
-                    mae,
-                ) = self.get_cooling_demand(core_cooling_day_set)
+        mapping = _load_climate_zone_mapping(climate_zone_mapping)
+        cooling_regional_baseline_temps, heating_regional_baseline_temps = \
+            resources.get_regional_baseline_temps()
 
-                total_runtime_core_cooling = daily_runtime.sum()
-                n_days = core_cooling_day_set.daily.sum()
+        climate_zone = mapping.get(self.zipcode)
+        baseline_regional_cooling_comfort_temperature = cooling_regional_baseline_temps.get(climate_zone, None)
+        baseline_regional_heating_comfort_temperature = heating_regional_baseline_temps.get(climate_zone, None)
 
-                average_daily_cooling_runtime = \
-                    total_runtime_core_cooling / n_days
+        cooling_metrics = {}
+        heating_metrics = {}
+        rows = []
+        for grid_point in grid:
+            metrics = []
+
+            if self.equipment_type in self.COOLING_EQUIPMENT_TYPES:
+                key = (grid_point["min_minutes_cooling"],
+                       grid_point["max_minutes_heating"])
+                if key not in cooling_metrics:
+                    core_cooling_day_sets = self.get_core_cooling_days(
+                            method=core_cooling_day_set_method,
+                            min_minutes_cooling=key[0],
+                            max_minutes_heating=key[1])
+                    cooling_metrics[key] = self._calculate_cooling_metrics(
+                        core_cooling_day_sets, climate_zone,
+                        baseline_regional_cooling_comfort_temperature)
+                    self._clear_core_day_set_derived()
+                metrics.extend(cooling_metrics[key])
+
+            if self.equipment_type in self.HEATING_EQUIPMENT_TYPES:
+                key = (grid_point["min_minutes_heating"],
+                       grid_point["max_minutes_cooling"])
+                if key not in heating_metrics:
+                    core_heating_day_sets = self.get_core_heating_days(
+                            method=core_heating_day_set_method,
+                            min_minutes_heating=key[0],
+                            max_minutes_cooling=key[1])
+                    heating_metrics[key] = self._calculate_heating_metrics(
+                        core_heating_day_sets, climate_zone,
+                        baseline_regional_heating_comfort_temperature)
+                    self._clear_core_day_set_derived()
+                metrics.extend(heating_metrics[key])
+
+            for outputs in metrics:
+                row = dict(outputs)
+                row.update(grid_point)
+                rows.append(row)
+
+        threshold_columns = list(self.CORE_DAY_THRESHOLDS)
+        metrics_columns = [c for c in METRICS_COLUMNS
+                if any(c in row for row in rows)]
+        other_columns = sorted(set(chain(*rows)) -
+                set(threshold_columns) - set(metrics_columns))
+        return pd.DataFrame(rows,
+                columns=threshold_columns + metrics_columns + other_columns)
+
+    def _calculate_cooling_metrics(self, core_cooling_day_sets, climate_zone,
+            baseline_regional_cooling_comfort_temperature):
+        # Savings metrics for each core cooling day set; see
+        # calculate_epa_field_savings_metrics.
+        metrics = []
+        ignored_days = self._get_ignored_days_by_set(core_cooling_day_sets)
+        for core_cooling_day_set, (n_days_both, n_days_insufficient_data) in \
+                zip(core_cooling_day_sets, ignored_days):
+
+            baseline10_comfort_temperature = \
+                self.get_core_cooling_day_baseline_setpoint(core_cooling_day_set)
+
+            daily_runtime = self.cool_runtime[core_cooling_day_set.daily]
+
+            (
+                demand,
+                tau,
+                alpha,
+                mse,
+                rmse,
+                cvrmse,
+                mape,
+                mae,
+            ) = self.get_cooling_demand(core_cooling_day_set)
+
+            total_runtime_core_cooling = daily_runtime.sum()
+            n_days = core_cooling_day_set.daily.sum()
+
+            average_daily_cooling_runtime = \
+                total_runtime_core_cooling / n_days
+
+            temp_baselines = [baseline10_comfort_temperature]
+            if baseline_regional_cooling_comfort_temperature is not None:
+                temp_baselines.append(baseline_regional_cooling_comfort_temperature)
+            scenarios = self.get_baseline_cooling_scenarios(
+                core_cooling_day_set, temp_baselines, tau, alpha)
+            baseline_outputs = _get_baseline_outputs(
+                scenarios, ["percentile", "regional"])
+
+            n_core_cooling_days = self.get_core_day_set_n_days(core_cooling_day_set)
+            n_days_in_inputfile_date_range = self.get_inputfile_date_range(core_cooling_day_set)
+
+            outputs = {
+                "sw_version": get_version(),
+
+                "ct_identifier": self.thermostat_id,
+                "equipment_type": self.equipment_type,
+                "heating_or_cooling": core_cooling_day_set.name,
+                "zipcode": self.zipcode,
+                "station": self.station,
+                "climate_zone": climate_zone,
+
+                "start_date": pd.Timestamp(core_cooling_day_set.start_date).to_pydatetime().isoformat(),
+                "end_date": pd.Timestamp(core_cooling_day_set.end_date).to_pydatetime().isoformat(),
+                "n_days_in_inputfile_date_range": n_days_in_inputfile_date_range,
+                "n_days_both_heating_and_cooling": n_days_both,
+                "n_days_insufficient_data": n_days_insufficient_data,
+                "n_core_cooling_days": n_core_cooling_days,
+
+                "baseline_percentile_core_cooling_comfort_temperature": baseline10_comfort_temperature,
+                "regional_average_baseline_cooling_comfort_temperature": baseline_regional_cooling_comfort_temperature,
+
+                "mean_demand": np.nanmean(demand),
+                "tau": tau,
+                "alpha": alpha,
+                "mean_sq_err": mse,
+                "root_mean_sq_err": rmse,
+                "cv_root_mean_sq_err": cvrmse,
+                "mean_abs_pct_err": mape,
+                "mean_abs_err": mae,
+
+                "total_core_cooling_runtime": total_runtime_core_cooling,
+
+                "daily_mean_core_cooling_runtime": average_daily_cooling_runtime,
+            }
+            outputs.update(baseline_outputs)
+
+            metrics.append(outputs)
 
-                baseline10_demand = self.get_baseline_cooling_demand(
-                    core_cooling_day_set,
-                    baseline10_comfort_temperature,
-                    tau,
-                )
+        return metrics
 
-                baseline10_runtime = self.get_baseline_cooling_runtime(
-                    baseline10_demand,
-                    alpha
-                )
+    def _calculate_heating_metrics(self, core_heating_day_sets, climate_zone,
+            baseline_regional_heating_comfort_temperature):
+        # Savings metrics for each core heating day set; see
+        # calculate_epa_field_savings_metrics.
+        metrics = []
+        ignored_days = self._get_ignored_days_by_set(core_heating_day_sets)
+        for core_heating_day_set, (n_days_both, n_days_insufficient_data) in \
+                zip(core_heating_day_sets, ignored_days):
+
+            baseline90_comfort_temperature = \
+                    self.get_core_heating_day_baseline_setpoint(core_heating_day_set)
+
+            # deltaT
+            daily_runtime = self.heat_runtime[core_heating_day_set.daily]
+
+            (
+                demand,
+                tau,
+                alpha,
+                mse,
+                rmse,
+                cvrmse,
+                mape,
+                mae,
+            ) = self.get_heating_demand(core_heating_day_set)
+
+            total_runtime_core_heating = daily_runtime.sum()
+            n_days = core_heating_day_set.daily.sum()
+            average_daily_heating_runtime = \
+                total_runtime_core_heating / n_days
+
+            temp_baselines = [baseline90_comfort_temperature]
+            if baseline_regional_heating_comfort_temperature is not None:
+                temp_baselines.append(baseline_regional_heating_comfort_temperature)
+            scenarios = self.get_baseline_heating_scenarios(
+                core_heating_day_set, temp_baselines, tau, alpha)
+            baseline_outputs = _get_baseline_outputs(
+                scenarios, ["percentile", "regional"])
+
+            n_core_heating_days = self.get_core_day_set_n_days(core_heating_day_set)
+            n_days_in_inputfile_date_range = self.get_inputfile_date_range(core_heating_day_set)
+
+            outputs = {
+                "sw_version": get_version(),
+
+                "ct_identifier": self.thermostat_id,
+                "equipment_type": self.equipment_type,
+                "heating_or_cooling": core_heating_day_set.name,
+                "zipcode": self.zipcode,
+                "station": self.station,
+                "climate_zone": climate_zone,
+
+                "start_date": pd.Timestamp(core_heating_day_set.start_date).to_pydatetime().isoformat(),
+                "end_date": pd.Timestamp(core_heating_day_set.end_date).to_pydatetime().isoformat(),
+                "n_days_in_inputfile_date_range": n_days_in_inputfile_date_range,
+                "n_days_both_heating_and_cooling": n_days_both,
+                "n_days_insufficient_data": n_days_insufficient_data,
+                "n_core_heating_days": n_core_heating_days,
+
+                "baseline_percentile_core_heating_comfort_temperature": baseline90_comfort_temperature,
+                "regional_average_baseline_heating_comfort_temperature": baseline_regional_heating_comfort_temperature,
+
+                "mean_demand": np.nanmean(demand),
+                "tau": tau,
+                "alpha": alpha,
+                "mean_sq_err": mse,
+                "root_mean_sq_err": rmse,
+                "cv_root_mean_sq_err": cvrmse,
+                "mean_abs_pct_err": mape,
+                "mean_abs_err": mae,
+
+                "total_core_heating_runtime": total_runtime_core_heating,
+
+                "daily_mean_core_heating_runtime": average_daily_heating_runtime,
+            }
+            outputs.update(baseline_outputs)
+
+            if self.equipment_type in self.AUX_EMERG_EQUIPMENT_TYPES:
+
+                additional_outputs = {
+                    "total_auxiliary_heating_core_day_runtime":
+                        self.total_auxiliary_heating_runtime(
+                            core_heating_day_set),
+                    "total_emergency_heating_core_day_runtime":
+                        self.total_emergency_heating_runtime(
+                            core_heating_day_set),
+                }
 
-                avoided_runtime_baseline10 = avoided(baseline10_runtime, daily_runtime)
+                rhus = self.get_resistance_heat_utilization_bins(core_heating_day_set)
 
-                savings_baseline10 = percent_savings(avoided_runtime_baseline10, baseline10_runtime)
+                bin_edges = self.get_resistance_heat_utilization_bin_edges()
+                temperature_bins = zip(bin_edges[:-1], bin_edges[1:])
+                if rhus is not None:
+                    iter_rhus = rhus
+                else:
+                    iter_rhus = repeat(None)
 
-                if baseline_regional_cooling_comfort_temperature is not None:
+                for rhu, (low, high) in zip(iter_rhus, temperature_bins):
+                    column = 'rhu_{:02d}F_to_{:02d}F'.format(low, high)
+                    additional_outputs[column] = rhu
 
-                    baseline_regional_demand = self.get_baseline_cooling_demand(
-                        core_cooling_day_set,
-                        baseline_regional_cooling_comfort_temperature,
-                        tau
-                    )
+                outputs.update(additional_outputs)
+            metrics.append(outputs)
 
-                    baseline_regional_runtime = self.get_baseline_cooling_runtime(
-                        baseline_regional_demand,
-                        alpha
-                    )
+        return metrics
 
-                    avoided_runtime_baseline_regional = avoided(baseline_regional_runtime, daily_runtime)
 
-                    savings_baseline_regional = percent_savings(avoided_runtime_baseline_regional, baseline_regional_runtime)
+class Thermostat(BaseThermostat):
+    """ Main thermostat data container. Each parameter which contains
+    timeseries data should be a pandas.Series with a datetimeIndex, and that
+    each index should be equivalent.
 
-                    percent_savings_baseline_regional = savings_baseline_regional
-                    avoided_daily_mean_core_day_runtime_baseline_regional = avoided_runtime_baseline_regional.mean()
-                    avoided_total_core_day_runtime_baseline_regional = avoided_runtime_baseline_regional.sum()
-                    baseline_daily_mean_core_day_runtime_baseline_regional = baseline_regional_runtime.mean()
-                    baseline_total_core_day_runtime_baseline_regional = baseline_regional_runtime.sum()
-                    _daily_mean_core_day_demand_baseline_baseline_regional = np.nanmean(baseline_regional_demand)
+    Parameters
+    ----------
+    thermostat_id : object
+        An identifier for the thermostat. Can be anything, but should be
+        identifying (e.g., an ID provided by the manufacturer).
+    equipment_type : { 0, 1, 2, 3, 4, 5 }
+        - :code:`0`: Other - e.g. multi-zone multi-stage, modulating. Note: module will
+          not output savings data for this type.
+        - :code:`1`: Single stage heat pump with aux and/or emergency heat
+        - :code:`2`: Single stage heat pump without aux or emergency heat
+        - :code:`3`: Single stage non heat pump with single-stage central air conditioning
+        - :code:`4`: Single stage non heat pump without central air conditioning
+        - :code:`5`: Single stage central air conditioning without central heating
+    zipcode : str
+        Installation ZIP code for the thermostat.
+    station : str
+        USAF identifier for weather station used to pull outdoor temperature data.
+    temperature_in : pandas.Series
+        Contains internal temperature data in degrees Fahrenheit (F),
+        with resolution of at least 0.5F.
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    temperature_out : pandas.Series
+        Contains outdoor temperature data as observed by a relevant
+        weather station in degrees Fahrenheit (F), with resolution of at least
+        0.5F.
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    cooling_setpoint : pandas.Series
+        Contains target temperature (setpoint) data in degrees Fahrenheit (F),
+        with resolution of at least 0.5F used to control cooling equipment.
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    heating_setpoint : pandas.Series
+        Contains target temperature (setpoint) data in degrees Fahrenheit (F),
+        with resolution of at least 0.5F used to control heating equipment.
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    cool_runtime : pandas.Series,
+        Daily runtimes for cooling equipment controlled by the thermostat, measured
+        in minutes. No datapoint should exceed 1440 mins, which would indicate
+        over a day of runtime (impossible).
+        Should be indexed by a pandas.DatetimeIndex with daily frequency (i.e.
+        :code:`freq='D'`).
+    heat_runtime : pandas.Series,
+        Daily runtimes for heating equipment controlled by the thermostat, measured
+        in minutes. No datapoint should exceed 1440 mins, which would indicate
+        over a day of runtime (impossible).
+        Should be indexed by a pandas.DatetimeIndex with daily frequency (i.e.
+        :code:`freq='D'`).
+    auxiliary_heat_runtime : pandas.Series,
+        Hourly runtimes for auxiliary heating equipment controlled by the
+        thermostat, measured in minutes. Auxiliary heat runtime is counted when
+        both resistance heating and the compressor are running (for heat pump
+        systems). No datapoint should exceed 60 mins, which would indicate
+        over a hour of runtime (impossible).
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    emergency_heat_runtime : pandas.Series,
+        Hourly runtimes for emergency heating equipment controlled by the
+        thermostat, measured in minutes. Emergency heat runtime is counted when
+        resistance heating is running when the compressor is not (for heat pump
+        systems). No datapoint should exceed 60 mins, which would indicate
+        over a hour of runtime (impossible).
+        Should be indexed by a pandas.DatetimeIndex with hourly frequency (i.e.
+        :code:`freq='H'`).
+    """
 
-                else:
+    def __init__(
+            self, thermostat_id, equipment_type, zipcode, station,
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime):
 
-                    baseline_regional_demand = None
-                    baseline_regional_runtime = None
-
-                    avoided_runtime_baseline_regional = None
-
-                    savings_baseline_regional = None
-
-                    percent_savings_baseline_regional = None
-                    avoided_daily_mean_core_day_runtime_baseline_regional = None
-                    avoided_total_core_day_runtime_baseline_regional = None
-                    baseline_daily_mean_core_day_runtime_baseline_regional = None
-                    baseline_total_core_day_runtime_baseline_regional = None
-                    _daily_mean_core_day_demand_baseline_baseline_regional = None
-
-                n_days_both, n_days_insufficient_data = self.get_ignored_days(core_cooling_day_set)
-                n_core_cooling_days = self.get_core_day_set_n_days(core_cooling_day_set)
-                n_days_in_inputfile_date_range = self.get_inputfile_date_range(core_cooling_day_set)
-
-                outputs = {
-                    "sw_version": get_version(),
-
-                    "ct_identifier": self.thermostat_id,
-                    "equipment_type": self.equipment_type,
-                    "heating_or_cooling": core_cooling_day_set.name,
-                    "zipcode": self.zipcode,
-                    "station": self.station,
-                    "climate_zone": climate_zone,
-
-                    "start_date": pd.Timestamp(core_cooling_day_set.start_date).to_pydatetime().isoformat(),
-                    "end_date": pd.Timestamp(core_cooling_day_set.end_date).to_pydatetime().isoformat(),
-                    "n_days_in_inputfile_date_range": n_days_in_inputfile_date_range,
-                    "n_days_both_heating_and_cooling": n_days_both,
-                    "n_days_insufficient_data": n_days_insufficient_data,
-                    "n_core_cooling_days": n_core_cooling_days,
-
-                    "baseline_percentile_core_cooling_comfort_temperature": baseline10_comfort_temperature,
-                    "regional_average_baseline_cooling_comfort_temperature": baseline_regional_cooling_comfort_temperature,
-
-                    "percent_savings_baseline_percentile": savings_baseline10,
-                    "avoided_daily_mean_core_day_runtime_baseline_percentile": avoided_runtime_baseline10.mean(),
-                    "avoided_total_core_day_runtime_baseline_percentile": avoided_runtime_baseline10.sum(),
-                    "baseline_daily_mean_core_day_runtime_baseline_percentile": baseline10_runtime.mean(),
-                    "baseline_total_core_day_runtime_baseline_percentile": baseline10_runtime.sum(),
-                    "_daily_mean_core_day_demand_baseline_baseline_percentile": np.nanmean(baseline10_demand),
-                    "percent_savings_baseline_regional": percent_savings_baseline_regional,
-                    "avoided_daily_mean_core_day_runtime_baseline_regional": avoided_daily_mean_core_day_runtime_baseline_regional,
-                    "avoided_total_core_day_runtime_baseline_regional": avoided_total_core_day_runtime_baseline_regional,
-                    "baseline_daily_mean_core_day_runtime_baseline_regional": baseline_daily_mean_core_day_runtime_baseline_regional,
-                    "baseline_total_core_day_runtime_baseline_regional": baseline_total_core_day_runtime_baseline_regional,
-                    "_daily_mean_core_day_demand_baseline_baseline_regional": _daily_mean_core_day_demand_baseline_baseline_regional,
-                    "mean_demand": np.nanmean(demand),
-                    "tau": tau,
-                    "alpha": alpha,
-                    "mean_sq_err": mse,
-                    "root_mean_sq_err": rmse,
-                    "cv_root_mean_sq_err": cvrmse,
-                    "mean_abs_pct_err": mape,
-                    "mean_abs_err": mae,
-
-                    "total_core_cooling_runtime": total_runtime_core_cooling,
-
-                    "daily_mean_core_cooling_runtime": average_daily_cooling_runtime,
-                }
+        self.thermostat_id = thermostat_id
+        self.equipment_type = equipment_type
+        self.zipcode = zipcode
+        self.station = station
+
+        self._raw_tails = {
+            "temperature_in": _get_raw_tail(temperature_in),
+            "temperature_out": _get_raw_tail(temperature_out),
+        }
+        self.temperature_in = self._interpolate(temperature_in, method="linear")
+        self.temperature_out = self._interpolate(temperature_out, method="linear")
+        self.cooling_setpoint = cooling_setpoint
+        self.heating_setpoint = heating_setpoint
 
-                metrics.append(outputs)
+        self.cool_runtime = cool_runtime
+        self.heat_runtime = heat_runtime
+        self.auxiliary_heat_runtime = auxiliary_heat_runtime
+        self.emergency_heat_runtime = emergency_heat_runtime
 
-        if self.equipment_type in self.HEATING_EQUIPMENT_TYPES:
-            for core_heating_day_set in self.get_core_heating_days(method=core_heating_day_set_method):
+        self._derived = OrderedDict()
+
+        self.validate()
 
-                baseline90_comfort_temperature = \
-                        self.get_core_heating_day_baseline_setpoint(core_heating_day_set)
 
-                # deltaT
-                daily_runtime = self.heat_runtime[core_heating_day_set.daily]
+def _hourly_channel(i):
+    def get(self):
+        if not self._has_hourly[i]:
+            return None
+        index = _get_index(self.start, self.hourly.shape[1], "H")
+        return pd.Series(self._get_hourly_values(i), index=index, copy=False)
+    return property(get)
 
-                (
-                    demand,
-                    tau,
-                    alpha,
-                    mse,
-                    rmse,
-                    cvrmse,
-                    mape,
-                    mae,
-                ) = self.get_heating_demand(core_heating_day_set)
 
-                total_runtime_core_heating = daily_runtime.sum()
-                n_days = core_heating_day_set.daily.sum()
-                average_daily_heating_runtime = \
-                    total_runtime_core_heating / n_days
+def _daily_channel(i):
+    def get(self):
+        if not self._has_daily[i]:
+            return None
+        index = _get_index(self.start, self.daily.shape[1], "D")
+        values = _decode(self.daily[i], 1, self.QUANTIZED_DAILY_NULL)
+        return pd.Series(values, index=index, copy=False)
+    return property(get)
+
+
+def _encode(values, scale, dtype, null):
+    # quantize float values to integers of the given dtype, with nulls as the
+    # sentinel value `null`.
+    info = np.iinfo(dtype)
+    scaled = np.round(values * scale)
+    is_null = np.isnan(scaled)
+    in_range = (scaled[~is_null] >= info.min) & (scaled[~is_null] <= info.max) & \
+        (scaled[~is_null] != null)
+    if not np.all(in_range):
+        raise ValueError("Values out of range for quantized storage.")
+    return np.where(is_null, null, scaled).astype(dtype)
+
+
+def _decode(values, scale, null):
+    if values.dtype.kind == "f":
+        return values
+    decoded = values / float(scale)
+    decoded[values == null] = np.nan
+    return decoded
+
+
+class CompactThermostat(BaseThermostat):
+    """ Thermostat data container which keeps timeseries data in two arrays,
+    rather than as separate pandas Series, for keeping many thermostats in
+    memory at once. Usually created with :code:`Thermostat.from_arrays`.
+
+    Series attributes (e.g., :code:`temperature_in`) are read-only, and are
+    created as views on the arrays on each access, sharing their index with
+    any other thermostats with data over the same dates.
+
+    If quantized, indoor temperatures and setpoints are stored as int16
+    tenths of a degree F, hourly runtimes as int16 minutes, and daily
+    runtimes as uint16 minutes, with the minimum (int16) or maximum (uint16)
+    value standing for null. Series attributes are then decoded to float on
+    each access. Outdoor temperatures, which are converted from Celsius and
+    so aren't multiples of 0.1F, are kept as floats in
+    :code:`unquantized_hourly`, and other hourly values which aren't
+    multiples of their step (e.g., hours filled in by interpolation) are kept
+    as floats in :code:`inexact_hours`, so that all data is stored exactly.
+    Hourly data then takes 18 rather than 48 bytes per hour (plus 16 bytes
+    per inexact hour), and daily data 4 rather than 16 bytes per day: about
+    2.5 times less memory in all (see :code:`nbytes`).
+
+    Attributes
+    ----------
+    start : datetime.datetime
+        Midnight at the start of the first day of data.
+    hourly : numpy.array
+        Hourly data, with shape (6, n_hours) and rows in the order of
+        :code:`HOURLY_CHANNELS`. Rows of data not provided are null. If
+        quantized, only channels which are quantized (those with a scale in
+        :code:`QUANTIZED_HOURLY_SCALES`) have rows.
+    daily : numpy.array
+        Daily data, with shape (2, n_days) and rows in the order of
+        :code:`DAILY_CHANNELS`. Rows of data not provided are null.
+    unquantized_hourly : numpy.array
+        If quantized, hourly data of the channels which aren't quantized
+        (those with a scale of None in :code:`QUANTIZED_HOURLY_SCALES`), with
+        shape (n_channels, n_hours), in the order of :code:`HOURLY_CHANNELS`.
+        Otherwise None.
+    inexact_hours : dict
+        If quantized, positions and values, as a tuple of numpy.arrays, of
+        the hours of each quantized hourly channel (by position in
+        :code:`HOURLY_CHANNELS`) with values which aren't multiples of the
+        channel's step. Otherwise None.
+    quantized : boolean
+        True if data is stored quantized.
+    """
 
-                baseline90_demand = self.get_baseline_heating_demand(
-                    core_heating_day_set,
-                    baseline90_comfort_temperature,
-                    tau,
-                )
+    __slots__ = (
+        "thermostat_id", "equipment_type", "zipcode", "station", "start",
+        "hourly", "daily", "unquantized_hourly", "inexact_hours",
+        "_has_hourly", "_has_daily", "_raw_tails", "_derived",
+    )
+
+    HOURLY_CHANNELS = (
+        "temperature_in", "temperature_out", "cooling_setpoint",
+        "heating_setpoint", "auxiliary_heat_runtime", "emergency_heat_runtime",
+    )
+    DAILY_CHANNELS = ("cool_runtime", "heat_runtime")
+
+    # tenths of degrees, minutes; None for channels kept as floats.
+    QUANTIZED_HOURLY_SCALES = (10, None, 10, 10, 1, 1)
+    QUANTIZED_HOURLY_NULL = np.iinfo(np.int16).min
+    QUANTIZED_DAILY_NULL = np.iinfo(np.uint16).max
+
+    temperature_in = _hourly_channel(0)
+    temperature_out = _hourly_channel(1)
+    cooling_setpoint = _hourly_channel(2)
+    heating_setpoint = _hourly_channel(3)
+    auxiliary_heat_runtime = _hourly_channel(4)
+    emergency_heat_runtime = _hourly_channel(5)
+    cool_runtime = _daily_channel(0)
+    heat_runtime = _daily_channel(1)
 
-                baseline90_runtime = self.get_baseline_heating_runtime(
-                    baseline90_demand,
-                    alpha,
-                )
+    def __init__(
+            self, thermostat_id, equipment_type, zipcode, station, start,
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime, quantized=False):
 
-                avoided_runtime_baseline90 = avoided(baseline90_runtime, daily_runtime)
+        self.thermostat_id = thermostat_id
+        self.equipment_type = equipment_type
+        self.zipcode = zipcode
+        self.station = station
+        self.start = pd.Timestamp(start).to_pydatetime()
 
-                savings_baseline90 = percent_savings(avoided_runtime_baseline90, baseline90_runtime)
+        hourly = [
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, auxiliary_heat_runtime, emergency_heat_runtime]
+        daily = [cool_runtime, heat_runtime]
 
-                if baseline_regional_heating_comfort_temperature is not None:
+        n_hours = np.asarray(temperature_in).shape[0]
+        if n_hours % 24 != 0:
+            message = "For thermostat {}, hourly data must span a whole" \
+                      " number of days.".format(thermostat_id)
+            raise ValueError(message)
+        n_days = n_hours // 24
 
-                    baseline_regional_demand = self.get_baseline_heating_demand(
-                        core_heating_day_set,
-                        baseline_regional_heating_comfort_temperature,
-                        tau,
-                    )
+        self._has_hourly = tuple(values is not None for values in hourly)
+        self._has_daily = tuple(values is not None for values in daily)
+        self.hourly = _stack_channels(hourly, n_hours, thermostat_id)
+        self.daily = _stack_channels(daily, n_days, thermostat_id)
+        self.unquantized_hourly = None
+        self.inexact_hours = None
 
-                    baseline_regional_runtime = self.get_baseline_heating_runtime(
-                        baseline_regional_demand,
-                        alpha,
-                    )
+        self._raw_tails = {
+            "temperature_in": _get_raw_tail(self.hourly[0]),
+            "temperature_out": _get_raw_tail(self.hourly[1]),
+        }
+        for i in [0, 1]:  # temperature_in, temperature_out
+            self.hourly[i] = self._interpolate(pd.Series(self.hourly[i]), method="linear").values
 
-                    avoided_runtime_baseline_regional = avoided(baseline_regional_runtime, daily_runtime)
+        if quantized:
+            self.hourly, self.unquantized_hourly, self.inexact_hours, self.daily = \
+                self._quantize(self.hourly, self.daily)
 
-                    savings_baseline_regional = percent_savings(avoided_runtime_baseline_regional, baseline_regional_runtime)
+        self._derived = OrderedDict()
 
-                    percent_savings_baseline_regional = savings_baseline_regional
-                    avoided_daily_mean_core_day_runtime_baseline_regional = avoided_runtime_baseline_regional.mean()
-                    avoided_total_core_day_runtime_baseline_regional = avoided_runtime_baseline_regional.sum()
-                    baseline_daily_mean_core_day_runtime_baseline_regional = baseline_regional_runtime.mean()
-                    baseline_total_core_day_runtime_baseline_regional = baseline_regional_runtime.sum()
-                    _daily_mean_core_day_demand_baseline_baseline_regional = np.nanmean(baseline_regional_demand)
+        self.validate()
 
-                else:
+    def _append_data(self, temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, cool_runtime, heat_runtime,
+            auxiliary_heat_runtime, emergency_heat_runtime):
+        hourly = [
+            temperature_in, temperature_out, cooling_setpoint,
+            heating_setpoint, auxiliary_heat_runtime, emergency_heat_runtime]
+        daily = [cool_runtime, heat_runtime]
+
+        has_hourly = tuple(values is not None for values in hourly)
+        has_daily = tuple(values is not None for values in daily)
+        if has_hourly != self._has_hourly or has_daily != self._has_daily:
+            message = "For thermostat {}, new data must be given for the" \
+                      " same series as the thermostat has.".format(self.thermostat_id)
+            raise ValueError(message)
 
-                    baseline_regional_demand = None
-
-                    baseline_regional_runtime = None
-
-                    avoided_runtime_baseline_regional = None
-
-                    savings_baseline_regional = None
-
-                    percent_savings_baseline_regional = None
-                    avoided_daily_mean_core_day_runtime_baseline_regional = None
-                    avoided_total_core_day_runtime_baseline_regional = None
-                    baseline_daily_mean_core_day_runtime_baseline_regional = None
-                    baseline_total_core_day_runtime_baseline_regional = None
-                    _daily_mean_core_day_demand_baseline_baseline_regional = None
-
-
-                n_days_both, n_days_insufficient_data = self.get_ignored_days(core_heating_day_set)
-                n_core_heating_days = self.get_core_day_set_n_days(core_heating_day_set)
-                n_days_in_inputfile_date_range = self.get_inputfile_date_range(core_heating_day_set)
-
-                outputs = {
-                    "sw_version": get_version(),
-
-                    "ct_identifier": self.thermostat_id,
-                    "equipment_type": self.equipment_type,
-                    "heating_or_cooling": core_heating_day_set.name,
-                    "zipcode": self.zipcode,
-                    "station": self.station,
-                    "climate_zone": mapping.get(self.zipcode),
-
-                    "start_date": pd.Timestamp(core_heating_day_set.start_date).to_pydatetime().isoformat(),
-                    "end_date": pd.Timestamp(core_heating_day_set.end_date).to_pydatetime().isoformat(),
-                    "n_days_in_inputfile_date_range": n_days_in_inputfile_date_range,
-                    "n_days_both_heating_and_cooling": n_days_both,
-                    "n_days_insufficient_data": n_days_insufficient_data,
-                    "n_core_heating_days": n_core_heating_days,
-
-                    "baseline_percentile_core_heating_comfort_temperature": baseline90_comfort_temperature,
-                    "regional_average_baseline_heating_comfort_temperature": baseline_regional_heating_comfort_temperature,
-
-                    "percent_savings_baseline_percentile": savings_baseline90,
-                    "avoided_daily_mean_core_day_runtime_baseline_percentile": avoided_runtime_baseline90.mean(),
-                    "avoided_total_core_day_runtime_baseline_percentile": avoided_runtime_baseline90.sum(),
-                    "baseline_daily_mean_core_day_runtime_baseline_percentile": baseline90_runtime.mean(),
-                    "baseline_total_core_day_runtime_baseline_percentile": baseline90_runtime.sum(),
-                    "_daily_mean_core_day_demand_baseline_baseline_percentile": np.nanmean(baseline90_demand),
-                    "percent_savings_baseline_regional": savings_baseline_regional,
-                    "avoided_daily_mean_core_day_runtime_baseline_regional": avoided_daily_mean_core_day_runtime_baseline_regional,
-                    "avoided_total_core_day_runtime_baseline_regional": avoided_total_core_day_runtime_baseline_regional,
-                    "baseline_daily_mean_core_day_runtime_baseline_regional": baseline_daily_mean_core_day_runtime_baseline_regional,
-                    "baseline_total_core_day_runtime_baseline_regional": baseline_total_core_day_runtime_baseline_regional,
-                    "_daily_mean_core_day_demand_baseline_baseline_regional": _daily_mean_core_day_demand_baseline_baseline_regional,
-                    "mean_demand": np.nanmean(demand),
-                    "tau": tau,
-                    "alpha": alpha,
-                    "mean_sq_err": mse,
-                    "root_mean_sq_err": rmse,
-                    "cv_root_mean_sq_err": cvrmse,
-                    "mean_abs_pct_err": mape,
-                    "mean_abs_err": mae,
-
-                    "total_core_heating_runtime": total_runtime_core_heating,
-
-                    "daily_mean_core_heating_runtime": average_daily_heating_runtime,
-                }
+        n_hours = np.asarray(temperature_in).shape[0]
+        if n_hours % 24 != 0:
+            message = "For thermostat {}, hourly data must span a whole" \
+                      " number of days.".format(self.thermostat_id)
+            raise ValueError(message)
+        new_hourly = _stack_channels(hourly, n_hours, self.thermostat_id)
+        new_daily = _stack_channels(daily, n_hours // 24, self.thermostat_id)
+
+        rewritten, raw_tails = {}, {}
+        for i, series_name in enumerate(["temperature_in", "temperature_out"]):
+            rewritten[i], new_hourly[i], raw_tails[series_name] = \
+                self._interpolate_appended(series_name, new_hourly[i])
+
+        n_old_hours = self.hourly.shape[1]
+        if self.quantized:
+            new_hourly, new_unquantized_hourly, new_inexact_hours, new_daily = \
+                self._quantize(new_hourly, new_daily)
+            self.unquantized_hourly = np.concatenate(
+                [self.unquantized_hourly, new_unquantized_hourly], axis=1)
+            for i, (positions, values) in new_inexact_hours.items():
+                old_positions, old_values = self.inexact_hours.get(
+                    i, (np.empty((0,), dtype=int), np.empty((0,))))
+                self.inexact_hours[i] = (
+                    np.concatenate([old_positions, positions + n_old_hours]),
+                    np.concatenate([old_values, values]))
+
+        self.hourly = np.concatenate([self.hourly, new_hourly], axis=1)
+        self.daily = np.concatenate([self.daily, new_daily], axis=1)
+        for i, values in rewritten.items():
+            self._set_hourly_values(i, n_old_hours - values.shape[0], values)
+        self._raw_tails.update(raw_tails)
+
+    def _set_hourly_values(self, i, start, values):
+        # overwrites hours of hourly channel i from position `start` on.
+        end = start + values.shape[0]
+        if not self.quantized:
+            self.hourly[i, start:end] = values
+            return
+        scale = self.QUANTIZED_HOURLY_SCALES[i]
+        n_unquantized_before = self.QUANTIZED_HOURLY_SCALES[:i].count(None)
+        if scale is None:
+            self.unquantized_hourly[n_unquantized_before, start:end] = values
+            return
+        quantized, inexact, inexact_values = self._quantize_hourly_channel(i, values)
+        self.hourly[i - n_unquantized_before, start:end] = quantized
+        positions, old_values = self.inexact_hours.pop(
+            i, (np.empty((0,), dtype=int), np.empty((0,))))
+        kept = (positions < start) | (positions >= end)
+        positions = np.concatenate([positions[kept], inexact + start])
+        order = np.argsort(positions, kind="mergesort")
+        if positions.shape[0] > 0:
+            self.inexact_hours[i] = (
+                positions[order],
+                np.concatenate([old_values[kept], inexact_values])[order])
+
+    def _quantize_hourly_channel(self, i, values):
+        # quantized values of hourly channel i, with the positions and values
+        # of hours which aren't multiples of its step.
+        scale = self.QUANTIZED_HOURLY_SCALES[i]
+        quantized = _encode(values, scale, np.int16, self.QUANTIZED_HOURLY_NULL)
+        decoded = _decode(quantized, scale, self.QUANTIZED_HOURLY_NULL)
+        inexact = np.flatnonzero((decoded != values) & ~np.isnan(values))
+        return quantized, inexact, values[inexact]
+
+    def _quantize(self, hourly, daily):
+        # returns quantized hourly channels, unquantized hourly channels,
+        # inexact hours of quantized hourly channels, and quantized daily data.
+        scales = self.QUANTIZED_HOURLY_SCALES
+        quantized_channels = [i for i, scale in enumerate(scales) if scale is not None]
+        unquantized_channels = [i for i, scale in enumerate(scales) if scale is None]
+        quantized_hourly = np.empty((len(quantized_channels), hourly.shape[1]),
+                                    dtype=np.int16)
+        inexact_hours = {}
+        try:
+            for row, i in enumerate(quantized_channels):
+                quantized_hourly[row], inexact, inexact_values = \
+                    self._quantize_hourly_channel(i, hourly[i])
+                if inexact.shape[0] > 0:
+                    inexact_hours[i] = (inexact, inexact_values)
+            quantized_daily = _encode(daily, 1, np.uint16, self.QUANTIZED_DAILY_NULL)
+        except ValueError:
+            message = "For thermostat {}, data is out of range for" \
+                      " quantized storage.".format(self.thermostat_id)
+            raise ValueError(message)
+        return quantized_hourly, hourly[unquantized_channels], inexact_hours, quantized_daily
+
+    def _get_hourly_values(self, i):
+        if not self.quantized:
+            return self.hourly[i]
+        scale = self.QUANTIZED_HOURLY_SCALES[i]
+        n_unquantized_before = self.QUANTIZED_HOURLY_SCALES[:i].count(None)
+        if scale is None:
+            return self.unquantized_hourly[n_unquantized_before]
+        values = _decode(self.hourly[i - n_unquantized_before], scale,
+                         self.QUANTIZED_HOURLY_NULL)
+        if i in self.inexact_hours:
+            positions, inexact_values = self.inexact_hours[i]
+            values[positions] = inexact_values
+        return values
+
+    @property
+    def quantized(self):
+        return self.hourly.dtype.kind != "f"
+
+    @property
+    def nbytes(self):
+        """ Total bytes of timeseries data held. """
+        nbytes = self.hourly.nbytes + self.daily.nbytes
+        if self.quantized:
+            nbytes += self.unquantized_hourly.nbytes
+            nbytes += sum(positions.nbytes + values.nbytes
+                          for positions, values in self.inexact_hours.values())
+        return nbytes
+
+    def _get_series_dependencies(self, series_names):
+        # series can't be replaced, so cached values never go stale.
+        return ()
+
+
+def _get_raw_tail(values):
+    # raw values from the last non-null value on. With data appended later,
+    # they determine how the hours at the end of the data are interpolated.
+    if values is None:
+        return None
+    values = np.asarray(values, dtype=float)
+    non_null = np.flatnonzero(~np.isnan(values))
+    start = non_null[-1] if non_null.shape[0] > 0 else 0
+    return values[start:].copy()
+
+
+def _stack_channels(channels, length, thermostat_id):
+    stacked = np.tile(np.nan, (len(channels), length))
+    for i, values in enumerate(channels):
+        if values is not None:
+            values = np.asarray(values, dtype=float)
+            if values.shape != (length,):
+                message = "For thermostat {}, expected {} values but got {}." \
+                          .format(thermostat_id, length, values.shape[0])
+                raise ValueError(message)
+            stacked[i] = values
+    return stacked
+
+
+_index_cache = OrderedDict()
+
+def _get_index(start, periods, freq, cache_size=32):
+    # DatetimeIndexes are immutable, so thermostats with data over the same
+    # dates can share them. Recently used indexes are kept.
+    key = (start, periods, freq)
+    try:
+        index = _index_cache.pop(key)
+    except KeyError:
+        index = pd.DatetimeIndex(start=start, periods=periods, freq=freq)
+    _index_cache[key] = index
+    while len(_index_cache) > cache_size:
+        _index_cache.popitem(last=False)
+    return index
+
+
+def _resample_daily(series, how):
+    resampled = series.resample('D')
+    if how == "mean":
+        return resampled.mean()
+    elif how == "sum":
+        return resampled.sum()
+    else:
+        raise NotImplementedError
+
+
+def _validate_bin_edges(bin_edges):
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    if bin_edges.ndim != 1 or bin_edges.shape[0] < 2 or \
+            np.any(np.isnan(bin_edges)) or np.any(np.diff(bin_edges) <= 0):
+        raise ValueError(
+            "Temperature bin edges must be at least two increasing values.")
+    return bin_edges
+
+
+def _bin_resistance_heat_utilization(temperature, heat_runtime, aux_runtime,
+        emg_runtime, bin_edges, group=None, n_groups=1):
+    """ Resistance heat utilization in every temperature bin of every group
+    of observations (days or hours), in a single pass.
+
+    Each observation is assigned to a bin with :code:`numpy.digitize`, and
+    runtimes are summed by (group, bin) with :code:`numpy.bincount`.
+    Observations with null temperatures or outside the bins are ignored, and
+    null runtimes count as zero.
 
-                if self.equipment_type in self.AUX_EMERG_EQUIPMENT_TYPES:
+    Parameters
+    ----------
+    temperature, heat_runtime, aux_runtime, emg_runtime : numpy.array
+        Outdoor temperature and runtimes of each observation.
+    bin_edges : numpy.array
+        Increasing edges of the temperature bins.
+    group : numpy.array, default: None
+        Group (from 0 to `n_groups` - 1) of each observation. If None, all
+        observations are in a single group.
+    n_groups : int, default: 1
+        Number of groups.
+
+    Returns
+    -------
+    rhus : numpy.array
+        Resistance heat utilization with shape (n_groups, n_bins). Bins
+        without heat runtime, or with more auxiliary heat runtime than heat
+        pump runtime, are np.nan.
+    R_heat, R_aux : numpy.array
+        Total heat pump and auxiliary heat runtime with shape
+        (n_groups, n_bins).
+    """
+    n_bins = bin_edges.shape[0] - 1
+    if group is None:
+        group = np.zeros(temperature.shape, dtype=int)
+
+    with np.errstate(invalid="ignore"):
+        temperature_bin = np.digitize(temperature, bin_edges) - 1
+    in_bin = (temperature_bin >= 0) & (temperature_bin < n_bins)
+    key = group[in_bin] * n_bins + temperature_bin[in_bin]
+
+    def bin_sum(values):
+        return np.bincount(key, weights=np.nan_to_num(values[in_bin]),
+                minlength=n_groups * n_bins).reshape((n_groups, n_bins))
+
+    R_heat = bin_sum(heat_runtime)
+    R_aux = bin_sum(aux_runtime)
+    R_emg = bin_sum(emg_runtime)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rhus = (R_aux + R_emg) / (R_heat + R_emg)
+    rhus[(R_heat + R_emg) == 0] = np.nan
+    rhus[R_aux > R_heat] = np.nan
+    return rhus, R_heat, R_aux
+
+
+def _load_climate_zone_mapping(climate_zone_mapping=None):
+    """ Load a mapping from zipcode to climate zone, as used by
+    :code:`Thermostat.calculate_epa_field_savings_metrics`. The default
+    mapping is loaded once per process.
+    """
+    if climate_zone_mapping is None:
+        return resources.get_climate_zone_mapping()
+
+    try:
+        return resources.read_climate_zone_mapping(climate_zone_mapping)
+    except: #!!! danger: wildcard except. Should specify exception.
+        raise ValueError("Could not load climate zone mapping")
+
+
+def _nanmean_rows(values):
+    # mean of the non-null values in each row, or np.nan if there are none.
+    n = np.sum(~np.isnan(values), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nansum(values, axis=1) / n
+
+
+def _get_baseline_outputs(scenarios, names):
+    # savings metrics outputs for each baseline scenario, suffixed by the
+    # scenario names; scenarios beyond those calculated are None.
+    avoided_mean = _nanmean_rows(scenarios.avoided_runtime)
+    avoided_total = np.nansum(scenarios.avoided_runtime, axis=1)
+    baseline_mean = _nanmean_rows(scenarios.runtime)
+    baseline_total = np.nansum(scenarios.runtime, axis=1)
+    demand_mean = _nanmean_rows(scenarios.demand)
+
+    outputs = {}
+    for k, name in enumerate(names):
+        calculated = k < scenarios.temp_baselines.shape[0]
+
+        def value(values):
+            return values[k] if calculated else None
+
+        outputs.update({
+            "percent_savings_baseline_" + name: value(scenarios.percent_savings),
+            "avoided_daily_mean_core_day_runtime_baseline_" + name: value(avoided_mean),
+            "avoided_total_core_day_runtime_baseline_" + name: value(avoided_total),
+            "baseline_daily_mean_core_day_runtime_baseline_" + name: value(baseline_mean),
+            "baseline_total_core_day_runtime_baseline_" + name: value(baseline_total),
+            "_daily_mean_core_day_demand_baseline_baseline_" + name: value(demand_mean),
+        })
+    return outputs
+
+
+def _get_threshold_grid(thresholds):
+    # grid points of a threshold sweep as dicts with every threshold set.
+    if isinstance(thresholds, dict):
+        names = sorted(thresholds)
+        thresholds = [dict(zip(names, values))
+                for values in product(*[thresholds[name] for name in names])]
+
+    grid = []
+    for point in thresholds:
+        unknown = set(point) - set(Thermostat.CORE_DAY_THRESHOLDS)
+        if unknown:
+            raise ValueError("Unknown core day thresholds: {}".format(
+                ", ".join(sorted(unknown))))
+        grid_point = dict(Thermostat.CORE_DAY_THRESHOLDS)
+        grid_point.update(point)
+        grid.append(grid_point)
+    return grid
+
+
+def _get_demand_fit(demand, tau, daily_runtime, daily_index):
+    """ Assemble demand fit outputs, in the form returned by
+    :code:`Thermostat.get_cooling_demand` and
+    :code:`Thermostat.get_heating_demand`, given daily demand at the fitted
+    value of tau.
+    """
+    if daily_runtime.shape[0] == 0:
+        return pd.Series([], index=daily_index), np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
 
-                    additional_outputs = {
-                        "total_auxiliary_heating_core_day_runtime":
-                            self.total_auxiliary_heating_runtime(
-                                core_heating_day_set),
-                        "total_emergency_heating_core_day_runtime":
-                            self.total_emergency_heating_runtime(
-                                core_heating_day_set),
-                    }
+    alpha = daily_runtime.sum() / np.sum(demand)
+    errors = daily_runtime.values - demand * alpha
+    mse = np.nanmean((errors)**2)
+    rmse = mse ** 0.5
+    mean_daily_runtime = np.nanmean(daily_runtime)
+    cvrmse = rmse / mean_daily_runtime
+    mape = np.nanmean(np.absolute(errors / mean_daily_runtime))
+    mae = np.nanmean(np.absolute(errors))
 
-                    rhus = self.get_resistance_heat_utilization_bins(core_heating_day_set)
+    return pd.Series(demand, index=daily_index), tau, alpha, mse, rmse, cvrmse, mape, mae
 
-                    start = self.RESISTANCE_HEAT_USE_BINS_MIN_TEMP
-                    stop = self.RESISTANCE_HEAT_USE_BINS_MAX_TEMP
-                    step = self.RESISTANCE_HEAT_USE_BIN_TEMP_WIDTH
-                    temperature_bins = (
-                        (t, t+step) for t in range(start, stop, step))
-                    if rhus is not None:
-                        iter_rhus = rhus
-                    else:
-                        iter_rhus = repeat(None)
 
-                    for rhu, (low, high) in zip(iter_rhus, temperature_bins):
-                        column = 'rhu_{:02d}F_to_{:02d}F'.format(low, high)
-                        additional_outputs[column] = rhu
+def fit_demand_batch(thermostats, season="cooling",
+        core_day_set_method="entire_dataset"):
+    """ Fits cooling or heating demand models for many thermostats at once.
+    Produces the same results as calling :code:`Thermostat.get_cooling_demand`
+    or :code:`Thermostat.get_heating_demand` for each core day set of each
+    thermostat, but estimates tau for all of them together (see
+    :code:`thermostat.solvers.fit_tau_batch`).
 
-                    outputs.update(additional_outputs)
-                metrics.append(outputs)
+    Parameters
+    ----------
+    thermostats : iterable of thermostat.core.Thermostat
+        Thermostats for which to fit demand models.
+    season : {"cooling", "heating"}, default: "cooling"
+        Demand model to fit.
+    core_day_set_method : str, default: "entire_dataset"
+        Method by which to find core day sets; passed to
+        :code:`Thermostat.get_core_cooling_days` or
+        :code:`Thermostat.get_core_heating_days`.
+
+    Returns
+    -------
+    fits : list of lists of tuples
+        One list per thermostat, containing one fit per core day set, in the
+        order the core day sets are returned by
+        :code:`Thermostat.get_core_cooling_days` or
+        :code:`Thermostat.get_core_heating_days`. Each fit is a tuple of
+        (demand, tau, alpha, mse, rmse, cvrmse, mape, mae), as returned by
+        :code:`Thermostat.get_cooling_demand` or
+        :code:`Thermostat.get_heating_demand`. The list is empty for
+        thermostats which do not control equipment for the given season.
+    """
 
-        return metrics
+    if season == "cooling":
+        equipment_types = Thermostat.COOLING_EQUIPMENT_TYPES
+    elif season == "heating":
+        equipment_types = Thermostat.HEATING_EQUIPMENT_TYPES
+    else:
+        raise NotImplementedError
+
+    thermostat_inputs = []
+    for thermostat in thermostats:
+        inputs = []
+        if thermostat.equipment_type in equipment_types:
+            if season == "cooling":
+                core_day_sets = thermostat.get_core_cooling_days(method=core_day_set_method)
+                runtime = thermostat.cool_runtime
+            else:
+                core_day_sets = thermostat.get_core_heating_days(method=core_day_set_method)
+                runtime = thermostat.heat_runtime
+
+            for core_day_set in core_day_sets:
+                inputs.append((
+                    thermostat._get_core_day_set_deltaT(core_day_set),
+                    runtime[core_day_set.daily],
+                    core_day_set.daily[core_day_set.daily].index,
+                ))
+        thermostat_inputs.append(inputs)
+
+    all_inputs = list(chain.from_iterable(thermostat_inputs))
+    taus = iter(fit_tau_batch(
+        [deltaT for deltaT, _, _ in all_inputs],
+        [daily_runtime.values for _, daily_runtime, _ in all_inputs],
+        season))
+
+    return [
+        [
+            _get_demand_fit(daily_demand(deltaT, tau, season), tau, daily_runtime, daily_index)
+            for (deltaT, daily_runtime, daily_index), tau in zip(inputs, taus)
+        ]
+        for inputs in thermostat_inputs
+    ]
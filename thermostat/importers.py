@@ -1,18 +1,26 @@
 from thermostat.core import Thermostat
+from thermostat.weather import (
+    NOAAWeatherSource,
+    HTTPWeatherSource,
+    MemmapWeatherStore,
+)
 
 import pandas as pd
 import numpy as np
 from eemeter.weather.location import zipcode_to_usaf_station
-from eemeter.weather import ISDWeatherSource
 
+import argparse
 import warnings
 from datetime import datetime
 from datetime import timedelta
 import dateutil.parser
 import os
+import sys
+import threading
+import time
 import pytz
 
-def from_csv(metadata_filename, verbose=False):
+def from_csv(metadata_filename, verbose=False, weather_source=None):
     """
     Creates Thermostat objects from data stored in CSV files.
 
@@ -22,23 +30,27 @@ def from_csv(metadata_filename, verbose=False):
         Path to a file containing the thermostat metadata.
     verbose : boolean
         Set to True to output a more detailed log of import activity.
+    weather_source : thermostat.weather.WeatherSource, default: None
+        Source of outdoor temperature data. If None, uses
+        :code:`thermostat.weather.NOAAWeatherSource`.
 
     Returns
     -------
     thermostats : iterator over thermostat.Thermostat objects
         Thermostats imported from the given CSV input files.
     """
-    metadata = pd.read_csv(
-        metadata_filename,
-        dtype={
-            "thermostat_id": str,
-            "zipcode": str,
-            "utc_offset": str,
-            "equipment_type": int,
-            "interval_data_filename": str
-        }
-    )
+    if weather_source is None:
+        weather_source = NOAAWeatherSource()
 
+    metadata = _read_metadata(metadata_filename)
+
+    # Plan the load, so that temperatures for each station are loaded once
+    # and shared by all thermostats which use it.
+    stations, station_hour_ranges, station_n_thermostats, unplanned = \
+        _plan_station_hour_ranges(metadata, metadata_filename)
+
+    station_temperatures = {}
+    unavailable_stations = set()
     for i, row in metadata.iterrows():
         if verbose:
             print("Importing thermostat {}".format(row.thermostat_id))
@@ -51,13 +63,36 @@ def from_csv(metadata_filename, verbose=False):
 
         interval_data_filename = os.path.join(os.path.dirname(metadata_filename), row.interval_data_filename)
 
+        station = stations[row.zipcode]
+        # thermostats left out of the plan are imported without sharing
+        # station temperatures, and report their own errors.
+        planned = i not in unplanned
         try:
+            if station in unavailable_stations:
+                _warn_station_unavailable(row.thermostat_id, station)
+                continue
+
+            if planned and station is not None and station not in station_temperatures:
+                if verbose:
+                    print("Loading outdoor temperatures for station {}".format(station))
+                start, end = station_hour_ranges[station]
+                try:
+                    station_temperatures[station] = _get_station_temperatures(
+                            weather_source, station, start, end)
+                except ValueError as e:
+                    # skip every thermostat using this station.
+                    unavailable_stations.add(station)
+                    _warn_station_unavailable(row.thermostat_id, station, e)
+                    continue
+
             thermostat = get_single_thermostat(
                     row.thermostat_id,
                     row.zipcode,
                     row.equipment_type,
                     row.utc_offset,
-                    interval_data_filename
+                    interval_data_filename,
+                    weather_source=weather_source,
+                    station_temperatures=station_temperatures,
             )
         except ValueError:
             # Could not locate a station for the thermostat. Warn and skip.
@@ -70,11 +105,116 @@ def from_csv(metadata_filename, verbose=False):
                     "a zipcode which corresponds to a US Census Bureau ZCTA." \
                     .format(row.thermostat_id, row.zipcode))
             continue
+        finally:
+            # release temperatures once no remaining thermostats need them.
+            if planned and station is not None:
+                station_n_thermostats[station] -= 1
+                if station_n_thermostats[station] == 0:
+                    station_temperatures.pop(station, None)
 
         yield thermostat
 
+def _warn_station_unavailable(thermostat_id, station, error=None):
+    message = "Skipping import of thermostat (id={}) for which outdoor" \
+        " temperature data for station {} could not be loaded." \
+        .format(thermostat_id, station)
+    if error is not None:
+        message = "{} ({})".format(message, error)
+    warnings.warn(message)
+
+def prefetch_weather(metadata_filename, weather_source=None, max_concurrency=4,
+                     n_tries=3, backoff=1., verbose=False):
+    """ Fetches the outdoor temperature data needed to import the thermostats
+    in a metadata file ahead of time, for all weather stations concurrently.
+
+    Fetching weather data is bound by network latency rather than
+    computation, so fetching for many stations at once, before calling
+    :code:`from_csv`, can greatly reduce the time taken by a large import.
+    The weather source should keep what it fetches (e.g., a
+    :code:`thermostat.weather.MemmapWeatherStore`, or the default
+    :code:`NOAAWeatherSource`, which is backed by the eemeter weather cache),
+    and should then be passed to :code:`from_csv`.
+
+    Parameters
+    ----------
+    metadata_filename : str
+        Path to a file containing the thermostat metadata.
+    weather_source : thermostat.weather.WeatherSource, default: None
+        Source of outdoor temperature data to warm. If None, uses
+        :code:`thermostat.weather.NOAAWeatherSource`.
+    max_concurrency : int, default: 4
+        Maximum number of stations for which to fetch data at once.
+    n_tries : int, default: 3
+        Number of times to try fetching data for each station before giving
+        up. Missing data (a ValueError) is not retried.
+    backoff : float, default: 1.
+        Seconds to wait before the first retry; the wait doubles with each
+        subsequent retry.
+    verbose : boolean
+        Set to True to report progress as each station is fetched.
+
+    Returns
+    -------
+    failures : dict
+        Exceptions raised by the final attempt to fetch data for each station
+        which failed, keyed by station. Empty if all stations succeeded.
+    """
+    if weather_source is None:
+        weather_source = NOAAWeatherSource()
+
+    metadata = _read_metadata(metadata_filename)
+    _, station_hour_ranges, _, _ = _plan_station_hour_ranges(metadata, metadata_filename)
+
+    # Threads rather than processes: the work is waiting on I/O, during which
+    # the GIL is released.
+    pending = sorted(station_hour_ranges.keys())
+    n_stations = len(pending)
+    failures = {}
+    lock = threading.Lock()
+
+    def fetch(station):
+        start, end = station_hour_ranges[station]
+        for i in range(n_tries):
+            try:
+                _get_station_temperatures(weather_source, station, start, end)
+                return None
+            except ValueError as e:
+                return e
+            except Exception as e:
+                if i == n_tries - 1:
+                    return e
+                time.sleep(backoff * 2 ** i)
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                station = pending.pop(0)
+            error = fetch(station)
+            with lock:
+                if error is not None:
+                    failures[station] = error
+                n_done = n_stations - len(pending)
+                if verbose:
+                    print("Prefetched outdoor temperatures for station {}{}"
+                          " ({} of {})".format(
+                              station,
+                              "" if error is None else " (failed: {})".format(error),
+                              n_done, n_stations))
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(max(1, min(max_concurrency, n_stations)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return failures
+
 def get_single_thermostat(thermostat_id, zipcode, equipment_type,
-                          utc_offset, interval_data_filename):
+                          utc_offset, interval_data_filename,
+                          weather_source=None, station_temperatures=None):
     """ Load a single thermostat directly from an interval data file.
 
     Parameters
@@ -92,6 +232,15 @@ def get_single_thermostat(thermostat_id, zipcode, equipment_type,
         method dateutil.parser.parse.
     interval_data_filename : str
         The path to the CSV in which the interval data is stored.
+    weather_source : thermostat.weather.WeatherSource, default: None
+        Source of outdoor temperature data. If None, uses
+        :code:`thermostat.weather.NOAAWeatherSource`.
+    station_temperatures : dict, default: None
+        Hourly outdoor temperatures (degF) already loaded for some stations,
+        as a dict from station to a pandas.Series with an hourly UTC index.
+        If the station of the thermostat is a key, its outdoor temperatures
+        are taken from the given series, which must cover the dates of the
+        interval data, rather than loaded from the weather source.
 
     Returns
     -------
@@ -142,9 +291,13 @@ def get_single_thermostat(thermostat_id, zipcode, equipment_type,
                 "data for ZIP code {}".format(zipcode)
         raise ValueError(message)
 
-    ws_hourly = ISDWeatherSource(station)
-    utc_offset = dateutil.parser.parse("2000-01-01T00:00:00" + utc_offset).tzinfo.utcoffset(None)
-    temp_out = ws_hourly.indexed_temperatures(hourly_index_utc - utc_offset, "degF")
+    utc_offset = _parse_utc_offset(utc_offset)
+    if station_temperatures is not None and station in station_temperatures:
+        temp_out = station_temperatures[station].reindex(hourly_index_utc - utc_offset)
+    else:
+        if weather_source is None:
+            weather_source = NOAAWeatherSource()
+        temp_out = weather_source.indexed_temperatures(station, hourly_index_utc - utc_offset)
     temp_out.index = hourly_index
 
     # load daily time series values
@@ -174,6 +327,82 @@ def get_single_thermostat(thermostat_id, zipcode, equipment_type,
     )
     return thermostat
 
+def _read_metadata(metadata_filename):
+    return pd.read_csv(
+        metadata_filename,
+        dtype={
+            "thermostat_id": str,
+            "zipcode": str,
+            "utc_offset": str,
+            "equipment_type": int,
+            "interval_data_filename": str
+        }
+    )
+
+def _plan_station_hour_ranges(metadata, metadata_filename):
+    """ Resolves the station for each thermostat and the range of hours of
+    outdoor temperature data it needs.
+
+    Returns
+    -------
+    stations : dict
+        Station for each zipcode (None if no station was found).
+    station_hour_ranges : dict
+        First and last UTC hours needed for each station.
+    station_n_thermostats : dict
+        Number of thermostats using each station.
+    unplanned : set
+        Metadata rows whose interval data could not be read, which are left
+        out of the plan.
+    """
+    stations = {}
+    station_hour_ranges = {}
+    station_n_thermostats = {}
+    unplanned = set()
+    for i, row in metadata.iterrows():
+        if row.equipment_type not in [1, 2, 3, 4, 5]:
+            continue
+
+        if row.zipcode not in stations:
+            stations[row.zipcode] = zipcode_to_usaf_station(row.zipcode)
+        station = stations[row.zipcode]
+        if station is None:
+            continue
+
+        interval_data_filename = os.path.join(os.path.dirname(metadata_filename), row.interval_data_filename)
+        try:
+            start, end = _get_utc_hour_range(interval_data_filename, row.utc_offset)
+        except Exception:
+            # an unreadable or malformed file fails only its own thermostat,
+            # when it is imported.
+            unplanned.add(i)
+            continue
+        if station in station_hour_ranges:
+            station_start, station_end = station_hour_ranges[station]
+            start, end = min(start, station_start), max(end, station_end)
+        station_hour_ranges[station] = (start, end)
+        station_n_thermostats[station] = station_n_thermostats.get(station, 0) + 1
+    return stations, station_hour_ranges, station_n_thermostats, unplanned
+
+def _parse_utc_offset(utc_offset):
+    return dateutil.parser.parse("2000-01-01T00:00:00" + utc_offset).tzinfo.utcoffset(None)
+
+def _get_utc_hour_range(interval_data_filename, utc_offset):
+    """ Returns the first and last UTC hours of the interval data in the
+    given file.
+    """
+    dates = pd.to_datetime(pd.read_csv(interval_data_filename, usecols=["date"])["date"])
+    start = pd.Timestamp(dates.iloc[0], tz=pytz.UTC) - _parse_utc_offset(utc_offset)
+    end = start + timedelta(hours=dates.shape[0] * 24 - 1)
+    return start, end
+
+def _get_station_temperatures(weather_source, station, start, end):
+    """ Returns hourly outdoor temperatures (degF) for the given station over
+    the given range of UTC hours (inclusive).
+    """
+    index = pd.DatetimeIndex(start=start, end=end, freq="H", tz=pytz.UTC)
+    return weather_source.indexed_temperatures(station, index)
+
 def _get_hourly_block(df, prefix):
     columns = ["{}_{:02d}".format(prefix, i) for i in range(24)]
     values = df[columns].values
@@ -202,3 +431,40 @@ def _get_equipment_type(equipment_type):
         return False, True, False
     else:
         return None
+
+def prefetch_weather_main(argv=None):
+    """ Command line interface to :code:`prefetch_weather`, e.g.::
+
+        $ python -m thermostat.importers metadata.csv --store /path/to/weather --max-concurrency 8
+
+    Returns 0 if data was fetched for all stations, otherwise 1.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m thermostat.importers",
+        description="Fetch the outdoor temperature data needed to import the"
+                    " thermostats in a metadata file.")
+    parser.add_argument("metadata_filename")
+    parser.add_argument("--store", help="directory of a MemmapWeatherStore"
+                        " in which to keep fetched data")
+    parser.add_argument("--url", help="base URL of staged station-year files"
+                        " to fetch from, instead of NOAA")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--n-tries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.)
+    args = parser.parse_args(argv)
+
+    if args.url is not None:
+        weather_source = HTTPWeatherSource(args.url)
+    else:
+        weather_source = NOAAWeatherSource()
+    if args.store is not None:
+        weather_source = MemmapWeatherStore(args.store, weather_source)
+
+    failures = prefetch_weather(
+        args.metadata_filename, weather_source=weather_source,
+        max_concurrency=args.max_concurrency, n_tries=args.n_tries,
+        backoff=args.backoff, verbose=True)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(prefetch_weather_main())
@@ -0,0 +1,543 @@
+from datetime import datetime
+from itertools import islice, chain
+from warnings import warn
+
+import pandas as pd
+import numpy as np
+
+from thermostat.core import (
+    Thermostat,
+    _load_climate_zone_mapping,
+    _bin_resistance_heat_utilization,
+)
+from thermostat import resources
+from thermostat.solvers import fit_tau_stacked, daily_demand
+from thermostat.quantiles import group_quantiles
+from thermostat import get_version
+
+
+def calculate_epa_field_savings_metrics(thermostats,
+        core_cooling_day_set_method="entire_dataset",
+        core_heating_day_set_method="entire_dataset",
+        climate_zone_mapping=None, chunksize=100):
+    """ Calculates metrics for connected thermostat savings for many
+    thermostats at once. Produces the same metrics as calling
+    :code:`Thermostat.calculate_epa_field_savings_metrics` on each
+    thermostat, but computes them with whole-array operations over a
+    :code:`ThermostatPanel` of up to `chunksize` thermostats at a time.
+
+    Parameters
+    ----------
+    thermostats : iterable of thermostat.core.Thermostat
+        Thermostats for which to calculate metrics.
+    core_cooling_day_set_method : {"entire_dataset", "year_end_to_end"}, default: "entire_dataset"
+        Method by which to find core cooling day sets. See
+        :code:`Thermostat.calculate_epa_field_savings_metrics`.
+    core_heating_day_set_method : {"entire_dataset", "year_mid_to_mid"}, default: "entire_dataset"
+        Method by which to find core heating day sets. See
+        :code:`Thermostat.calculate_epa_field_savings_metrics`.
+    climate_zone_mapping : filename, default: None
+        A mapping from climate zone to zipcode. If None is provided, uses
+        default zipcode to climate zone mapping provided in tutorial.
+    chunksize : int, default: 100
+        Number of thermostats to place in each panel. Memory use is
+        proportional to chunksize times the number of days spanned by the
+        data of the thermostats in a panel.
+
+    Returns
+    -------
+    metrics : list
+        list of dictionaries of output metrics; one per set of core heating
+        or cooling days, in the order produced by calling
+        :code:`Thermostat.calculate_epa_field_savings_metrics` on each
+        thermostat in turn.
+    """
+    mapping = _get_custom_climate_zone_mapping(climate_zone_mapping)
+    regional_baseline_temps = resources.get_regional_baseline_temps()
+
+    thermostats = iter(thermostats)
+    metrics = []
+    while True:
+        chunk = list(islice(thermostats, chunksize))
+        if len(chunk) == 0:
+            break
+        panel = ThermostatPanel(chunk)
+        metrics.extend(panel._calculate_epa_field_savings_metrics(
+            core_cooling_day_set_method, core_heating_day_set_method,
+            mapping, regional_baseline_temps))
+    return metrics
+
+
+def _get_custom_climate_zone_mapping(climate_zone_mapping):
+    # None selects the default mapping, which is looked up by array index.
+    if climate_zone_mapping is None:
+        return None
+    return _load_climate_zone_mapping(climate_zone_mapping)
+
+
+class ThermostatPanel(object):
+    """ Data from many thermostats aligned on a common daily axis.
+
+    Daily data is stored in numpy arrays with shape (n_thermostats, n_days)
+    and hourly data in numpy arrays with shape (n_thermostats, n_days, 24).
+    Days outside of the date range of a thermostat's data are null.
+
+    Parameters
+    ----------
+    thermostats : list of thermostat.core.Thermostat
+        Thermostats to include in the panel. Hourly data is assumed to start
+        at midnight on the first day of data and to span whole days.
+    """
+
+    def __init__(self, thermostats):
+        self.thermostats = list(thermostats)
+        n_thermostats = len(self.thermostats)
+
+        daily_indexes = [t.temperature_in.index[::24] for t in self.thermostats]
+        if n_thermostats > 0:
+            self.days = pd.date_range(
+                min(index[0] for index in daily_indexes),
+                max(index[-1] for index in daily_indexes),
+                freq="D")
+        else:
+            self.days = pd.DatetimeIndex([])
+        n_days = self.days.shape[0]
+
+        self.equipment_type = np.array(
+            [t.equipment_type for t in self.thermostats], dtype=int)
+
+        # first and last day of data for each thermostat, as positions on
+        # the common daily axis.
+        self.first_day = np.array([
+            self.days.get_loc(index[0]) for index in daily_indexes], dtype=int)
+        self.last_day = self.first_day + np.array(
+            [index.shape[0] - 1 for index in daily_indexes], dtype=int)
+
+        def hourly():
+            return np.tile(np.nan, (n_thermostats, n_days, 24))
+
+        def daily():
+            return np.tile(np.nan, (n_thermostats, n_days))
+
+        self.temperature_in = hourly()
+        self.temperature_out = hourly()
+        self.cool_runtime = daily()
+        self.heat_runtime = daily()
+        # stored as daily totals
+        self.auxiliary_heat_runtime = daily()
+        self.emergency_heat_runtime = daily()
+
+        for i, thermostat in enumerate(self.thermostats):
+            days = slice(self.first_day[i], self.last_day[i] + 1)
+            self.temperature_in[i, days] = \
+                thermostat.temperature_in.values.reshape((-1, 24))
+            self.temperature_out[i, days] = \
+                thermostat.temperature_out.values.reshape((-1, 24))
+            if thermostat.cool_runtime is not None:
+                self.cool_runtime[i, days] = thermostat.cool_runtime.values
+            if thermostat.heat_runtime is not None:
+                self.heat_runtime[i, days] = thermostat.heat_runtime.values
+            if thermostat.auxiliary_heat_runtime is not None:
+                self.auxiliary_heat_runtime[i, days] = np.nansum(
+                    thermostat.auxiliary_heat_runtime.values.reshape((-1, 24)), axis=1)
+            if thermostat.emergency_heat_runtime is not None:
+                self.emergency_heat_runtime[i, days] = np.nansum(
+                    thermostat.emergency_heat_runtime.values.reshape((-1, 24)), axis=1)
+
+    def _has_equipment(self, equipment_types):
+        return np.in1d(self.equipment_type, list(equipment_types))
+
+    def _day_position(self, date):
+        return int((np.datetime64(date) - self.days.values[0]) / np.timedelta64(1, 'D'))
+
+    def _get_isoformat(self, day_position):
+        date = self.days[0] + pd.Timedelta(days=int(day_position))
+        return date.to_pydatetime().isoformat()
+
+    def get_core_day_sets(self, heating_or_cooling, method="entire_dataset",
+            min_minutes=30, max_minutes_other=0):
+        """ Determine core heating or cooling day sets for all thermostats in
+        the panel, as :code:`Thermostat.get_core_heating_days` and
+        :code:`Thermostat.get_core_cooling_days` do for a single thermostat.
+
+        Parameters
+        ----------
+        heating_or_cooling : {"heating", "cooling"}
+            Type of core day sets to determine.
+        method : str, default: "entire_dataset"
+            "entire_dataset" or "year_end_to_end" for cooling;
+            "entire_dataset" or "year_mid_to_mid" for heating.
+        min_minutes : int, default 30
+            Number of minutes of heating (cooling) runtime per day required
+            for inclusion in a core heating (cooling) day set.
+        max_minutes_other : int, default 0
+            Number of minutes of cooling (heating) runtime per day beyond
+            which a day is not part of a core heating (cooling) day set.
+
+        Returns
+        -------
+        thermostat_index : numpy.array
+            Index of the thermostat to which each core day set belongs,
+            ascending, with shape (n_sets,).
+        names : list of str
+            Name of each core day set.
+        start : numpy.array
+            First day of each core day set, as positions on the daily axis.
+        end : numpy.array
+            Day after the last day of each core day set, as positions on the
+            daily axis. (As with :code:`CoreDaySet.end_date`, this may be the
+            last day of data, which can still be a core day.)
+        in_range : numpy.array
+            Boolean array with shape (n_sets, n_days) which is True on days
+            from start (inclusive) to end (exclusive).
+        core_days : numpy.array
+            Boolean array with shape (n_sets, n_days) which is True on core
+            days.
+        """
+        if heating_or_cooling == "cooling":
+            if method not in ["year_end_to_end", "entire_dataset"]:
+                raise NotImplementedError
+            runtime, other_runtime = self.cool_runtime, self.heat_runtime
+            has_equipment = self._has_equipment(Thermostat.COOLING_EQUIPMENT_TYPES)
+            has_other_equipment = self._has_equipment(Thermostat.HEATING_EQUIPMENT_TYPES)
+        elif heating_or_cooling == "heating":
+            if method not in ["year_mid_to_mid", "entire_dataset"]:
+                raise NotImplementedError
+            runtime, other_runtime = self.heat_runtime, self.cool_runtime
+            has_equipment = self._has_equipment(Thermostat.HEATING_EQUIPMENT_TYPES)
+            has_other_equipment = self._has_equipment(Thermostat.COOLING_EQUIPMENT_TYPES)
+        else:
+            raise NotImplementedError
+
+        # compute inclusion thresholds
+        with np.errstate(invalid="ignore"):
+            meets_thresholds = runtime >= min_minutes
+            meets_thresholds &= (other_runtime <= max_minutes_other) | \
+                ~has_other_equipment[:, np.newaxis]
+
+        # enough temperature_in and temperature_out
+        meets_thresholds &= np.isnan(self.temperature_in).sum(axis=2) <= 2
+        meets_thresholds &= np.isnan(self.temperature_out).sum(axis=2) <= 2
+
+        n_thermostats, n_days = meets_thresholds.shape
+        days = np.arange(n_days)
+
+        if method == "entire_dataset":
+            periods = [("{}_ALL".format(heating_or_cooling), None, None)]
+        elif n_days == 0:
+            periods = []
+        elif method == "year_end_to_end":
+            periods = [
+                ("cooling_{}".format(year),
+                    self._day_position(datetime(year, 1, 1)),
+                    self._day_position(datetime(year + 1, 1, 1)))
+                for year in range(self.days[0].year, self.days[-1].year + 1)
+            ]
+        else:
+            periods = [
+                ("heating_{}-{}".format(year, year + 1),
+                    self._day_position(datetime(year, 7, 1)),
+                    self._day_position(datetime(year + 1, 7, 1)))
+                for year in range(self.days[0].year - 1, self.days[-1].year + 1)
+            ]
+
+        # candidate core day sets for each (thermostat, period) pair.
+        start = np.empty((n_thermostats, len(periods)), dtype=int)
+        end = np.empty((n_thermostats, len(periods)), dtype=int)
+        for j, (_, period_start, period_end) in enumerate(periods):
+            if period_start is None:
+                start[:, j] = self.first_day
+                end[:, j] = self.last_day
+            else:
+                start[:, j] = np.maximum(period_start, self.first_day)
+                end[:, j] = np.minimum(period_end, self.last_day)
+
+        in_range = (days >= start[:, :, np.newaxis]) & (days < end[:, :, np.newaxis])
+        if method == "entire_dataset":
+            core_days = np.repeat(meets_thresholds[:, np.newaxis, :], len(periods), axis=1)
+            include = np.ones(start.shape, dtype=bool)
+        else:
+            core_days = in_range & meets_thresholds[:, np.newaxis, :]
+            include = core_days.any(axis=2)
+        include &= has_equipment[:, np.newaxis]
+
+        thermostat_index, period_index = np.nonzero(include)
+        names = [periods[j][0] for j in period_index]
+        return (
+            thermostat_index,
+            names,
+            start[include],
+            end[include],
+            in_range[include],
+            core_days[include],
+        )
+
+    def calculate_epa_field_savings_metrics(self,
+            core_cooling_day_set_method="entire_dataset",
+            core_heating_day_set_method="entire_dataset",
+            climate_zone_mapping=None):
+        """ Calculates metrics for connected thermostat savings for all
+        thermostats in the panel. See
+        :code:`thermostat.panel.calculate_epa_field_savings_metrics`.
+
+        Returns
+        -------
+        metrics : list
+            list of dictionaries of output metrics; one per set of core
+            heating or cooling days.
+        """
+        mapping = _get_custom_climate_zone_mapping(climate_zone_mapping)
+        regional_baseline_temps = resources.get_regional_baseline_temps()
+        return self._calculate_epa_field_savings_metrics(
+            core_cooling_day_set_method, core_heating_day_set_method,
+            mapping, regional_baseline_temps)
+
+    def _calculate_epa_field_savings_metrics(self, core_cooling_day_set_method,
+            core_heating_day_set_method, mapping, regional_baseline_temps):
+
+        cooling_regional_baseline_temps, heating_regional_baseline_temps = \
+            regional_baseline_temps
+
+        zipcodes = [t.zipcode for t in self.thermostats]
+        if mapping is None:
+            climate_zones = resources.get_climate_zones(zipcodes)
+        else:
+            climate_zones = [mapping.get(zipcode) for zipcode in zipcodes]
+
+        cooling_metrics = self._get_season_metrics(
+            "cooling", core_cooling_day_set_method, climate_zones,
+            cooling_regional_baseline_temps)
+        heating_metrics = self._get_season_metrics(
+            "heating", core_heating_day_set_method, climate_zones,
+            heating_regional_baseline_temps)
+
+        metrics_by_thermostat = [[] for _ in self.thermostats]
+        for i, outputs in chain(cooling_metrics, heating_metrics):
+            metrics_by_thermostat[i].append(outputs)
+        return [outputs for metrics in metrics_by_thermostat for outputs in metrics]
+
+    def _get_season_metrics(self, heating_or_cooling, method, climate_zones,
+            regional_baseline_temps):
+
+        (
+            thermostat_index,
+            names,
+            start,
+            end,
+            in_range,
+            core_days,
+        ) = self.get_core_day_sets(heating_or_cooling, method=method)
+
+        n_sets = thermostat_index.shape[0]
+
+        if heating_or_cooling == "cooling":
+            runtime = self.cool_runtime
+            quantile = .1
+        else:
+            runtime = self.heat_runtime
+            quantile = .9
+
+        # Core days of all sets, stacked: one row per (core day set, core day).
+        set_index, day_index = np.nonzero(core_days)
+        row_thermostat = thermostat_index[set_index]
+        temp_in = self.temperature_in[row_thermostat, day_index]
+        temp_out = self.temperature_out[row_thermostat, day_index]
+        daily_runtime = runtime[row_thermostat, day_index]
+
+        def group_sum(values):
+            return np.bincount(set_index, weights=values, minlength=n_sets)
+
+        def group_nanmean(values):
+            valid = ~np.isnan(values)
+            return np.bincount(set_index[valid], weights=values[valid], minlength=n_sets) / \
+                np.bincount(set_index[valid], minlength=n_sets)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+
+            baseline_percentile_temps = group_quantiles(
+                temp_in, quantile, np.repeat(set_index, 24), n_sets,
+                resolution=Thermostat.TEMPERATURE_RESOLUTION)[:, 0]
+
+            # demand fits
+            tau = fit_tau_stacked(temp_in - temp_out, daily_runtime, set_index,
+                    n_sets, heating_or_cooling)
+            demand = daily_demand(temp_in - temp_out,
+                    tau[set_index, np.newaxis], heating_or_cooling)
+            total_runtime = group_sum(daily_runtime)
+            alpha = total_runtime / group_sum(demand)
+            errors = daily_runtime - demand * alpha[set_index]
+            mse = group_nanmean(errors ** 2)
+            rmse = mse ** 0.5
+            mean_daily_runtime = group_nanmean(daily_runtime)
+            cvrmse = rmse / mean_daily_runtime
+            mape = group_nanmean(np.absolute(errors / mean_daily_runtime[set_index]))
+            mae = group_nanmean(np.absolute(errors))
+            mean_demand = group_nanmean(demand)
+
+            n_core_days = np.bincount(set_index, minlength=n_sets)
+            average_daily_runtime = total_runtime / n_core_days
+
+            def baseline_metrics(baseline_temps):
+                baseline_demand = daily_demand(
+                    baseline_temps[set_index, np.newaxis] - temp_out,
+                    tau[set_index, np.newaxis], heating_or_cooling)
+                baseline_runtime = np.maximum(alpha[set_index] * baseline_demand, 0)
+                avoided_runtime = baseline_runtime - daily_runtime
+                return {
+                    "percent_savings":
+                        group_nanmean(avoided_runtime) / group_nanmean(baseline_runtime) * 100.0,
+                    "avoided_daily_mean_core_day_runtime": group_nanmean(avoided_runtime),
+                    "avoided_total_core_day_runtime": group_sum(np.nan_to_num(avoided_runtime)),
+                    "baseline_daily_mean_core_day_runtime": group_nanmean(baseline_runtime),
+                    "baseline_total_core_day_runtime": group_sum(np.nan_to_num(baseline_runtime)),
+                    "_daily_mean_core_day_demand_baseline": group_nanmean(baseline_demand),
+                }
+
+            regional_temps = [
+                regional_baseline_temps.get(climate_zones[i], None)
+                for i in thermostat_index
+            ]
+            baseline_regional_temps = np.array(
+                [np.nan if t is None else t for t in regional_temps], dtype=float)
+
+            percentile = baseline_metrics(baseline_percentile_temps)
+            regional = baseline_metrics(baseline_regional_temps)
+
+        # ignored days
+        heating_equipment = self._has_equipment(Thermostat.HEATING_EQUIPMENT_TYPES)
+        cooling_equipment = self._has_equipment(Thermostat.COOLING_EQUIPMENT_TYPES)
+        with np.errstate(invalid="ignore"):
+            has_heating = (self.heat_runtime > 0) & heating_equipment[:, np.newaxis]
+            has_cooling = (self.cool_runtime > 0) & cooling_equipment[:, np.newaxis]
+        null_runtime = \
+            (np.isnan(self.heat_runtime) & heating_equipment[:, np.newaxis]) | \
+            (np.isnan(self.cool_runtime) & cooling_equipment[:, np.newaxis])
+        n_days_both = (in_range & (has_heating & has_cooling)[thermostat_index]).sum(axis=1)
+        n_days_insufficient_data = (in_range & null_runtime[thermostat_index]).sum(axis=1)
+
+        if heating_or_cooling == "heating":
+            has_aux_emerg = self._has_equipment(Thermostat.AUX_EMERG_EQUIPMENT_TYPES)
+            total_auxiliary_runtime = group_sum(np.nan_to_num(
+                self.auxiliary_heat_runtime[row_thermostat, day_index]))
+            total_emergency_runtime = group_sum(np.nan_to_num(
+                self.emergency_heat_runtime[row_thermostat, day_index]))
+            rhus, temperature_bins = self._get_resistance_heat_utilization_bins(
+                thermostat_index, in_range, names, start, end)
+
+        metrics = []
+        for k, i in enumerate(thermostat_index):
+            thermostat = self.thermostats[i]
+            has_regional = regional_temps[k] is not None
+
+            def regional_value(values):
+                return values[k] if has_regional else None
+
+            outputs = {
+                "sw_version": get_version(),
+
+                "ct_identifier": thermostat.thermostat_id,
+                "equipment_type": thermostat.equipment_type,
+                "heating_or_cooling": names[k],
+                "zipcode": thermostat.zipcode,
+                "station": thermostat.station,
+                "climate_zone": climate_zones[i],
+
+                "start_date": self._get_isoformat(start[k]),
+                "end_date": self._get_isoformat(end[k]),
+                "n_days_in_inputfile_date_range": int(end[k] - start[k]),
+                "n_days_both_heating_and_cooling": n_days_both[k],
+                "n_days_insufficient_data": n_days_insufficient_data[k],
+                "n_core_{}_days".format(heating_or_cooling): int(n_core_days[k]),
+
+                "baseline_percentile_core_{}_comfort_temperature".format(heating_or_cooling):
+                    baseline_percentile_temps[k],
+                "regional_average_baseline_{}_comfort_temperature".format(heating_or_cooling):
+                    regional_temps[k],
+
+                "percent_savings_baseline_percentile": percentile["percent_savings"][k],
+                "avoided_daily_mean_core_day_runtime_baseline_percentile":
+                    percentile["avoided_daily_mean_core_day_runtime"][k],
+                "avoided_total_core_day_runtime_baseline_percentile":
+                    percentile["avoided_total_core_day_runtime"][k],
+                "baseline_daily_mean_core_day_runtime_baseline_percentile":
+                    percentile["baseline_daily_mean_core_day_runtime"][k],
+                "baseline_total_core_day_runtime_baseline_percentile":
+                    percentile["baseline_total_core_day_runtime"][k],
+                "_daily_mean_core_day_demand_baseline_baseline_percentile":
+                    percentile["_daily_mean_core_day_demand_baseline"][k],
+                "percent_savings_baseline_regional":
+                    regional_value(regional["percent_savings"]),
+                "avoided_daily_mean_core_day_runtime_baseline_regional":
+                    regional_value(regional["avoided_daily_mean_core_day_runtime"]),
+                "avoided_total_core_day_runtime_baseline_regional":
+                    regional_value(regional["avoided_total_core_day_runtime"]),
+                "baseline_daily_mean_core_day_runtime_baseline_regional":
+                    regional_value(regional["baseline_daily_mean_core_day_runtime"]),
+                "baseline_total_core_day_runtime_baseline_regional":
+                    regional_value(regional["baseline_total_core_day_runtime"]),
+                "_daily_mean_core_day_demand_baseline_baseline_regional":
+                    regional_value(regional["_daily_mean_core_day_demand_baseline"]),
+                "mean_demand": mean_demand[k],
+                "tau": tau[k],
+                "alpha": alpha[k],
+                "mean_sq_err": mse[k],
+                "root_mean_sq_err": rmse[k],
+                "cv_root_mean_sq_err": cvrmse[k],
+                "mean_abs_pct_err": mape[k],
+                "mean_abs_err": mae[k],
+
+                "total_core_{}_runtime".format(heating_or_cooling): total_runtime[k],
+
+                "daily_mean_core_{}_runtime".format(heating_or_cooling): average_daily_runtime[k],
+            }
+
+            if heating_or_cooling == "heating" and has_aux_emerg[i]:
+                outputs["total_auxiliary_heating_core_day_runtime"] = total_auxiliary_runtime[k]
+                outputs["total_emergency_heating_core_day_runtime"] = total_emergency_runtime[k]
+                for rhu, (low, high) in zip(rhus[k], temperature_bins):
+                    column = 'rhu_{:02d}F_to_{:02d}F'.format(low, high)
+                    outputs[column] = rhu
+
+            metrics.append((i, outputs))
+
+        return metrics
+
+    def _get_resistance_heat_utilization_bins(self, thermostat_index, in_range,
+            names, start, end):
+        # Resistance heat utilization in each temperature bin for each core
+        # heating day set; see Thermostat.get_resistance_heat_utilization_bins.
+        bin_edges = Thermostat.get_resistance_heat_utilization_bin_edges()
+        temperature_bins = list(zip(bin_edges[:-1], bin_edges[1:]))
+        n_sets = thermostat_index.shape[0]
+
+        if len(temperature_bins) == 0:
+            return np.empty((n_sets, 0)), temperature_bins
+
+        with np.errstate(invalid="ignore"):
+            temp_out_daily = np.nanmean(self.temperature_out, axis=2)
+
+        set_index, day_index = np.nonzero(in_range)
+        row_thermostat = thermostat_index[set_index]
+        rhus, R_heat, R_aux = _bin_resistance_heat_utilization(
+            temp_out_daily[row_thermostat, day_index],
+            self.heat_runtime[row_thermostat, day_index],
+            self.auxiliary_heat_runtime[row_thermostat, day_index],
+            self.emergency_heat_runtime[row_thermostat, day_index],
+            np.asarray(bin_edges, dtype=float), set_index, n_sets)
+
+        for k, b in zip(*np.nonzero(R_aux > R_heat)):
+            low_temp, high_temp = temperature_bins[b]
+            warn(
+                'WARNING: '
+                'aux heat runtime %s > compressor runtime %s '
+                'for %sF <= temperature < %sF '
+                'for thermostat_id %s '
+                'from %s to %s inclusive' % (
+                    R_aux[k, b], R_heat[k, b],
+                    low_temp, high_temp,
+                    self.thermostats[thermostat_index[k]].thermostat_id,
+                    self._get_isoformat(start[k]),
+                    self._get_isoformat(end[k]))
+            )
+
+        return rhus, temperature_bins
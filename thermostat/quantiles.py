@@ -0,0 +1,144 @@
+import numpy as np
+
+MAX_BINS_PER_VALUE = 4
+
+
+def group_quantiles(values, q, groups=None, n_groups=1, resolution=None,
+                    order=None):
+    """ Quantiles of the non-null values in each group, interpolated linearly
+    between order statistics as in :code:`pandas.Series.quantile` (see
+    :code:`lerp`).
+
+    If the values are quantized (e.g., thermostat setpoints and indoor
+    temperatures reported in steps of 0.5F), order statistics are found by
+    counting values in a histogram with one bin per step, in time linear in
+    the number of values, rather than by sorting. Since the values are exact
+    multiples of `resolution`, the results are identical to sorting.
+
+    Parameters
+    ----------
+    values : numpy.array
+        Values of which to find quantiles.
+    q : float or list of float
+        Quantiles to find, each between 0 and 1, e.g. `[.1, .5, .9]`.
+    groups : numpy.array, default: None
+        Group (from 0 to `n_groups` - 1) of each value. If None, all values
+        are in a single group.
+    n_groups : int, default: 1
+        Number of groups.
+    resolution : float, default: None
+        Step between possible values, e.g. `0.5`. If None, or if any value
+        is not a multiple of `resolution`, or if the values span too many
+        steps for a histogram to be efficient, values are sorted instead.
+    order : numpy.array, default: None
+        Positions of the non-null values in ascending order, e.g., from an
+        argsort kept for finding quantiles of the same values over many
+        groupings. If given, values are ordered within groups by a stable
+        sort of their groups in this order, rather than by sorting values.
+
+    Returns
+    -------
+    quantiles : numpy.array
+        Quantiles with shape (n_groups, n_quantiles). Groups without any
+        non-null values are np.nan.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    q = np.atleast_1d(np.asarray(q, dtype=float))
+    if groups is None:
+        groups = np.zeros(values.shape, dtype=int)
+    else:
+        groups = np.asarray(groups, dtype=int).ravel()
+
+    if order is None:
+        valid = ~np.isnan(values)
+    else:
+        valid = np.asarray(order, dtype=int)
+    values = values[valid]
+    groups = groups[valid]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    quantiles = np.tile(np.nan, (n_groups, q.shape[0]))
+
+    has_values = counts > 0
+    if not np.any(has_values):
+        return quantiles
+
+    # positions of the order statistics to interpolate between, within the
+    # values of all groups taken in order of group, then value.
+    index = (counts[has_values, np.newaxis] - 1) * q
+    below = np.floor(index).astype(int)
+    above = np.minimum(below + 1, counts[has_values, np.newaxis] - 1)
+    weight_above = index - below
+    group_starts = starts[has_values, np.newaxis]
+
+    order_statistics = None
+    if resolution is not None:
+        order_statistics = _histogram_order_statistics(
+            values, groups, n_groups, resolution)
+    if order_statistics is None:
+        if order is None:
+            group_order = np.lexsort((values, groups))
+        else:
+            # values are already in ascending order
+            group_order = np.argsort(groups, kind="mergesort")
+        order_statistics = _sorted_order_statistics(values, group_order)
+
+    x_below = order_statistics(group_starts + below)
+    x_above = order_statistics(group_starts + above)
+    quantiles[has_values] = lerp(x_below, x_above, weight_above)
+    return quantiles
+
+
+def lerp(x_below, x_above, weight_above):
+    """ Linear interpolation between order statistics, from the nearer of the
+    two, as in numpy's linear quantile method (used by
+    :code:`pandas.Series.quantile`), so that results are identical to numpy's
+    rather than equal up to rounding.
+
+    Parameters
+    ----------
+    x_below : numpy.array
+        Order statistics below each quantile.
+    x_above : numpy.array
+        Order statistics above each quantile.
+    weight_above : numpy.array
+        Weight (from 0 to 1) of the order statistic above each quantile.
+
+    Returns
+    -------
+    quantiles : numpy.array
+    """
+    difference = x_above - x_below
+    return np.where(weight_above >= 0.5,
+                    x_above - difference * (1 - weight_above),
+                    x_below + difference * weight_above)
+
+
+def _sorted_order_statistics(values, group_order):
+    values = values[group_order]
+
+    def order_statistics(positions):
+        return values[positions]
+    return order_statistics
+
+
+def _histogram_order_statistics(values, groups, n_groups, resolution):
+    steps = np.round(values / resolution)
+    if not np.all(steps * resolution == values):
+        return None
+
+    min_step = steps.min()
+    n_bins = int(steps.max() - min_step) + 1
+    if n_groups * n_bins > MAX_BINS_PER_VALUE * values.shape[0] + 1024:
+        return None
+
+    bins = groups * n_bins + (steps - min_step).astype(int)
+    cumulative_counts = np.cumsum(np.bincount(bins, minlength=n_groups * n_bins))
+
+    def order_statistics(positions):
+        # the order statistic at each position falls in the first bin whose
+        # cumulative count exceeds the position.
+        bin_index = np.searchsorted(cumulative_counts, positions, side="right")
+        return (bin_index % n_bins + min_step) * resolution
+    return order_statistics
@@ -0,0 +1,177 @@
+""" Reference tables used in calculating savings metrics and summary
+statistics.
+
+Each table is parsed from the packaged resource files on first use and then
+kept for the life of the process, so that per-thermostat calculations don't
+re-read them. Call :code:`load_all` before forking worker processes to parse
+every table once in the parent and share it with the workers.
+"""
+from pkg_resources import resource_stream
+
+import pandas as pd
+import numpy as np
+from eemeter.location import _load_zipcode_to_station_index
+
+CLIMATE_ZONE_MAPPING_FILENAME = \
+    'Building America Climate Zone to Zipcode Database_Rev2_2016.09.08.csv'
+REGIONAL_BASELINES_FILENAME = 'regional_baselines.csv'
+CLIMATE_ZONE_WEIGHTS_FILENAME = 'NationalAverageClimateZoneWeightings.csv'
+
+N_ZIPCODES = 100000
+
+climate_zone_mapping = None
+climate_zone_codes = None
+regional_baseline_temps = None
+climate_zone_weights = None
+
+
+def read_climate_zone_mapping(filename_or_buffer):
+    """ Parse a mapping from zipcode to climate zone from a CSV file with the
+    columns `zipcode` and `group`.
+
+    Returns
+    -------
+    mapping : dict
+        Climate zone (None if missing) for each zipcode.
+    """
+    df = pd.read_csv(
+        filename_or_buffer,
+        usecols=["zipcode", "group"],
+        dtype={"zipcode": str, "group": str},
+    ).set_index('zipcode').drop('zipcode', errors='ignore')
+
+    return {zipcode: _none_if_null(zone) for zipcode, zone in df["group"].items()}
+
+
+def get_climate_zone_mapping():
+    """ The default mapping from zipcode to climate zone, as a dict. See
+    :code:`read_climate_zone_mapping`.
+    """
+    global climate_zone_mapping
+    if climate_zone_mapping is None:
+        with resource_stream(__name__, CLIMATE_ZONE_MAPPING_FILENAME) as f:
+            climate_zone_mapping = read_climate_zone_mapping(f)
+    return climate_zone_mapping
+
+
+def get_climate_zone_codes():
+    """ The default mapping from zipcode to climate zone, as an array indexed
+    by the integer value of a five digit zipcode.
+
+    Returns
+    -------
+    climate_zones : list of str
+        Climate zone names. Code `i` refers to `climate_zones[i - 1]`.
+    codes : numpy.array
+        uint8 array of length 100000 giving the climate zone code of each
+        zipcode, or 0 if the zipcode has no climate zone.
+    """
+    global climate_zone_codes
+    if climate_zone_codes is None:
+        mapping = get_climate_zone_mapping()
+        climate_zones = sorted(set(z for z in mapping.values() if z is not None))
+        zone_codes = {zone: i + 1 for i, zone in enumerate(climate_zones)}
+        codes = np.zeros((N_ZIPCODES,), dtype=np.uint8)
+        for zipcode, zone in mapping.items():
+            if zone is not None and len(zipcode) == 5 and zipcode.isdigit():
+                codes[int(zipcode)] = zone_codes[zone]
+        climate_zone_codes = (climate_zones, codes)
+    return climate_zone_codes
+
+
+def get_climate_zones(zipcodes):
+    """ Look up the climate zones of many zipcodes at once in the default
+    mapping.
+
+    Parameters
+    ----------
+    zipcodes : list of str
+        Five digit zipcodes, e.g. `"01234"`.
+
+    Returns
+    -------
+    climate_zones : list
+        Climate zone of each zipcode, or None if it has none.
+    """
+    climate_zones, codes = get_climate_zone_codes()
+    names = [None] + climate_zones
+    zipcode_ints = np.array([
+        int(z) if len(z) == 5 and z.isdigit() else -1 for z in zipcodes],
+        dtype=int)
+    found = zipcode_ints >= 0
+    zipcode_codes = np.zeros(zipcode_ints.shape, dtype=np.uint8)
+    zipcode_codes[found] = codes[zipcode_ints[found]]
+    return [names[code] for code in zipcode_codes]
+
+
+def get_regional_baseline_temps():
+    """ Regional baseline cooling and heating comfort temperatures.
+
+    Returns
+    -------
+    cooling_regional_baseline_temps : dict
+        Baseline cooling comfort temperature (None if missing) for each
+        climate zone.
+    heating_regional_baseline_temps : dict
+        Baseline heating comfort temperature (None if missing) for each
+        climate zone.
+    """
+    global regional_baseline_temps
+    if regional_baseline_temps is None:
+        with resource_stream(__name__, REGIONAL_BASELINES_FILENAME) as f:
+            df = pd.read_csv(
+                f, usecols=[
+                    'EIA Climate Zone',
+                    'Baseline heating temp (F)',
+                    'Baseline cooling temp (F)'
+                ])
+        df = df.set_index('EIA Climate Zone')
+        regional_baseline_temps = (
+            {k: _none_if_null(v) for k, v in df['Baseline cooling temp (F)'].items()},
+            {k: _none_if_null(v) for k, v in df['Baseline heating temp (F)'].items()},
+        )
+    return regional_baseline_temps
+
+
+def get_climate_zone_weights():
+    """ National average weights of each climate zone.
+
+    Returns
+    -------
+    heating_weights : dict
+        Heating weight for each climate zone.
+    cooling_weights : dict
+        Cooling weight for each climate zone.
+    """
+    global climate_zone_weights
+    if climate_zone_weights is None:
+        with resource_stream(__name__, CLIMATE_ZONE_WEIGHTS_FILENAME) as f:
+            df = pd.read_csv(
+                f, usecols=["climate_zone", "heating_weight", "cooling_weight"],
+            ).set_index("climate_zone")
+        climate_zone_weights = (
+            {cz: weight for cz, weight in df["heating_weight"].items()},
+            {cz: weight for cz, weight in df["cooling_weight"].items()},
+        )
+    return climate_zone_weights
+
+
+def _none_if_null(value):
+    return None if pd.isnull(value) else value
+
+
+def get_zipcode_to_station_index():
+    """ Mapping from zipcode to USAF weather station, as a dict (loaded and
+    kept by eemeter).
+    """
+    return _load_zipcode_to_station_index()
+
+
+def load_all():
+    """ Load all reference tables now rather than on first use, e.g., before
+    forking worker processes, which then share them.
+    """
+    get_climate_zone_codes()
+    get_regional_baseline_temps()
+    get_climate_zone_weights()
+    get_zipcode_to_station_index()
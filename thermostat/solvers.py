@@ -0,0 +1,287 @@
+import numpy as np
+
+
+def fit_tau(deltaT, daily_runtime, heating_or_cooling):
+    """ Exact least squares estimate of tau for the hourlyavgCTD/HTD demand
+    models used by :code:`Thermostat.get_cooling_demand` and
+    :code:`Thermostat.get_heating_demand`.
+
+    Daily demand is piecewise linear in tau, with breakpoints at the hourly
+    deltaT values, and alpha is given in closed form by ratio estimation. On
+    each interval between consecutive breakpoints, the sum of squared runtime
+    errors is therefore a rational function of tau with a single stationary
+    point, which can be found directly. The global minimum is the best of
+    these stationary points and the breakpoints themselves.
+
+    Parameters
+    ----------
+    deltaT : numpy.array
+        Hourly deltaT (indoor temperature - outdoor temperature) with shape
+        (n_days, 24). Null values are ignored, as they are in the demand
+        calculation.
+    daily_runtime : numpy.array
+        Daily runtimes with shape (n_days,).
+    heating_or_cooling : {"heating", "cooling"}
+        Demand model for which to fit tau.
+
+    Returns
+    -------
+    tau : float
+        Estimate of tau minimizing the sum of squared errors between daily
+        runtimes and runtimes estimated from demand. If the sum of squared
+        errors keeps decreasing beyond the outermost breakpoint, there is no
+        finite minimum, and the outermost breakpoint is returned. If the
+        minimum is reached over a range of tau (e.g., for a single day, whose
+        runtime any tau fits exactly), 0 (where least squares fits used to
+        start) is returned if it is in the range, and otherwise the
+        minimizing tau closest to 0. Returns np.nan if tau cannot be
+        estimated (e.g., if there is no data).
+    """
+    return float(fit_tau_batch([deltaT], [daily_runtime], heating_or_cooling)[0])
+
+
+def fit_tau_batch(deltaTs, daily_runtimes, heating_or_cooling):
+    """ Exact least squares estimates of tau for many independent demand
+    fits at once, as described in :code:`thermostat.solvers.fit_tau`.
+
+    Breakpoints from all fits are stacked into a single ragged array, so the
+    work for the whole batch is done in a handful of large array operations
+    rather than one set of small operations per fit.
+
+    Parameters
+    ----------
+    deltaTs : list of numpy.array
+        Hourly deltaT for each fit, each with shape (n_days, 24).
+    daily_runtimes : list of numpy.array
+        Daily runtimes for each fit, each with shape (n_days,).
+    heating_or_cooling : {"heating", "cooling"}
+        Demand model for which to fit tau.
+
+    Returns
+    -------
+    taus : numpy.array
+        Estimate of tau for each fit, in the order given.
+    """
+    if heating_or_cooling not in ["heating", "cooling"]:
+        raise NotImplementedError
+
+    n_fits = len(deltaTs)
+    if n_fits == 0:
+        return np.empty((0,))
+
+    deltaT = np.concatenate([
+        np.asarray(d, dtype=float).reshape((-1, 24)) for d in deltaTs])
+    daily_runtime = np.concatenate([
+        np.asarray(r, dtype=float) for r in daily_runtimes])
+    day_fit = np.repeat(np.arange(n_fits), [len(r) for r in daily_runtimes])
+
+    return fit_tau_stacked(deltaT, daily_runtime, day_fit, n_fits, heating_or_cooling)
+
+
+def fit_tau_stacked(deltaT, daily_runtime, day_fit, n_fits, heating_or_cooling):
+    """ Exact least squares estimates of tau for many independent demand
+    fits, given days from all fits stacked into single arrays.
+
+    Parameters
+    ----------
+    deltaT : numpy.array
+        Hourly deltaT for the days of all fits, with shape (n_days, 24).
+    daily_runtime : numpy.array
+        Daily runtimes with shape (n_days,).
+    day_fit : numpy.array
+        Index of the fit to which each day belongs, with shape (n_days,).
+        Days of a fit need not be contiguous.
+    n_fits : int
+        Number of fits.
+    heating_or_cooling : {"heating", "cooling"}
+        Demand model for which to fit tau.
+
+    Returns
+    -------
+    taus : numpy.array
+        Estimate of tau for each fit, with shape (n_fits,). Fits without any
+        days are np.nan.
+    """
+    if heating_or_cooling == "cooling":
+        sign = 1.
+    elif heating_or_cooling == "heating":
+        # [deltaT - tau]_+ == [(-tau) - (-deltaT)]_+
+        sign = -1.
+    else:
+        raise NotImplementedError
+
+    deltaT = sign * np.asarray(deltaT, dtype=float).reshape((-1, 24))
+    daily_runtime = np.asarray(daily_runtime, dtype=float)
+    day_fit = np.asarray(day_fit, dtype=int)
+
+    # adding 0 turns -0.0 into 0.0
+    return sign * _fit_tau_cooling(deltaT, daily_runtime, day_fit, n_fits) + 0.
+
+
+def daily_demand(deltaT, tau, heating_or_cooling):
+    """ Daily demand for the hourlyavgCTD/HTD demand models.
+
+    Parameters
+    ----------
+    deltaT : numpy.array
+        Hourly deltaT (indoor temperature - outdoor temperature) with shape
+        (..., n_days, 24), e.g., with a leading axis of scenarios. Null values
+        are ignored.
+    tau : float
+        Value of tau at which to evaluate demand.
+    heating_or_cooling : {"heating", "cooling"}
+        Demand model to evaluate.
+
+    Returns
+    -------
+    demand : numpy.array
+        Daily demand with shape (..., n_days).
+    """
+    if heating_or_cooling == "cooling":
+        hourly_demand = np.maximum(tau - deltaT, 0)
+    elif heating_or_cooling == "heating":
+        hourly_demand = np.maximum(deltaT - tau, 0)
+    else:
+        raise NotImplementedError
+    # Note - `x / 24` this should be thought of as a unit conversion, not an average.
+    return np.nansum(hourly_demand, axis=-1) / 24
+
+
+def _group_cumsum(values, starts, group_totals):
+    # Running sums which restart at the first element of each group. Rather
+    # than subtracting offsets from a single running total (which loses
+    # precision as the total grows), subtract each group's total at the start
+    # of the next group so that the running sum stays small. Whatever rounding
+    # error is left over at the start of each group is then removed, so that
+    # it doesn't accumulate across groups.
+    reset = values.copy()
+    reset[starts[1:]] -= group_totals[:-1]
+    cumsum = np.cumsum(reset)
+    residual = cumsum[starts] - values[starts]
+    sizes = np.diff(np.append(starts, values.shape[0]))
+    return cumsum - np.repeat(residual, sizes)
+
+
+def _fit_tau_cooling(deltaT, daily_runtime, day_fit, n_fits):
+    # Daily demand (up to the constant factor of 24, which cancels in alpha)
+    # is d_j(tau) = a_j * tau - b_j, where a_j is the number of hours of day j
+    # with deltaT < tau and b_j is the sum of those deltaTs.
+    n_days, n_hours = deltaT.shape
+    taus = np.tile(np.nan, n_fits)
+
+    # Within a day, hours become active in ascending order of deltaT, so after
+    # sorting each row, the column of a value is the number of hours of that
+    # day already active when it becomes active. Nulls sort to the end.
+    row_sorted = np.sort(deltaT, axis=1)
+    prior_sum = np.cumsum(row_sorted, axis=1) - row_sorted
+    rank = np.tile(np.arange(n_hours), n_days)
+    row = np.repeat(np.arange(n_days), n_hours)
+
+    values = row_sorted.ravel()
+    valid = ~np.isnan(values)
+    if not np.any(valid):
+        return taus
+
+    row = row[valid]
+    rank = rank[valid]
+    values = values[valid]
+    prior_sum = prior_sum.ravel()[valid]
+    fit = day_fit[row]
+    runtime = daily_runtime[row]
+
+    # shift values for numerical stability; the fit is translation invariant.
+    n_values = np.bincount(fit, minlength=n_fits)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.bincount(fit, weights=values, minlength=n_fits) / n_values
+    values = values - shift[fit]
+    prior_sum = prior_sum - rank * shift[fit]
+
+    # sort breakpoints by fit, then by value, in a single sort by spacing
+    # fits further apart than the (centered) values of any one fit.
+    span = 2 * np.max(np.abs(values)) + 1
+    order = np.argsort(fit * span + values)
+    fit = fit[order]
+    x = values[order]
+    r = runtime[order]
+    k = rank[order]
+    s = prior_sum[order]
+
+    fits = np.flatnonzero(n_values)
+    starts = np.append(0, np.cumsum(n_values[fits])[:-1])
+    sizes = n_values[fits]
+
+    def cumsum(a):
+        return _group_cumsum(a, starts, np.add.reduceat(a, starts))
+
+    # Running sums over the active hours after each breakpoint.
+    A = cumsum(np.ones(x.shape))     # sum_j a_j
+    B = cumsum(x)                    # sum_j b_j
+    p1 = cumsum(r)                   # sum_j r_j * a_j
+    p0 = cumsum(r * x)               # sum_j r_j * b_j
+    q2 = cumsum(2 * k + 1.)          # sum_j a_j ** 2
+    q1 = cumsum(s + (k + 1) * x)     # sum_j a_j * b_j
+    q0 = cumsum((2 * s + x) * x)     # sum_j b_j ** 2
+
+    R = np.repeat(np.bincount(day_fit, weights=daily_runtime, minlength=n_fits)[fits], sizes)
+    C = np.repeat(np.bincount(day_fit, weights=daily_runtime ** 2, minlength=n_fits)[fits], sizes)
+
+    def sum_sq_err(tau):
+        D = A * tau - B
+        P = p1 * tau - p0
+        Q = (q2 * tau - 2 * q1) * tau + q0
+        return C - 2 * R * P / D + R ** 2 * Q / D ** 2
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # stationary point of the sum of squared errors within each segment
+        kk = p0 * A - p1 * B
+        numerator = -kk * B - R * (q1 * B - A * q0)
+        denominator = -kk * A + R * (q1 * A - q2 * B)
+        tau_stationary = numerator / denominator
+
+        # the next breakpoint of the same fit bounds each segment.
+        has_next = np.ones(x.shape, dtype=bool)
+        has_next[starts[1:] - 1] = False
+        has_next[-1] = False
+        upper = np.where(has_next, np.append(x[1:], np.inf), np.inf)
+        in_segment = (tau_stationary > x) & (tau_stationary < upper)
+
+        # demand is identically zero up to the lowest breakpoint of each fit
+        # (possibly repeated), so there is no valid estimate there.
+        has_next &= upper > np.repeat(x[starts], sizes)
+
+        err_upper = np.where(has_next, sum_sq_err(upper), np.nan)
+        err_stationary = np.where(in_segment, sum_sq_err(tau_stationary), np.nan)
+
+        # best candidate within each segment
+        use_stationary = (err_stationary < err_upper) | np.isnan(err_upper)
+        candidate_tau = np.where(use_stationary, tau_stationary, upper)
+        candidate_err = np.where(use_stationary, err_stationary, err_upper)
+        candidate_err[~np.isfinite(candidate_err)] = np.inf
+
+        # tau = 0 (before shifting) is also a candidate, in the segment
+        # holding it, if demand isn't zero there.
+        tau_zero = np.repeat(-shift[fits], sizes)
+        zero_in_segment = (x < tau_zero) & (tau_zero <= upper) & \
+            (tau_zero > np.repeat(x[starts], sizes))
+        zero_err = np.where(zero_in_segment, sum_sq_err(tau_zero), np.inf)
+        zero_err[~np.isfinite(zero_err)] = np.inf
+
+    # best candidate for each fit. Errors within rounding of the minimum are
+    # treated as ties (e.g., when the fit is perfect over a range of tau), and
+    # 0, or else the tau closest to 0, is taken, as least squares fits
+    # starting from 0 did. This keeps estimates for degenerate core day sets
+    # (e.g., of a single day) finite and moderate, and independent of
+    # rounding differences, which depend on the other fits in a batch.
+    fit_min_err = np.minimum.reduceat(np.minimum(candidate_err, zero_err), starts)
+    threshold = np.repeat(fit_min_err, sizes) + 1e-9 * C
+    is_min = (candidate_err <= threshold) & np.isfinite(candidate_err)
+    zero_is_min = (zero_err <= threshold) & np.isfinite(zero_err)
+    best_tau = np.where(zero_is_min, tau_zero, candidate_tau)
+    distance = np.where(zero_is_min, 0., np.where(
+        is_min, np.abs(candidate_tau - tau_zero), np.inf))
+
+    has_min = np.isfinite(distance)
+    order = np.lexsort((distance[has_min], fit[has_min]))
+    best_fit, first = np.unique(fit[has_min][order], return_index=True)
+    taus[best_fit] = best_tau[has_min][order][first] + shift[best_fit]
+    return taus
@@ -10,10 +10,17 @@ from collections import defaultdict
 from itertools import chain
 from warnings import warn
 import json
+import multiprocessing
 from functools import reduce
-from pkg_resources import resource_stream
 
 from thermostat import get_version
+from thermostat import resources
+from thermostat.quantiles import group_quantiles
+from thermostat.accumulators import (
+    MomentAccumulator,
+    QuantileSketch,
+    DEFAULT_RELATIVE_ACCURACY,
+)
 
 REAL_OR_INTEGER_VALUED_COLUMNS_HEATING = [
     'n_days_in_inputfile_date_range',
@@ -155,6 +162,19 @@ REAL_OR_INTEGER_VALUED_COLUMNS_ALL = [
     'rhu_55F_to_60F',
 ]
 
+SUMMARY_STATISTICS_QUANTILES = [10, 20, 30, 40, 50, 60, 70, 80, 90]
+
+# maximum number of resampled values drawn at once by a bootstrap task
+BOOTSTRAP_CHUNK_SIZE = 2 ** 22
+
+CLIMATE_ZONE_LABELS = OrderedDict([
+    ("Very-Cold/Cold", "very-cold_cold"),
+    ("Mixed-Humid", "mixed-humid"),
+    ("Mixed-Dry/Hot-Dry", "mixed-dry_hot-dry"),
+    ("Hot-Humid", "hot-humid"),
+    ("Marine", "marine"),
+])
+
 def combine_output_dataframes(dfs):
     """ Combines output dataframes. Useful when combining output from batches.
 
@@ -174,290 +194,365 @@ def combine_output_dataframes(dfs):
 def get_filtered_stats(
         df, row_filter, label, heating_or_cooling, target_columns,
         target_baseline_method):
+    """ Computes summary statistics for the rows of a dataframe selected by
+    a filter.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Output rows for which to compute summary statistics.
+    row_filter : callable
+        Called as :code:`row_filter(df)`; returns a boolean array with one
+        element for each row of `df`, True for rows to keep.
+    label : str
+        Name for this set of thermostat outputs.
+    heating_or_cooling : {"heating", "cooling"}
+        Appended to the label.
+    target_columns : list of str
+        Columns for which to compute statistics.
+    target_baseline_method : {"baseline_percentile", "baseline_regional"}
+        Baselining method.
+
+    Returns
+    -------
+    stats : list of collections.OrderedDict
+        Statistics as described in :code:`compute_summary_statistics`, or an
+        empty list if `df` has no rows.
+    """
 
     n_rows_total = df.shape[0]
 
-    filtered_df = df[[row_filter(row, df) for i, row in df.iterrows()]]
+    if n_rows_total > 0:
+        rows = np.flatnonzero(np.asarray(row_filter(df), dtype=bool))
+    else:
+        rows = np.empty((0,), dtype=int)
 
-    n_rows_kept = filtered_df.shape[0]
-    n_rows_discarded = n_rows_total - n_rows_kept
+    stats = _get_stats_header(label, heating_or_cooling, n_rows_total, rows.shape[0])
+
+    if n_rows_total > 0:
+        column_stats, = _get_group_stats(
+            df, target_columns, rows, np.zeros(rows.shape, dtype=int), 1)
+        stats.update(column_stats)
+        return [stats]
+    else:
+        _warn_not_enough_data(label, heating_or_cooling)
+        return []
 
+
+def _get_stats_header(label, heating_or_cooling, n_rows_total, n_rows_kept):
     stats = OrderedDict()
     stats["label"] = "{}_{}".format(label, heating_or_cooling)
     stats["sw_version"] = get_version()
     stats["n_thermostat_core_day_sets_total"] = n_rows_total
     stats["n_thermostat_core_day_sets_kept"] = n_rows_kept
-    stats["n_thermostat_core_day_sets_discarded"] = n_rows_discarded
-
-    if n_rows_total > 0:
+    stats["n_thermostat_core_day_sets_discarded"] = n_rows_total - n_rows_kept
+    return stats
 
-        for column_name in target_columns:
-            column = filtered_df[column_name].replace([np.inf, -np.inf], np.nan).dropna()
 
-            # calculate quantiles and statistics
-            mean = np.nanmean(column)
-            sem = np.nanstd(column) / (column.count() ** .5)
-            lower_bound = mean - (1.96 * sem)
-            upper_bound = mean + (1.96 * sem)
-            stats["{}_n".format(column_name)] = column.count()
-            stats["{}_upper_bound_95_perc_conf".format(column_name)] = upper_bound
-            stats["{}_mean".format(column_name)] = mean
-            stats["{}_lower_bound_95_perc_conf".format(column_name)] = lower_bound
-            stats["{}_sem".format(column_name)] = sem
+def _warn_not_enough_data(label, heating_or_cooling):
+    warn(
+        "Not enough data to compute summary_statistics ({}_{})"
+        .format(label, heating_or_cooling)
+    )
 
-            for quantile in [10, 20, 30, 40, 50, 60, 70, 80, 90]:
-                stats["{}_q{}".format(column_name, quantile)] = column.quantile(quantile / 100.)
 
-        return [stats]
+def _get_column_group_stats(values, groups, n_groups, order=None):
+    # n, mean, sem, 95% bounds and deciles of the finite values in each
+    # group, as arrays by name of statistic. If given, order gives the
+    # positions of the finite values in ascending order.
+    if order is None:
+        finite = np.flatnonzero(np.isfinite(values))
     else:
-        warn(
-            "Not enough data to compute summary_statistics ({}_{})"
-            .format(label, heating_or_cooling)
-        )
-        return []
+        finite = order
+    finite_values = values[finite]
+    finite_groups = groups[finite]
+
+    # calculate quantiles and statistics
+    n = np.bincount(finite_groups, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(
+            finite_groups, weights=finite_values, minlength=n_groups) / n
+        deviations = finite_values - mean[finite_groups]
+        std = np.sqrt(np.bincount(
+            finite_groups, weights=deviations ** 2, minlength=n_groups) / n)
+        sem = std / (n ** .5)
+    q = np.array(SUMMARY_STATISTICS_QUANTILES) / 100.
+    if order is None:
+        quantiles = group_quantiles(finite_values, q, finite_groups, n_groups)
+    else:
+        quantiles = group_quantiles(values, q, groups, n_groups, order=order)
 
+    stats = OrderedDict()
+    stats["n"] = n
+    stats["upper_bound_95_perc_conf"] = mean + (1.96 * sem)
+    stats["mean"] = mean
+    stats["lower_bound_95_perc_conf"] = mean - (1.96 * sem)
+    stats["sem"] = sem
+    for i, quantile in enumerate(SUMMARY_STATISTICS_QUANTILES):
+        stats["q{}".format(quantile)] = quantiles[:, i]
+    return stats
 
-def compute_summary_statistics(
-        metrics_df,
-        target_baseline_method="baseline_percentile",
-        advanced_filtering=False):
-    """ Computes summary statistics for the output dataframe. Computes the
-    following statistics for each real-valued or integer valued column in
-    the output dataframe: mean, standard error of the mean, and deciles.
 
-    Parameters
-    ----------
-    df : pd.DataFrame
-        Output for which to compute summary statistics.
-    label : str
-        Name for this set of thermostat outputs.
-    target_baseline_method : {"baseline_percentile", "baseline_regional"}, default "baseline_percentile"
-        Baselining method by which samples will be filtered according to bad fits.
+def _get_group_stats(df, target_columns, rows, groups, n_groups):
+    # Statistics of each target column over groups of rows of df, in one
+    # pass per column. rows gives the positions of the rows in each group
+    # (a row may be in several groups) and groups the group of each.
+    # Infinite and null values are ignored.
+    group_stats = [OrderedDict() for _ in range(n_groups)]
 
-    Returns
-    -------
-    stats : collections.OrderedDict
-        An ordered dict containing the summary statistics. Column names are as
-        follows, in which ### is a placeholder for the name of the column:
+    for column_name in target_columns:
+        values = np.asarray(df[column_name].values, dtype=float)[rows]
+        column_stats = _get_column_group_stats(values, groups, n_groups)
+        for i, stats in enumerate(group_stats):
+            for stat_name, stat_values in column_stats.items():
+                stats["{}_{}".format(column_name, stat_name)] = stat_values[i]
 
-          - mean: ###_mean
-          - standard error of the mean: ###_sem
-          - 10th quantile: ###_10q
-          - 20th quantile: ###_20q
-          - 30th quantile: ###_30q
-          - 40th quantile: ###_40q
-          - 50th quantile: ###_50q
-          - 60th quantile: ###_60q
-          - 70th quantile: ###_70q
-          - 80th quantile: ###_80q
-          - 90th quantile: ###_90q
-          - number of non-null core day sets: ###_n
+    return group_stats
 
-        The following general values are also output:
 
-          - label: label
-          - number of total core day sets: n_total_core_day_sets
+def _contains(series, substring):
+    # whether each value is a string containing substring
+    contains = series.astype(object).str.contains(substring, regex=False, na=False)
+    return np.asarray(contains.fillna(False), dtype=bool)
 
-    """
 
-    if target_baseline_method not in ["baseline_percentile", "baseline_regional"]:
-        message = (
-            'Baseline method not supported - please use one of'
-            ' "baseline_percentile" or "baseline_regional"'
-        )
-        raise ValueError(message)
+def _identity_filter(df):
+    return np.ones(df.shape[0], dtype=bool)
 
-    def _identity_filter(row, df):
-        return True
 
-    def _range_filter(row, column_name, heating_or_cooling, lower_bound=-np.inf, upper_bound=np.inf, target_baseline=False):
-        if target_baseline:
-            full_column_selector = "{}_{}".format(column_name, target_baseline_method)
-        else:
-            full_column_selector = column_name
-        column_value = row[full_column_selector]
-        return lower_bound < column_value < upper_bound
+def _in_range(values, lower_bound, upper_bound):
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return (lower_bound < values) & (values < upper_bound)
 
-    def _percentile_range_filter(row, column_name, heating_or_cooling, df, quantile=0.0, target_baseline=False):
-        if target_baseline:
-            full_column_selector = "{}_{}".format(column_name, target_baseline_method)
-        else:
-            full_column_selector = column_name
-        lower_bound = df[full_column_selector].dropna().quantile(0.0 + quantile)
-        upper_bound = df[full_column_selector].dropna().quantile(1.0 - quantile)
-        return _range_filter(row, column_name, heating_or_cooling, lower_bound, upper_bound, target_baseline)
-
-    def _tau_filter_heating(row, df):
-        return _range_filter(row, "tau", "heating", 0, 25)
-
-    def _tau_filter_cooling(row, df):
-        return _range_filter(row, "tau", "cooling", 0, 25)
-
-    def _cvrmse_filter_heating(row, df):
-        return _range_filter(row, "cv_root_mean_sq_err", "heating", upper_bound=0.6)
-
-    def _cvrmse_filter_cooling(row, df):
-        return _range_filter(row, "cv_root_mean_sq_err", "cooling", upper_bound=0.6)
-
-    def _savings_filter_p01_heating(row, df):
-        return _percentile_range_filter(row, "percent_savings", "heating", df, 0.01, True)
-
-    def _savings_filter_p01_cooling(row, df):
-        return _percentile_range_filter(row, "percent_savings", "cooling", df, 0.01, True)
-
-    def _combine_filters(filters):
-        def _new_filter(row, df):
-            return reduce(lambda x, y: x and y(row, df), filters, True)
-        return _new_filter
-
-    def heating_stats(df, filter_, label):
-        heating_df = df[["heating" in name for name in df["heating_or_cooling"]]]
-        return get_filtered_stats(
-            heating_df, filter_, label,
-            "heating", REAL_OR_INTEGER_VALUED_COLUMNS_HEATING,
-            target_baseline_method)
-
-    def cooling_stats(df, filter_, label):
-        cooling_df = df[["cooling" in name for name in df["heating_or_cooling"]]]
-        return get_filtered_stats(
-            cooling_df, filter_, label,
-            "cooling", REAL_OR_INTEGER_VALUED_COLUMNS_COOLING,
-            target_baseline_method)
-
-    very_cold_cold_df = metrics_df[[
-        (cz is not None) and "Very-Cold/Cold" in cz
-        for cz in metrics_df["climate_zone"]
-    ]]
-    mixed_humid_df = metrics_df[[
-        (cz is not None) and "Mixed-Humid" in cz
-        for cz in metrics_df["climate_zone"]
-    ]]
-    mixed_dry_hot_dry_df = metrics_df[[
-        (cz is not None) and "Mixed-Dry/Hot-Dry" in cz
-        for cz in metrics_df["climate_zone"]
-    ]]
-    hot_humid_df = metrics_df[[
-        (cz is not None) and "Hot-Humid" in cz
-        for cz in metrics_df["climate_zone"]
-    ]]
-    marine_df = metrics_df[[
-        (cz is not None) and "Marine" in cz
-        for cz in metrics_df["climate_zone"]
-    ]]
-
-    filter_0 = _identity_filter
-    filter_1_heating = _combine_filters([_tau_filter_heating])
-    filter_1_cooling = _combine_filters([_tau_filter_cooling])
-    filter_2_heating = _combine_filters([_tau_filter_heating, _cvrmse_filter_heating])
-    filter_2_cooling = _combine_filters([_tau_filter_cooling, _cvrmse_filter_cooling])
-    filter_3_heating = _combine_filters([_tau_filter_heating, _cvrmse_filter_heating, _savings_filter_p01_heating])
-    filter_3_cooling = _combine_filters([_tau_filter_cooling, _cvrmse_filter_cooling, _savings_filter_p01_cooling])
 
+def _range_filter(column_name, lower_bound=-np.inf, upper_bound=np.inf):
+    def _filter(df):
+        return _in_range(df[column_name].values, lower_bound, upper_bound)
+    return _filter
+
+
+def _percentile_range_filter(column_name, quantile=0.0):
+    def _filter(df):
+        # bounds are computed once over all rows of the group
+        column = df[column_name]
+        non_null = column.dropna()
+        lower_bound = non_null.quantile(0.0 + quantile)
+        upper_bound = non_null.quantile(1.0 - quantile)
+        return _in_range(column.values, lower_bound, upper_bound)
+    return _filter
+
+
+def _combine_filters(filters):
+    def _new_filter(df):
+        return reduce(
+            lambda mask, filter_: mask & filter_(df), filters,
+            _identity_filter(df))
+    return _new_filter
+
+
+def _get_filters(target_baseline_method, advanced_filtering, savings_filter):
+    # filters by label, in order. If savings_filter is None, filters
+    # including it are left out.
+    tau_filter = _range_filter("tau", 0, 25)
+    cvrmse_filter = _range_filter("cv_root_mean_sq_err", upper_bound=0.6)
+
+    filters = OrderedDict([("no_filter", _identity_filter)])
     if advanced_filtering:
-        stats = list(chain.from_iterable([
-            heating_stats(metrics_df, filter_0, "all_no_filter"),
-            cooling_stats(metrics_df, filter_0, "all_no_filter"),
-            heating_stats(very_cold_cold_df, filter_0, "very-cold_cold_no_filter"),
-            cooling_stats(very_cold_cold_df, filter_0, "very-cold_cold"),
-            heating_stats(mixed_humid_df, filter_0, "mixed-humid_no_filter"),
-            cooling_stats(mixed_humid_df, filter_0, "mixed-humid_no_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_0, "mixed-dry_hot-dry_no_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_0, "mixed-dry_hot-dry_no_filter"),
-            heating_stats(hot_humid_df, filter_0, "hot-humid_no_filter"),
-            cooling_stats(hot_humid_df, filter_0, "hot-humid_no_filter"),
-            heating_stats(marine_df, filter_0, "marine_no_filter"),
-            cooling_stats(marine_df, filter_0, "marine_no_filter"),
-
-            heating_stats(metrics_df, filter_1_heating, "all_tau_filter"),
-            cooling_stats(metrics_df, filter_1_cooling, "all_tau_filter"),
-            heating_stats(very_cold_cold_df, filter_1_heating, "very-cold_cold_tau_filter"),
-            cooling_stats(very_cold_cold_df, filter_1_cooling, "very-cold_cold_tau_filter"),
-            heating_stats(mixed_humid_df, filter_1_heating, "mixed-humid_tau_filter"),
-            cooling_stats(mixed_humid_df, filter_1_cooling, "mixed-humid_tau_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_1_heating, "mixed-dry_hot-dry_tau_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_1_cooling, "mixed-dry_hot-dry_tau_filter"),
-            heating_stats(hot_humid_df, filter_1_heating, "hot-humid_tau_filter"),
-            cooling_stats(hot_humid_df, filter_1_cooling, "hot-humid_tau_filter"),
-            heating_stats(marine_df, filter_1_heating, "marine_tau_filter"),
-            cooling_stats(marine_df, filter_1_cooling, "marine_tau_filter"),
-
-            heating_stats(metrics_df, filter_2_heating, "all_tau_cvrmse_filter"),
-            cooling_stats(metrics_df, filter_2_cooling, "all_tau_cvrmse_filter"),
-            heating_stats(very_cold_cold_df, filter_2_heating, "very-cold_cold_tau_cvrmse_filter"),
-            cooling_stats(very_cold_cold_df, filter_2_cooling, "very-cold_cold_tau_cvrmse_filter"),
-            heating_stats(mixed_humid_df, filter_2_heating, "mixed-humid_tau_cvrmse_filter"),
-            cooling_stats(mixed_humid_df, filter_2_cooling, "mixed-humid_tau_cvrmse_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_2_heating, "mixed-dry_hot-dry_tau_cvrmse_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_2_cooling, "mixed-dry_hot-dry_tau_cvrmse_filter"),
-            heating_stats(hot_humid_df, filter_2_heating, "hot-humid_tau_cvrmse_filter"),
-            cooling_stats(hot_humid_df, filter_2_cooling, "hot-humid_tau_cvrmse_filter"),
-            heating_stats(marine_df, filter_2_heating, "marine_tau_cvrmse_filter"),
-            cooling_stats(marine_df, filter_2_cooling, "marine_tau_cvrmse_filter"),
-
-            heating_stats(metrics_df, filter_3_heating, "all_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(metrics_df, filter_3_cooling, "all_tau_cvrmse_savings_p01_filter"),
-            heating_stats(very_cold_cold_df, filter_3_heating, "very-cold_cold_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(very_cold_cold_df, filter_3_cooling, "very-cold_cold_tau_cvrmse_savings_p01_filter"),
-            heating_stats(mixed_humid_df, filter_3_heating, "mixed-humid_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(mixed_humid_df, filter_3_cooling, "mixed-humid_tau_cvrmse_savings_p01_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_3_heating, "mixed-dry_hot-dry_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_3_cooling, "mixed-dry_hot-dry_tau_cvrmse_savings_p01_filter"),
-            heating_stats(hot_humid_df, filter_3_heating, "hot-humid_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(hot_humid_df, filter_3_cooling, "hot-humid_tau_cvrmse_savings_p01_filter"),
-            heating_stats(marine_df, filter_3_heating, "marine_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(marine_df, filter_3_cooling, "marine_tau_cvrmse_savings_p01_filter"),
-        ]))
-    else:
-        stats = list(chain.from_iterable([
-            heating_stats(metrics_df, filter_0, "all_no_filter"),
-            cooling_stats(metrics_df, filter_0, "all_no_filter"),
-            heating_stats(very_cold_cold_df, filter_0, "very-cold_cold_no_filter"),
-            cooling_stats(very_cold_cold_df, filter_0, "very-cold_cold"),
-            heating_stats(mixed_humid_df, filter_0, "mixed-humid_no_filter"),
-            cooling_stats(mixed_humid_df, filter_0, "mixed-humid_no_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_0, "mixed-dry_hot-dry_no_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_0, "mixed-dry_hot-dry_no_filter"),
-            heating_stats(hot_humid_df, filter_0, "hot-humid_no_filter"),
-            cooling_stats(hot_humid_df, filter_0, "hot-humid_no_filter"),
-            heating_stats(marine_df, filter_0, "marine_no_filter"),
-            cooling_stats(marine_df, filter_0, "marine_no_filter"),
-
-            heating_stats(metrics_df, filter_3_heating, "all_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(metrics_df, filter_3_cooling, "all_tau_cvrmse_savings_p01_filter"),
-            heating_stats(very_cold_cold_df, filter_3_heating, "very-cold_cold_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(very_cold_cold_df, filter_3_cooling, "very-cold_cold_tau_cvrmse_savings_p01_filter"),
-            heating_stats(mixed_humid_df, filter_3_heating, "mixed-humid_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(mixed_humid_df, filter_3_cooling, "mixed-humid_tau_cvrmse_savings_p01_filter"),
-            heating_stats(mixed_dry_hot_dry_df, filter_3_heating, "mixed-dry_hot-dry_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(mixed_dry_hot_dry_df, filter_3_cooling, "mixed-dry_hot-dry_tau_cvrmse_savings_p01_filter"),
-            heating_stats(hot_humid_df, filter_3_heating, "hot-humid_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(hot_humid_df, filter_3_cooling, "hot-humid_tau_cvrmse_savings_p01_filter"),
-            heating_stats(marine_df, filter_3_heating, "marine_tau_cvrmse_savings_p01_filter"),
-            cooling_stats(marine_df, filter_3_cooling, "marine_tau_cvrmse_savings_p01_filter"),
-        ]))
+        filters["tau_filter"] = _combine_filters([tau_filter])
+        filters["tau_cvrmse_filter"] = _combine_filters([tau_filter, cvrmse_filter])
+    if savings_filter is not None:
+        filters["tau_cvrmse_savings_p01_filter"] = _combine_filters(
+            [tau_filter, cvrmse_filter, savings_filter])
+    return filters
 
-    stats_dict = {stat["label"]: stat for stat in stats}
 
-    def _load_climate_zone_weights(filename_or_buffer):
-        climate_zone_keys = {
-            "Very-Cold/Cold": "very-cold_cold",
-            "Mixed-Humid": "mixed-humid",
-            "Mixed-Dry/Hot-Dry": "mixed-dry_hot-dry",
-            "Hot-Humid": "hot-humid",
-            "Marine": "marine",
-        }
-        df = pd.read_csv(
-            filename_or_buffer,
-            usecols=["climate_zone", "heating_weight", "cooling_weight"],
-        ).set_index("climate_zone")
+def _get_zone_labels():
+    return ["all"] + list(CLIMATE_ZONE_LABELS.values())
+
+
+def _get_season_columns():
+    return [
+        ("heating", REAL_OR_INTEGER_VALUED_COLUMNS_HEATING),
+        ("cooling", REAL_OR_INTEGER_VALUED_COLUMNS_COOLING),
+    ]
+
+
+def _get_group_order(filter_labels):
+    # keys (zone_label, filter_label, season) of all groups, in the order
+    # filter, climate zone, then heating before cooling.
+    return [
+        (zone_label, filter_label, season)
+        for filter_label in filter_labels
+        for zone_label in _get_zone_labels()
+        for season, _ in _get_season_columns()
+    ]
+
+
+def _get_group_label(zone_label, filter_label, season):
+    if zone_label == "very-cold_cold" and filter_label == "no_filter" and \
+            season == "cooling":
+        # historically labeled without the filter name
+        return zone_label
+    return "{}_{}".format(zone_label, filter_label)
+
+
+def _get_climate_zone_groups(metrics_df, get_filters):
+    # Rows in each group of core day sets, for each filter over each climate
+    # zone (and all climate zones together), selected with boolean masks.
+    # Filters for each climate zone and season are given by
+    # get_filters(zone_label, season). Returns, for each season, the target
+    # columns, the keys (zone_label, filter_label, n_rows_total) of its
+    # groups and the positions of the rows kept in each.
+
+    zone_masks = OrderedDict([("all", np.ones(metrics_df.shape[0], dtype=bool))])
+    for climate_zone, zone_label in CLIMATE_ZONE_LABELS.items():
+        zone_masks[zone_label] = _contains(metrics_df["climate_zone"], climate_zone)
+
+    season_groups = []
+    for season, target_columns in _get_season_columns():
+        season_mask = _contains(metrics_df["heating_or_cooling"], season)
+
+        keys, group_rows = [], []
+        for zone_label, zone_mask in zone_masks.items():
+            zone_rows = np.flatnonzero(zone_mask & season_mask)
+            if zone_rows.shape[0] == 0:
+                continue
+            zone_df = metrics_df.iloc[zone_rows]
+            for filter_label, filter_ in get_filters(zone_label, season).items():
+                keys.append((zone_label, filter_label, zone_rows.shape[0]))
+                group_rows.append(
+                    zone_rows[np.asarray(filter_(zone_df), dtype=bool)])
+
+        season_groups.append((season, target_columns, keys, group_rows))
+    return season_groups
+
+
+def _get_climate_zone_filtered_stats(metrics_df, season_groups, filters):
+    # Statistics for each group of core day sets (from
+    # _get_climate_zone_groups), computed together for all groups of a
+    # season, in the order given by _get_group_order.
+
+    group_stats = {}
+    for season, target_columns, keys, group_rows in season_groups:
+        if len(keys) == 0:
+            continue
+
+        n_rows_kept = [rows.shape[0] for rows in group_rows]
+        rows = np.concatenate(group_rows)
+        groups = np.repeat(np.arange(len(keys)), n_rows_kept)
+        column_stats = _get_group_stats(
+            metrics_df, target_columns, rows, groups, len(keys))
+
+        for (zone_label, filter_label, n_rows_total), n, stats in zip(
+                keys, n_rows_kept, column_stats):
+            group_stats[(zone_label, filter_label, season)] = \
+                (n_rows_total, n, stats)
+
+    stats = []
+    for key in _get_group_order(filters):
+        label = _get_group_label(*key)
+        season = key[2]
+        if key in group_stats:
+            n_rows_total, n_rows_kept, column_stats = group_stats[key]
+            header = _get_stats_header(label, season, n_rows_total, n_rows_kept)
+            header.update(column_stats)
+            stats.append(header)
+        else:
+            _warn_not_enough_data(label, season)
+    return stats
 
-        heating_weights = {climate_zone_keys[cz]: weight for cz, weight in df["heating_weight"].iteritems()}
-        cooling_weights = {climate_zone_keys[cz]: weight for cz, weight in df["cooling_weight"].iteritems()}
 
-        return heating_weights, cooling_weights
+def _get_climate_zone_label_weights():
+    # heating and cooling weights by climate zone label
+    return [
+        {CLIMATE_ZONE_LABELS[cz]: weight for cz, weight in weights.items()}
+        for weights in resources.get_climate_zone_weights()]
 
-    with resource_stream('thermostat.resources', 'NationalAverageClimateZoneWeightings.csv') as f:
-        heating_weights, cooling_weights = _load_climate_zone_weights(f)
+
+def _bootstrap_climate_zone(args):
+    # Mean and deciles of each of n_samples resamples (with replacement) of
+    # values, drawn as one matrix of indexes.
+    values, n_samples, seed = args
+    random_state = np.random.RandomState(seed)
+    indexes = random_state.randint(0, values.shape[0], size=(n_samples, values.shape[0]))
+    samples = values[indexes]
+    return np.column_stack([
+        samples.mean(axis=1),
+        np.percentile(samples, SUMMARY_STATISTICS_QUANTILES, axis=1).T,
+    ])
+
+
+def _get_bootstrap_national_weighting_bounds(
+        metrics_df, season_groups, n_samples, seed, processes):
+    # Bootstrap 95% confidence bounds of the national weighted mean and
+    # deciles of percent savings, for each season and filter, by resampling
+    # the core day sets kept in each climate zone. Resamples are split into
+    # tasks of at most BOOTSTRAP_CHUNK_SIZE values, each with its own seed,
+    # so results don't depend on the number of processes.
+    weights = dict(zip(["heating", "cooling"], _get_climate_zone_label_weights()))
+    methods = ["baseline_percentile", "baseline_regional"]
+    stat_names = ["mean"] + ["q{}".format(q) for q in SUMMARY_STATISTICS_QUANTILES]
+
+    task_keys, tasks = [], []
+    for season, _, keys, group_rows in season_groups:
+        for (zone_label, filter_label, _), rows in zip(keys, group_rows):
+            if pd.isnull(weights[season].get(zone_label)):
+                continue
+            for method in methods:
+                values = np.asarray(
+                    metrics_df["percent_savings_{}".format(method)].values, dtype=float)[rows]
+                values = values[np.isfinite(values)]
+                # groups with no rows kept in any climate zone get no bounds
+                if values.shape[0] == 0:
+                    continue
+                chunk_size = max(1, BOOTSTRAP_CHUNK_SIZE // values.shape[0])
+                for start in range(0, n_samples, chunk_size):
+                    task_keys.append((season, filter_label, method, zone_label))
+                    tasks.append((values, min(chunk_size, n_samples - start), [seed, len(tasks)]))
+
+    if processes == 1 or len(tasks) <= 1:
+        results = [_bootstrap_climate_zone(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_bootstrap_climate_zone, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    samples = OrderedDict()
+    for key, result in zip(task_keys, results):
+        samples.setdefault(key[:3], OrderedDict()).setdefault(key[3], []).append(result)
+
+    bounds = defaultdict(dict)
+    for (season, filter_label, method), zone_samples in samples.items():
+        weighted_sum, sum_of_weights = 0., 0.
+        for zone_label, results in zone_samples.items():
+            weight = weights[season][zone_label]
+            weighted_sum = weighted_sum + weight * np.concatenate(results)
+            sum_of_weights += weight
+        lower_bounds, upper_bounds = np.percentile(
+            weighted_sum / sum_of_weights, [2.5, 97.5], axis=0)
+
+        key = "percent_savings_{}".format(method)
+        for stat_name, lower_bound, upper_bound in zip(stat_names, lower_bounds, upper_bounds):
+            stat_key = key if stat_name == "mean" else "{}_{}".format(key, stat_name)
+            label = "national_weighted_mean_{}_{}".format(season, filter_label)
+            bounds[label].update({
+                "{}_lower_bound_95_perc_conf_national_weighted_mean".format(stat_key): lower_bound,
+                "{}_upper_bound_95_perc_conf_national_weighted_mean".format(stat_key): upper_bound,
+            })
+    return bounds
+
+
+def _get_national_weighting_stats(stats, filters):
+    # national weighted means of percent savings statistics for each filter,
+    # from the statistics of each climate zone.
+
+    stats_dict = {stat["label"]: stat for stat in stats}
+
+    heating_weights, cooling_weights = _get_climate_zone_label_weights()
 
     def _compute_national_weightings(stats_by_climate_zone, keys, weights):
         def _national_weight(key):
@@ -547,26 +642,7 @@ def compute_summary_statistics(
 
     national_weighting_stats = []
 
-    if advanced_filtering:
-        filters = [
-            "no_filter",
-            "tau_filter",
-            "tau_cvrmse_filter",
-            "tau_cvrmse_savings_p01_filter",
-        ]
-    else:
-        filters = [
-            "no_filter",
-            "tau_cvrmse_savings_p01_filter",
-        ]
-
-    climate_zones = [
-        "mixed-humid",
-        "mixed-dry_hot-dry",
-        "marine",
-        "hot-humid",
-        "very-cold_cold"
-    ]
+    climate_zones = list(CLIMATE_ZONE_LABELS.values())
     methods = [
         "baseline_percentile",
         "baseline_regional",
@@ -598,9 +674,582 @@ def compute_summary_statistics(
 
             national_weighting_stats.append(national_weightings)
 
-    stats = national_weighting_stats + stats
+    return national_weighting_stats
 
-    return stats
+
+def _check_target_baseline_method(target_baseline_method):
+    if target_baseline_method not in ["baseline_percentile", "baseline_regional"]:
+        message = (
+            'Baseline method not supported - please use one of'
+            ' "baseline_percentile" or "baseline_regional"'
+        )
+        raise ValueError(message)
+
+
+def compute_summary_statistics(
+        metrics_df,
+        target_baseline_method="baseline_percentile",
+        advanced_filtering=False,
+        bootstrap_samples=None,
+        bootstrap_seed=0,
+        bootstrap_processes=None):
+    """ Computes summary statistics for the output dataframe. Computes the
+    following statistics for each real-valued or integer valued column in
+    the output dataframe: mean, standard error of the mean, and deciles.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Output for which to compute summary statistics.
+    label : str
+        Name for this set of thermostat outputs.
+    target_baseline_method : {"baseline_percentile", "baseline_regional"}, default "baseline_percentile"
+        Baselining method by which samples will be filtered according to bad fits.
+    advanced_filtering : boolean, default False
+        Whether to compute statistics for all filters, rather than only
+        without filtering and with the savings filter.
+    bootstrap_samples : int, default None
+        If given, 95% confidence bounds of the national weighted mean of
+        percent savings are found by bootstrap, from this many resamples
+        (with replacement) of the core day sets in each climate zone, rather
+        than from the standard errors of each climate zone. Bounds of the
+        national weighted deciles (e.g.,
+        ``percent_savings_baseline_percentile_q10_lower_bound_95_perc_conf_national_weighted_mean``)
+        are also output.
+        Groups with no core day sets kept in any climate zone (i.e., for
+        which the national weighted mean is None) get no bootstrap bounds.
+    bootstrap_seed : int, default 0
+        Seed of the random resamples, for reproducible bounds.
+    bootstrap_processes : int, default None
+        Number of processes over which to spread resampling. If None, the
+        number of CPUs.
+
+    Returns
+    -------
+    stats : collections.OrderedDict
+        An ordered dict containing the summary statistics. Column names are as
+        follows, in which ### is a placeholder for the name of the column:
+
+          - mean: ###_mean
+          - standard error of the mean: ###_sem
+          - 10th quantile: ###_10q
+          - 20th quantile: ###_20q
+          - 30th quantile: ###_30q
+          - 40th quantile: ###_40q
+          - 50th quantile: ###_50q
+          - 60th quantile: ###_60q
+          - 70th quantile: ###_70q
+          - 80th quantile: ###_80q
+          - 90th quantile: ###_90q
+          - number of non-null core day sets: ###_n
+
+        The following general values are also output:
+
+          - label: label
+          - number of total core day sets: n_total_core_day_sets
+
+    """
+
+    _check_target_baseline_method(target_baseline_method)
+
+    filters = _get_filters(
+        target_baseline_method, advanced_filtering,
+        _percentile_range_filter(
+            "percent_savings_{}".format(target_baseline_method), 0.01))
+
+    season_groups = _get_climate_zone_groups(
+        metrics_df, lambda zone_label, season: filters)
+    stats = _get_climate_zone_filtered_stats(metrics_df, season_groups, filters)
+    national_weighting_stats = _get_national_weighting_stats(stats, filters)
+
+    if bootstrap_samples is not None:
+        bounds = _get_bootstrap_national_weighting_bounds(
+            metrics_df, season_groups, bootstrap_samples, bootstrap_seed,
+            bootstrap_processes)
+        for national_weightings in national_weighting_stats:
+            national_weightings.update(bounds.get(national_weightings["label"], {}))
+
+    return national_weighting_stats + stats
+
+
+
+class SummaryStatisticsCube(object):
+    """ Summary statistics of output metrics for groups of core day sets by
+    any combination of columns (e.g., equipment type, weather station,
+    zipcode prefix or start year), with subtotals for each leading subset of
+    the grouping columns, as in a SQL rollup.
+
+    The values of each target column are sorted once, when first needed,
+    and kept, as are the codes of each grouping column, so that further
+    rollups over the same output only need a stable sort of integer group
+    codes and a pass over the values of each column.
+
+    Parameters
+    ----------
+    metrics_df : pd.DataFrame
+        Output for which to compute summary statistics.
+    target_columns : list of str, default None
+        Columns for which to compute statistics. If None,
+        :code:`REAL_OR_INTEGER_VALUED_COLUMNS_ALL`.
+    """
+
+    def __init__(self, metrics_df, target_columns=None):
+        if target_columns is None:
+            target_columns = REAL_OR_INTEGER_VALUED_COLUMNS_ALL
+        self.metrics_df = metrics_df
+        self.target_columns = list(target_columns)
+        self._sorted_columns = {}
+        self._group_codes = {}
+
+    def _get_sorted_column(self, column_name):
+        # values of a column, and positions of its finite values in
+        # ascending order of value.
+        if column_name not in self._sorted_columns:
+            values = np.asarray(self.metrics_df[column_name].values, dtype=float)
+            finite = np.flatnonzero(np.isfinite(values))
+            order = finite[np.argsort(values[finite])]
+            self._sorted_columns[column_name] = (values, order)
+        return self._sorted_columns[column_name]
+
+    def _get_group_codes(self, key):
+        # name, codes (-1 if null) and sorted unique values of a grouping
+        # column or series.
+        if isinstance(key, pd.Series):
+            if key.name is None or key.shape[0] != self.metrics_df.shape[0]:
+                message = "Grouping series must be named and have one value" \
+                    " for each row of output."
+                raise ValueError(message)
+            codes, uniques = pd.factorize(key.values, sort=True)
+            return key.name, codes, uniques
+        if key not in self._group_codes:
+            self._group_codes[key] = pd.factorize(
+                self.metrics_df[key].values, sort=True)
+        codes, uniques = self._group_codes[key]
+        return key, codes, uniques
+
+    def rollup(self, by):
+        """ Summary statistics for all core day sets, then for each
+        combination of values of the first grouping column, of the first
+        two, and so on.
+
+        Parameters
+        ----------
+        by : list of str or pandas.Series
+            Columns of the output, or named series with one value for each
+            row of output (e.g.,
+            :code:`metrics_df.zipcode.str[:3].rename("zipcode_prefix")`), by
+            which to group core day sets. Core day sets with a null value in
+            any are left out.
+
+        Returns
+        -------
+        stats : pd.DataFrame
+            One row for each group, in order of the number of grouping
+            columns, then of their values. Has a column for each grouping
+            column (None where rolled up), the number of core day sets in
+            the group (:code:`n_thermostat_core_day_sets`) and, for each
+            target column, the statistics output by
+            :code:`compute_summary_statistics` (e.g., `tau_n`, `tau_mean`,
+            `tau_sem`, `tau_q10`).
+        """
+        names, codes, uniques = [], [], []
+        for key in by:
+            name, key_codes, key_uniques = self._get_group_codes(key)
+            names.append(name)
+            codes.append(key_codes)
+            uniques.append(key_uniques)
+
+        valid = np.ones(self.metrics_df.shape[0], dtype=bool)
+        for key_codes in codes:
+            valid &= key_codes >= 0
+        rows = np.flatnonzero(valid)
+        n_rows = rows.shape[0]
+
+        # group of each row at each level of the rollup; combining the codes
+        # of sorted values keeps groups in sorted order.
+        level_groups = [np.zeros(n_rows, dtype=np.int64)]
+        group_keys = [()]
+        level_keys = [()]
+        for key_codes, key_uniques in zip(codes, uniques):
+            combined = level_groups[-1] * len(key_uniques) + key_codes[rows]
+            combined_unique, groups = np.unique(combined, return_inverse=True)
+            level_keys = [
+                level_keys[code // len(key_uniques)] + (key_uniques[code % len(key_uniques)],)
+                for code in combined_unique
+            ]
+            level_groups.append(groups)
+            group_keys.extend(level_keys)
+
+        offsets = np.cumsum([0] + [groups.max() + 1 if n_rows > 0 else 0
+                                   for groups in level_groups[:-1]])
+        groups = np.concatenate([
+            groups + offset for groups, offset in zip(level_groups, offsets)])
+        n_groups = len(group_keys)
+
+        data = OrderedDict()
+        for i, name in enumerate(names):
+            data[name] = pd.Series(
+                [key[i] if len(key) > i else None for key in group_keys],
+                dtype=object)
+        data["n_thermostat_core_day_sets"] = np.bincount(groups, minlength=n_groups)
+
+        # position of each row among the rows kept
+        positions = np.cumsum(valid) - 1
+        n_levels = len(level_groups)
+        for column_name in self.target_columns:
+            values, order = self._get_sorted_column(column_name)
+            order = positions[order[valid[order]]]
+            column_stats = _get_column_group_stats(
+                np.tile(values[rows], n_levels), groups, n_groups,
+                order=np.concatenate([order + level * n_rows for level in range(n_levels)]))
+            for stat_name, stat_values in column_stats.items():
+                data["{}_{}".format(column_name, stat_name)] = stat_values
+
+        return pd.DataFrame(data, columns=list(data.keys()))
+
+
+
+class SummaryStatisticsAccumulator(object):
+    """ Summary statistics of output metrics, accumulated so that the
+    accumulators of separate batches of output can be saved, e.g., by batch
+    workers, and merged in any order. The statistics of all batches can then
+    be found without combining their output into one dataframe.
+
+    For each group of core day sets (by climate zone, heating or cooling, and
+    filter, as in :code:`compute_summary_statistics`) and each column, the
+    count, mean and sum of squared deviations are accumulated with a
+    :code:`thermostat.accumulators.MomentAccumulator`, from which n, mean,
+    sem and 95% confidence bounds are exact up to rounding. Deciles are
+    estimated from a :code:`thermostat.accumulators.QuantileSketch`, to
+    within its relative accuracy.
+
+    The savings filter keeps core day sets between the 1st and 99th
+    percentiles of percent savings in each climate zone, which are not known
+    until all batches have been seen. Statistics for the savings filter are
+    accumulated only if `savings_bounds` are given; these are usually found
+    with :code:`get_savings_bounds` after a first pass over all batches
+    without them.
+
+    Accumulators are created with :code:`accumulate_summary_statistics`.
+
+    Parameters
+    ----------
+    target_baseline_method : {"baseline_percentile", "baseline_regional"}, default "baseline_percentile"
+        Baselining method by which samples are filtered according to bad fits.
+    advanced_filtering : boolean, default False
+        Whether to accumulate statistics for all filters.
+    savings_bounds : dict, default None
+        Lower and upper bounds of percent savings (by the target baseline
+        method) of the core day sets kept by the savings filter, for each
+        `(climate_zone_label, heating_or_cooling)`, e.g.
+        `("all", "heating")` or `("marine", "cooling")`.
+    relative_accuracy : float, default 0.005
+        Relative accuracy of estimated deciles.
+    """
+
+    def __init__(self, target_baseline_method="baseline_percentile",
+                 advanced_filtering=False, savings_bounds=None,
+                 relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        _check_target_baseline_method(target_baseline_method)
+        self.target_baseline_method = target_baseline_method
+        self.advanced_filtering = advanced_filtering
+        if savings_bounds is not None:
+            savings_bounds = {
+                key: (float(lower), float(upper))
+                for key, (lower, upper) in savings_bounds.items()
+            }
+        self.savings_bounds = savings_bounds
+        self.relative_accuracy = relative_accuracy
+
+        # (zone_label, filter_label, season) -> (n_rows_total, n_rows_kept,
+        # OrderedDict of column_name -> (MomentAccumulator, QuantileSketch))
+        self.groups = {}
+
+    def _get_filters(self, zone_label, season):
+        savings_filter = None
+        if self.savings_bounds is not None:
+            if (zone_label, season) not in self.savings_bounds:
+                message = "No savings bounds for {} {} core day sets." \
+                    .format(zone_label, season)
+                raise ValueError(message)
+            lower_bound, upper_bound = self.savings_bounds[(zone_label, season)]
+            savings_filter = _range_filter(
+                "percent_savings_{}".format(self.target_baseline_method),
+                lower_bound, upper_bound)
+        return _get_filters(
+            self.target_baseline_method, self.advanced_filtering, savings_filter)
+
+    def _get_filter_labels(self):
+        savings_filter = None if self.savings_bounds is None else _identity_filter
+        return list(_get_filters(
+            self.target_baseline_method, self.advanced_filtering, savings_filter))
+
+    def _get_parameters(self):
+        savings_bounds = self.savings_bounds
+        if savings_bounds is not None:
+            # compared by repr, as bounds may be np.nan
+            savings_bounds = repr(sorted(savings_bounds.items()))
+        return OrderedDict([
+            ("target_baseline_method", self.target_baseline_method),
+            ("advanced_filtering", self.advanced_filtering),
+            ("savings_bounds", savings_bounds),
+            ("relative_accuracy", self.relative_accuracy),
+        ])
+
+    def _check_compatible(self, other):
+        parameters, other_parameters = self._get_parameters(), other._get_parameters()
+        for name, value in parameters.items():
+            if value != other_parameters[name]:
+                message = "Cannot merge accumulators with different {} ({} and {})." \
+                    .format(name, value, other_parameters[name])
+                raise ValueError(message)
+
+    def merge(self, other):
+        """ Accumulator of the output of this and another accumulator.
+
+        Parameters
+        ----------
+        other : thermostat.stats.SummaryStatisticsAccumulator
+            Accumulator with the same parameters.
+
+        Returns
+        -------
+        accumulator : thermostat.stats.SummaryStatisticsAccumulator
+        """
+        self._check_compatible(other)
+        merged = SummaryStatisticsAccumulator(
+            self.target_baseline_method, self.advanced_filtering,
+            self.savings_bounds, self.relative_accuracy)
+        merged.groups = dict(self.groups)
+        for key, (n_rows_total, n_rows_kept, columns) in other.groups.items():
+            if key not in merged.groups:
+                merged.groups[key] = (n_rows_total, n_rows_kept, columns)
+                continue
+            merged_n_rows_total, merged_n_rows_kept, merged_columns = merged.groups[key]
+            merged.groups[key] = (
+                merged_n_rows_total + n_rows_total,
+                merged_n_rows_kept + n_rows_kept,
+                OrderedDict([
+                    (column_name, (moments.merge(columns[column_name][0]),
+                                   sketch.merge(columns[column_name][1])))
+                    for column_name, (moments, sketch) in merged_columns.items()
+                ]),
+            )
+        return merged
+
+    def get_savings_bounds(self, quantile=0.01):
+        """ Estimated bounds of percent savings (by the target baseline method)
+        of the core day sets kept by the savings filter, from the accumulated
+        output. Bounds are estimated, to within the relative accuracy, over
+        finite values of percent savings, whereas
+        :code:`compute_summary_statistics` also counts infinite values.
+
+        Parameters
+        ----------
+        quantile : float, default 0.01
+            Bounds are the `quantile` and `1 - quantile` quantiles.
+
+        Returns
+        -------
+        savings_bounds : dict
+            Lower and upper bounds for each `(climate_zone_label,
+            heating_or_cooling)`, for use as the `savings_bounds` of
+            :code:`accumulate_summary_statistics`.
+        """
+        column_name = "percent_savings_{}".format(self.target_baseline_method)
+        savings_bounds = {}
+        for (zone_label, filter_label, season), (_, _, columns) in self.groups.items():
+            if filter_label == "no_filter":
+                lower_bound, upper_bound = columns[column_name][1].quantile(
+                    [0.0 + quantile, 1.0 - quantile])
+                savings_bounds[(zone_label, season)] = (lower_bound, upper_bound)
+        return savings_bounds
+
+    def compute_summary_statistics(self):
+        """ Summary statistics of the accumulated output, in the format of
+        :code:`compute_summary_statistics`.
+
+        Returns
+        -------
+        stats : list of collections.OrderedDict
+            Summary statistics, as output by
+            :code:`compute_summary_statistics`. Statistics for the savings
+            filter are only included if this accumulator has
+            `savings_bounds`.
+        """
+        filter_labels = self._get_filter_labels()
+        q = np.array(SUMMARY_STATISTICS_QUANTILES) / 100.
+
+        stats = []
+        for key in _get_group_order(filter_labels):
+            label = _get_group_label(*key)
+            season = key[2]
+            if key not in self.groups:
+                _warn_not_enough_data(label, season)
+                continue
+
+            n_rows_total, n_rows_kept, columns = self.groups[key]
+            group_stats = _get_stats_header(label, season, n_rows_total, n_rows_kept)
+            for column_name, (moments, sketch) in columns.items():
+                mean, sem = moments.mean, moments.sem()
+                group_stats["{}_n".format(column_name)] = moments.n
+                group_stats["{}_upper_bound_95_perc_conf".format(column_name)] = mean + (1.96 * sem)
+                group_stats["{}_mean".format(column_name)] = mean
+                group_stats["{}_lower_bound_95_perc_conf".format(column_name)] = mean - (1.96 * sem)
+                group_stats["{}_sem".format(column_name)] = sem
+
+                for quantile, value in zip(SUMMARY_STATISTICS_QUANTILES, sketch.quantile(q)):
+                    group_stats["{}_q{}".format(column_name, quantile)] = value
+            stats.append(group_stats)
+
+        return _get_national_weighting_stats(stats, filter_labels) + stats
+
+    def to_json(self, filepath):
+        """ Save the accumulator as JSON.
+
+        Parameters
+        ----------
+        filepath : str
+            Filepath at which to save the accumulator.
+        """
+        savings_bounds = None
+        if self.savings_bounds is not None:
+            savings_bounds = [
+                [zone_label, season, lower_bound, upper_bound]
+                for (zone_label, season), (lower_bound, upper_bound)
+                in sorted(self.savings_bounds.items())
+            ]
+        groups = [
+            {
+                "key": list(key),
+                "n_rows_total": int(n_rows_total),
+                "n_rows_kept": int(n_rows_kept),
+                "columns": [
+                    [column_name, moments.to_dict(), sketch.to_dict()]
+                    for column_name, (moments, sketch) in columns.items()
+                ],
+            }
+            for key, (n_rows_total, n_rows_kept, columns) in sorted(self.groups.items())
+        ]
+        data = {
+            "sw_version": get_version(),
+            "target_baseline_method": self.target_baseline_method,
+            "advanced_filtering": self.advanced_filtering,
+            "savings_bounds": savings_bounds,
+            "relative_accuracy": self.relative_accuracy,
+            "groups": groups,
+        }
+        with open(filepath, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def from_json(cls, filepath):
+        """ Load an accumulator saved with :code:`to_json`.
+
+        Parameters
+        ----------
+        filepath : str
+            Filepath of the saved accumulator.
+
+        Returns
+        -------
+        accumulator : thermostat.stats.SummaryStatisticsAccumulator
+        """
+        with open(filepath) as f:
+            data = json.load(f)
+
+        savings_bounds = data["savings_bounds"]
+        if savings_bounds is not None:
+            savings_bounds = {
+                (zone_label, season): (lower_bound, upper_bound)
+                for zone_label, season, lower_bound, upper_bound in savings_bounds
+            }
+        accumulator = cls(
+            data["target_baseline_method"], data["advanced_filtering"],
+            savings_bounds, data["relative_accuracy"])
+        for group in data["groups"]:
+            accumulator.groups[tuple(group["key"])] = (
+                group["n_rows_total"],
+                group["n_rows_kept"],
+                OrderedDict([
+                    (column_name, (MomentAccumulator.from_dict(moments),
+                                   QuantileSketch.from_dict(sketch)))
+                    for column_name, moments, sketch in group["columns"]
+                ]),
+            )
+        return accumulator
+
+
+def accumulate_summary_statistics(
+        metrics_df,
+        target_baseline_method="baseline_percentile",
+        advanced_filtering=False,
+        savings_bounds=None,
+        relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """ Accumulates summary statistics for a batch of output, to be merged
+    with those of other batches. See
+    :code:`thermostat.stats.SummaryStatisticsAccumulator`.
+
+    Parameters
+    ----------
+    metrics_df : pd.DataFrame
+        Output for which to accumulate summary statistics.
+    target_baseline_method : {"baseline_percentile", "baseline_regional"}, default "baseline_percentile"
+        Baselining method by which samples will be filtered according to bad fits.
+    advanced_filtering : boolean, default False
+        Whether to accumulate statistics for all filters.
+    savings_bounds : dict, default None
+        Bounds of percent savings for the savings filter, from
+        :code:`SummaryStatisticsAccumulator.get_savings_bounds`. If None,
+        statistics for the savings filter are not accumulated.
+    relative_accuracy : float, default 0.005
+        Relative accuracy of estimated deciles.
+
+    Returns
+    -------
+    accumulator : thermostat.stats.SummaryStatisticsAccumulator
+    """
+    accumulator = SummaryStatisticsAccumulator(
+        target_baseline_method, advanced_filtering, savings_bounds,
+        relative_accuracy)
+
+    for season, target_columns, keys, group_rows in _get_climate_zone_groups(
+            metrics_df, accumulator._get_filters):
+        if len(keys) == 0:
+            continue
+
+        column_values = OrderedDict([
+            (column_name, np.asarray(metrics_df[column_name].values, dtype=float))
+            for column_name in target_columns
+        ])
+        for (zone_label, filter_label, n_rows_total), rows in zip(keys, group_rows):
+            columns = OrderedDict()
+            for column_name, values in column_values.items():
+                values = values[rows]
+                values = values[np.isfinite(values)]
+                columns[column_name] = (
+                    MomentAccumulator.from_values(values),
+                    QuantileSketch.from_values(values, relative_accuracy),
+                )
+            accumulator.groups[(zone_label, filter_label, season)] = \
+                (n_rows_total, rows.shape[0], columns)
+
+    return accumulator
+
+
+def merge_summary_statistics_accumulators(accumulators):
+    """ Merges the accumulated summary statistics of batches of output.
+
+    Parameters
+    ----------
+    accumulators : list of thermostat.stats.SummaryStatisticsAccumulator
+        Accumulators with the same parameters, in any order.
+
+    Returns
+    -------
+    accumulator : thermostat.stats.SummaryStatisticsAccumulator
+    """
+    return reduce(lambda a, b: a.merge(b), accumulators)
 
 
 def summary_statistics_to_csv(stats, filepath, product_id):
@@ -653,6 +1302,17 @@ def summary_statistics_to_csv(stats, filepath, product_id):
 
     columns.extend(national_weighting_columns)
 
+    # bounds of national weighted deciles, if found by bootstrap
+    bootstrap_columns = [
+        "percent_savings_{}_q{}_{}_bound_95_perc_conf_national_weighted_mean"
+        .format(method, quantile, bound)
+        for method in methods
+        for quantile in SUMMARY_STATISTICS_QUANTILES
+        for bound in ["lower", "upper"]
+    ]
+    if any(bootstrap_columns[0] in row for row in stats):
+        columns.extend(bootstrap_columns)
+
     columns.extend([
         "n_thermostat_core_day_sets_total",
         "n_thermostat_core_day_sets_kept",
@@ -664,7 +1324,7 @@ def summary_statistics_to_csv(stats, filepath, product_id):
         columns.append("{}_mean".format(column_name))
         columns.append("{}_lower_bound_95_perc_conf".format(column_name))
         columns.append("{}_sem".format(column_name))
-        for quantile in [10, 20, 30, 40, 50, 60, 70, 80, 90]:
+        for quantile in SUMMARY_STATISTICS_QUANTILES:
             columns.append("{}_q{}".format(column_name, quantile))
 
     # add product_id
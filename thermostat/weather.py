@@ -0,0 +1,418 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:  # python 2
+    from urllib2 import urlopen, HTTPError
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+import pandas as pd
+import numpy as np
+from eemeter.weather import ISDWeatherSource
+
+HOUR = 3600 * 10 ** 9  # nanoseconds
+
+
+class WeatherSource(object):
+    """ Base class for sources of hourly outdoor temperature data, as used by
+    :code:`thermostat.importers.from_csv` and
+    :code:`thermostat.importers.get_single_thermostat`.
+
+    Subclasses must implement :code:`indexed_temperatures`.
+    """
+
+    def indexed_temperatures(self, station, index):
+        """ Return hourly outdoor temperatures for a weather station.
+
+        Parameters
+        ----------
+        station : str
+            USAF weather station identifier, e.g. `"722880"`.
+        index : pandas.DatetimeIndex
+            Timezone-aware hourly index over which to supply temperatures.
+
+        Returns
+        -------
+        temperatures : pandas.Series
+            Outdoor temperatures in degrees Fahrenheit, indexed by
+            :code:`index`. Hours without data are null.
+        """
+        raise NotImplementedError
+
+
+class NOAAWeatherSource(WeatherSource):
+    """ Outdoor temperatures from the NOAA Integrated Surface Database (ISD),
+    fetched from NCDC and cached locally by
+    :code:`eemeter.weather.ISDWeatherSource`. Requires network access for any
+    data not already in the eemeter weather cache.
+    """
+
+    def indexed_temperatures(self, station, index):
+        return ISDWeatherSource(station).indexed_temperatures(index, "degF")
+
+
+def _get_year_hourly_index(year):
+    return pd.date_range(datetime(year, 1, 1), datetime(year + 1, 1, 1),
+                         freq="H", closed="left", tz="UTC")
+
+
+def _read_station_year_csv(filepath_or_buffer, year):
+    # reads a station-year file, as written by LocalDirectoryWeatherSource.stage
+    df = pd.read_csv(filepath_or_buffer, usecols=["datetime", "temp_degF"])
+    dates = pd.to_datetime(df["datetime"], format="%Y-%m-%d %H:%M:%S")
+
+    year_start = pd.Timestamp(datetime(year, 1, 1)).value
+    n_hours = (pd.Timestamp(datetime(year + 1, 1, 1)).value - year_start) // HOUR
+    hours = (dates.values.astype('datetime64[ns]').astype(np.int64) - year_start) // HOUR
+    in_year = (hours >= 0) & (hours < n_hours)
+
+    temperatures = np.tile(np.nan, n_hours)
+    temperatures[hours[in_year]] = df["temp_degF"].values[in_year]
+    return temperatures
+
+
+class _StationYearWeatherSource(WeatherSource):
+    # Weather source backed by arrays of hourly temperatures for each
+    # station-year, starting at midnight UTC on January 1. Subclasses
+    # implement _get_station_year.
+
+    def _get_station_year(self, station, year):
+        raise NotImplementedError
+
+    def indexed_temperatures(self, station, index):
+        values = np.tile(np.nan, index.shape[0])
+
+        if index.shape[0] > 0:
+            if index.tz is not None:
+                index_utc = index.tz_convert("UTC")
+            else:
+                index_utc = index
+            timestamps = index_utc.asi8
+            years = index_utc.year
+
+            for year in np.unique(years):
+                temperatures = self._get_station_year(station, year)
+                year_start = pd.Timestamp(datetime(year, 1, 1)).value
+                positions = np.flatnonzero(years == year)
+                offsets = timestamps[positions] - year_start
+                # hours not falling on the hour have no data
+                on_the_hour = offsets % HOUR == 0
+                values[positions[on_the_hour]] = \
+                    temperatures[offsets[on_the_hour] // HOUR]
+
+        return pd.Series(values, index=index)
+
+
+class LocalDirectoryWeatherSource(_StationYearWeatherSource):
+    """ Outdoor temperatures read from pre-staged station-year files in a
+    local directory, for use without network access.
+
+    Each file is named :code:`<station>-<year>.csv` and contains the columns
+    :code:`datetime` (UTC, e.g. `"2011-01-01 00:00:00"`) and
+    :code:`temp_degF`, with one row per hour for which data is available.
+    Files can be created with :code:`LocalDirectoryWeatherSource.stage`.
+
+    Decoded station-years are kept in memory, up to `cache_size` of them,
+    evicting the least recently used.
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory containing station-year files.
+    cache_size : int, default: 64
+        Maximum number of decoded station-years to keep in memory.
+    """
+
+    def __init__(self, directory, cache_size=64):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __repr__(self):
+        return 'LocalDirectoryWeatherSource("{}")'.format(self.directory)
+
+    def _get_filename(self, station, year):
+        return os.path.join(self.directory, "{}-{}.csv".format(station, year))
+
+    def _load_station_year(self, station, year):
+        filename = self._get_filename(station, year)
+        if not os.path.exists(filename):
+            message = "Could not locate outdoor temperature data for station" \
+                      " {} in {} (expected {}).".format(station, year, filename)
+            raise ValueError(message)
+
+        return _read_station_year_csv(filename, year)
+
+    def _get_station_year(self, station, year):
+        key = (station, year)
+        try:
+            temperatures = self._cache.pop(key)
+        except KeyError:
+            temperatures = self._load_station_year(station, year)
+        self._cache[key] = temperatures
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return temperatures
+
+    def stage(self, weather_source, station, year):
+        """ Fetch a year of temperatures for a station from another weather
+        source (e.g., :code:`NOAAWeatherSource`) and save it to the directory
+        as a station-year file.
+
+        Parameters
+        ----------
+        weather_source : thermostat.weather.WeatherSource
+            Source from which to fetch temperatures.
+        station : str
+            USAF weather station identifier.
+        year : int
+            Year of data to stage.
+        """
+        index = _get_year_hourly_index(year)
+        temperatures = weather_source.indexed_temperatures(station, index)
+        df = pd.DataFrame({
+            "datetime": index.tz_convert(None).strftime("%Y-%m-%d %H:%M:%S"),
+            "temp_degF": temperatures.values,
+        }, columns=["datetime", "temp_degF"]).dropna()
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        df.to_csv(self._get_filename(station, year), index=False)
+
+        self._cache.pop((station, year), None)
+
+
+class HTTPWeatherSource(_StationYearWeatherSource):
+    """ Outdoor temperatures fetched over HTTP from station-year files in the
+    format written by :code:`LocalDirectoryWeatherSource.stage`, e.g., from a
+    staged directory served by a web server on a local network.
+
+    Station-years are fetched on every request, so this source is best used
+    as the upstream source of a :code:`MemmapWeatherStore`.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the directory containing station-year files, e.g.
+        `"http://weather.example.com/isd"`; the file for station 722880 in 2015
+        is read from `"http://weather.example.com/isd/722880-2015.csv"`.
+    timeout : float, default: 60
+        Timeout in seconds for each request.
+    """
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __repr__(self):
+        return 'HTTPWeatherSource("{}")'.format(self.base_url)
+
+    def _get_url(self, station, year):
+        return "{}/{}-{}.csv".format(self.base_url, station, year)
+
+    def _get_station_year(self, station, year):
+        url = self._get_url(station, year)
+        try:
+            response = urlopen(url, timeout=self.timeout)
+        except HTTPError as e:
+            if e.code == 404:
+                message = "Could not locate outdoor temperature data for station" \
+                          " {} in {} (expected {}).".format(station, year, url)
+                raise ValueError(message)
+            raise
+        try:
+            return _read_station_year_csv(response, year)
+        finally:
+            response.close()
+
+
+class MemmapWeatherStore(_StationYearWeatherSource):
+    """ Outdoor temperatures stored on disk as one fixed-length float32 array
+    per station-year, which is opened with :code:`numpy.memmap`. Processes
+    which read the same station-year share the operating system page cache,
+    without parsing or copying the data.
+
+    Station-years not yet in the store are fetched from `weather_source` and
+    saved. A small index file (:code:`index.json`) records the size and the
+    time of last use of each station-year; if `max_bytes` is given, the least
+    recently used station-years are removed from the store whenever saving a
+    new one puts it over budget. The time of last use of a station-year held
+    open by a process is refreshed at most once every
+    :code:`USE_REFRESH_SECONDS`. A process holds at most
+    :code:`MAX_OPEN_STATION_YEARS` station-years open, and reopens the least
+    recently used ones when they are read again.
+
+    A store may be shared by several threads, e.g., by
+    :code:`thermostat.importers.prefetch_weather`, and by several processes.
+    Updates of the index are guarded by a lock on a lock file
+    (:code:`index.lock`), where the platform supports :code:`fcntl`.
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory in which to keep the store.
+    weather_source : thermostat.weather.WeatherSource, default: None
+        Source from which to fetch station-years not yet in the store
+        (e.g., :code:`NOAAWeatherSource`). If None, only station-years
+        already in the store are available.
+    max_bytes : int, default: None
+        Maximum total size of station-year files in the store. If None, the
+        store is unbounded.
+    """
+
+    HOURS_PER_YEAR = 366 * 24  # fixed length, long enough for leap years
+    INDEX_FILENAME = "index.json"
+    LOCK_FILENAME = "index.lock"
+    USE_REFRESH_SECONDS = 60
+    MAX_OPEN_STATION_YEARS = 64
+
+    def __init__(self, directory, weather_source=None, max_bytes=None):
+        self.directory = directory
+        self.weather_source = weather_source
+        self.max_bytes = max_bytes
+        self._memmaps = OrderedDict()
+        self._last_recorded = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'MemmapWeatherStore("{}")'.format(self.directory)
+
+    def _get_key(self, station, year):
+        return "{}-{}".format(station, year)
+
+    def _get_filename(self, key):
+        return os.path.join(self.directory, "{}.f32".format(key))
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILENAME)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        filename = os.path.join(self.directory, self.INDEX_FILENAME)
+        _write_atomic(filename, json.dumps(index, sort_keys=True).encode("utf-8"))
+
+    @contextmanager
+    def _index_lock(self):
+        # the thread lock guards against other threads of this process, the
+        # file lock against other processes.
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            with open(os.path.join(self.directory, self.LOCK_FILENAME), "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _open(self, key, fetched):
+        # records use of the station-year and opens it, both while holding
+        # the index lock, so that no other process can remove it in between.
+        # Returns None, without recording use, if the station-year has been
+        # removed from the store (e.g., by another process).
+        with self._index_lock():
+            filename = self._get_filename(key)
+            if not os.path.exists(filename):
+                return None
+            index = self._load_index()
+            now = time.time()
+            index[key] = {
+                "bytes": self.HOURS_PER_YEAR * 4,
+                "last_used": now,
+            }
+            if fetched:
+                self._evict(index, keep=key)
+            self._save_index(index)
+            temperatures = np.memmap(filename, dtype=np.float32, mode="r",
+                                     shape=(self.HOURS_PER_YEAR,))
+        self._last_recorded[key] = now
+        self._memmaps[key] = temperatures
+        # keep at most MAX_OPEN_STATION_YEARS open, least recently used first
+        # out, so that a long-running reader doesn't hold a mapping of every
+        # station-year it has ever read.
+        while len(self._memmaps) > self.MAX_OPEN_STATION_YEARS:
+            oldest_key = next(iter(self._memmaps))
+            self._memmaps.pop(oldest_key, None)
+            self._last_recorded.pop(oldest_key, None)
+        return temperatures
+
+    def _fetch(self, station, year, key):
+        if self.weather_source is None:
+            message = "Could not locate outdoor temperature data for station" \
+                      " {} in {} in {}.".format(station, year, self)
+            raise ValueError(message)
+
+        index = _get_year_hourly_index(year)
+        temperatures = np.tile(np.nan, self.HOURS_PER_YEAR).astype(np.float32)
+        temperatures[:index.shape[0]] = \
+            self.weather_source.indexed_temperatures(station, index).values
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        _write_atomic(self._get_filename(key), temperatures.tobytes())
+
+    def _evict(self, index, keep):
+        if self.max_bytes is None:
+            return
+        total_bytes = sum(entry["bytes"] for entry in index.values())
+        by_last_used = sorted(index, key=lambda k: index[k]["last_used"])
+        for key in by_last_used:
+            if total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._get_filename(key))
+            except OSError:
+                pass
+            total_bytes -= index.pop(key)["bytes"]
+            self._memmaps.pop(key, None)
+            self._last_recorded.pop(key, None)
+
+    def _get_station_year(self, station, year):
+        key = self._get_key(station, year)
+        temperatures = self._memmaps.pop(key, None)
+        if temperatures is not None:
+            last_recorded = self._last_recorded.get(key, 0)
+            if time.time() - last_recorded < self.USE_REFRESH_SECONDS:
+                # reinsert as most recently used
+                self._memmaps[key] = temperatures
+                return temperatures
+            self._last_recorded.pop(key, None)
+
+        # another process may remove the station-year again after it is
+        # fetched, before it is opened; if so, fetch it again.
+        temperatures = None
+        while temperatures is None:
+            fetched = not os.path.exists(self._get_filename(key))
+            if fetched:
+                self._fetch(station, year, key)
+            temperatures = self._open(key, fetched)
+        return temperatures
+
+
+def _write_atomic(filename, data):
+    # write to a temporary file and rename, so that readers in other
+    # processes never see a partially written file.
+    temp_filename = "{}.{}-{}.tmp".format(
+        filename, os.getpid(), threading.current_thread().ident)
+    with open(temp_filename, "wb") as f:
+        f.write(data)
+    os.rename(temp_filename, filename)